@@ -580,6 +580,15 @@ const Insights = () => {
     }
   }, []);
 
+  const applySummary = (data) => {
+    setMisinformationStats({
+      total: data.total_analyses ?? data.total ?? 0,
+      fake: data.fake_count ?? data.fake ?? 0,
+      real: data.real_count ?? data.real ?? 0,
+      accuracy: Math.round((data.avg_confidence ?? data.accuracy ?? 0) * 100)
+    });
+  };
+
   // GET - Fetch real statistics from API
   const fetchStatistics = async () => {
     try {
@@ -587,12 +596,7 @@ const Insights = () => {
       const response = await fetch('http://127.0.0.1:8000/history/stats/summary');
       if (response.ok) {
         const data = await response.json();
-        setMisinformationStats({
-          total: data.total_analyses ?? data.total ?? 0,
-          fake: data.fake_count ?? data.fake ?? 0,
-          real: data.real_count ?? data.real ?? 0,
-          accuracy: Math.round((data.avg_confidence ?? data.accuracy ?? 0) * 100)
-        });
+        applySummary(data);
 
         // If the stats endpoint includes actual items, capture them for BoxPlotPair
         const possibleItems = data.items || data.data || data.history || data.analyses || null;
@@ -640,8 +644,43 @@ const Insights = () => {
 
   useEffect(() => {
     fetchStatistics();
-    const interval = setInterval(fetchStatistics, 30000);
-    return () => clearInterval(interval);
+    // Live updates: the server pushes the new summary (and each new, updated,
+    // deleted or evicted analysis) over server-sent events, so tabs don't need to poll
+    if (typeof window === 'undefined' || !window.EventSource) {
+      const interval = setInterval(fetchStatistics, 30000);
+      return () => clearInterval(interval);
+    }
+    let interval = null;
+    const source = new EventSource('http://127.0.0.1:8000/history/events');
+    source.addEventListener('summary', (e) => applySummary(JSON.parse(e.data)));
+    source.addEventListener('analysis', (e) => {
+      const record = JSON.parse(e.data);
+      setAnalysisItems((prev) => (Array.isArray(prev) ? [...prev, record] : prev));
+    });
+    // feedback and deferred explanations update a record in place
+    const replaceRecord = (e) => {
+      const record = JSON.parse(e.data);
+      setAnalysisItems((prev) => (Array.isArray(prev) ? prev.map((it) => (it.id === record.id ? record : it)) : prev));
+    };
+    source.addEventListener('feedback', replaceRecord);
+    source.addEventListener('explained', replaceRecord);
+    source.addEventListener('deleted', (e) => {
+      const { id } = JSON.parse(e.data);
+      setAnalysisItems((prev) => (Array.isArray(prev) ? prev.filter((it) => it.id !== id) : prev));
+    });
+    source.addEventListener('cleared', () => {
+      setAnalysisItems((prev) => (Array.isArray(prev) ? [] : prev));
+    });
+    source.onerror = () => {
+      // EventSource reconnects by itself; fall back to polling only once it gives up
+      if (source.readyState === EventSource.CLOSED && !interval) {
+        interval = setInterval(fetchStatistics, 30000);
+      }
+    };
+    return () => {
+      source.close();
+      if (interval) clearInterval(interval);
+    };
   }, []);
 
   // Fetch analysis history and compute median message length per category
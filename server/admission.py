@@ -0,0 +1,215 @@
+"""
+Admission control for the prediction routes.
+
+Without a limit, a traffic spike queues every request for the model (in the
+micro-batcher or Starlette's threadpool) and latency grows for everyone.
+The controller instead admits requests while there is capacity. It keeps a
+short, bounded queue with a deadline, and rejects everything else straight
+away, so clients get a cheap 429/503 with Retry-After instead of a timeout.
+
+Capacity is counted in cost units rather than requests, because scoring
+cost grows with input length: a request costs one unit per
+ADMISSION_UNIT_CHARS characters (at least one). A tweet is 1 unit and a
+10,000-character text is 10. A request heavier than the whole capacity is
+admitted on its own, once nothing else is running.
+
+Waiting requests are admitted in arrival order. A heavy request at the
+head of the queue is not overtaken by lighter ones, so it can't starve.
+
+Configuration (environment):
+    ADMISSION_MAX_UNITS       cost units admitted at once (default 64; 0 disables)
+    ADMISSION_MAX_QUEUE       requests allowed to wait (default 256); beyond it: 429
+    ADMISSION_QUEUE_TIMEOUT_MS  longest wait before giving up (default 2000): 503
+    ADMISSION_UNIT_CHARS      characters per cost unit (default 1000)
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from metrics import STAGE_SECONDS
+
+
+class AdmissionRejected(Exception):
+    """
+    The request was not admitted.
+
+    Attributes:
+        status_code: 429 (queue full) or 503 (waited past the deadline)
+        reason: "queue_full" or "timeout"
+        retry_after: Suggested seconds before retrying
+    """
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(f"Request not admitted ({reason})")
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Weighted concurrency limit with a bounded FIFO wait queue.
+
+    Only used from the event loop, so no locking is needed.
+
+    Args:
+        max_units: Cost units admitted at once (0 admits everything)
+        max_queue: Requests allowed to wait for capacity
+        queue_timeout: Seconds a request may wait before it is rejected
+        unit_chars: Input characters per cost unit
+    """
+
+    def __init__(self, max_units: int = 64, max_queue: int = 256, queue_timeout: float = 2.0,
+                 unit_chars: int = 1000):
+        self.max_units = max_units
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.unit_chars = max(1, unit_chars)
+
+        self._loop = None
+        self._waiters = deque()  # (units, future)
+        self.in_flight_units = 0
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "timeout": 0}
+        # smoothed seconds a request holds its units, for Retry-After
+        self._avg_hold = 0.05
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_units > 0
+
+    def units_for(self, chars: int) -> int:
+        """Cost units of a request with this many input characters."""
+        return max(1, math.ceil(chars / self.unit_chars))
+
+    def queued_units(self) -> int:
+        return sum(units for units, _ in self._waiters)
+
+    def _fits(self, units: int) -> bool:
+        return self.in_flight_units + units <= self.max_units
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained, at least 1."""
+        backlog = (self.in_flight_units + self.queued_units()) / max(1, self.max_units)
+        return min(60, max(1, math.ceil(backlog * self._avg_hold)))
+
+    def _grant(self, units: int) -> None:
+        self.in_flight_units += units
+        self.in_flight += 1
+        self.admitted += 1
+
+    def _release(self, units: int, held: float) -> None:
+        self.in_flight_units -= units
+        self.in_flight -= 1
+        self._avg_hold += 0.1 * (held - self._avg_hold)
+        self._wake()
+
+    def _wake(self) -> None:
+        """Admit waiters in arrival order while the one at the head fits."""
+        while self._waiters:
+            head_units, future = self._waiters[0]
+            if future.done():
+                # timed out or cancelled; already counted
+                self._waiters.popleft()
+                continue
+            if not self._fits(head_units):
+                break
+            self._waiters.popleft()
+            self._grant(head_units)
+            future.set_result(None)
+
+    async def _acquire(self, units: int) -> None:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # first use, or a new event loop (e.g. after a server restart in-process)
+            self._loop = loop
+            self._waiters = deque()
+            self.in_flight_units = 0
+            self.in_flight = 0
+
+        if not self._waiters and self._fits(units):
+            self._grant(units)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected["queue_full"] += 1
+            raise AdmissionRejected(429, "queue_full", self.retry_after())
+
+        future = loop.create_future()
+        entry = (units, future)
+        self._waiters.append(entry)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # granted just as the deadline passed: keep the slot
+                return
+            future.cancel()
+            self._remove_waiter(entry)
+            self.rejected["timeout"] += 1
+            raise AdmissionRejected(503, "timeout", self.retry_after())
+        except asyncio.CancelledError:
+            # client went away while waiting; hand back the units if they were granted
+            if future.done() and not future.cancelled():
+                self._release(units, 0.0)
+            else:
+                future.cancel()
+                self._remove_waiter(entry)
+            raise
+        finally:
+            STAGE_SECONDS.observe(time.perf_counter() - started, "admission_wait")
+
+    def _remove_waiter(self, entry) -> None:
+        try:
+            self._waiters.remove(entry)
+        except ValueError:
+            pass
+        # the removed waiter may have been blocking lighter ones behind it
+        self._wake()
+
+    @asynccontextmanager
+    async def admit(self, chars: int):
+        """
+        Hold capacity for a request with this many input characters.
+
+        Raises:
+            AdmissionRejected: The queue is full, or the wait exceeded queue_timeout
+        """
+        if not self.enabled:
+            yield
+            return
+        # an oversized request takes the whole capacity, so it runs alone instead of never
+        units = min(self.units_for(chars), self.max_units)
+        await self._acquire(units)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._release(units, time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "in_flight": self.in_flight,
+            "in_flight_units": self.in_flight_units,
+            "max_units": self.max_units,
+            "queued": len(self._waiters),
+            "queued_units": self.queued_units(),
+            "max_queue": self.max_queue,
+            "queue_timeout_ms": self.queue_timeout * 1000,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+def from_env() -> AdmissionController:
+    return AdmissionController(
+        max_units=int(os.environ.get("ADMISSION_MAX_UNITS", "64")),
+        max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", "256")),
+        queue_timeout=float(os.environ.get("ADMISSION_QUEUE_TIMEOUT_MS", "2000")) / 1000,
+        unit_chars=int(os.environ.get("ADMISSION_UNIT_CHARS", "1000")),
+    )
@@ -0,0 +1 @@
+"""Microbenchmarks for the inference and history hot paths (see benchmarks/suite.py)."""
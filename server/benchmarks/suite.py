@@ -0,0 +1,347 @@
+"""
+Microbenchmark suite for the inference and history hot paths.
+
+Times model.preprocess_text, model.predict_text, the predict route's
+get_word_contributions and the history_routes handlers on synthetic
+tweet-length and 10k-character inputs, and on histories of 1k, 100k and 1M
+records. Each benchmark reports latency percentiles, throughput and peak
+traced memory. Results are saved as JSON, and a later run can be compared
+against a saved baseline.
+
+Usage (from server/):
+    python -m benchmarks run --out bench.json [--quick] [--backend memory|sqlite]
+    python -m benchmarks compare baseline.json bench.json [--threshold 0.2]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+HISTORY_SIZES = [1000, 100000, 1000000]
+QUICK_HISTORY_SIZES = [1000, 10000]
+
+_WORDS = (
+    "the vaccine government study microchip share delete breaking news report official confirms "
+    "hoax election fraud climate scientists hospital budget schools media celebrity arrested "
+    "cure cancer miracle doctors hate this trick they don't want you to know covid cases falling "
+    "police says video viral truth exposed secret plan world leaders announce new policy today"
+).split()
+
+
+def synthetic_text(rng: random.Random, length: int) -> str:
+    """Tweet-like text (words, a hashtag, a mention, a URL, emphasis) of about length characters."""
+    parts = []
+    size = 0
+    while size < length:
+        roll = rng.random()
+        if roll < 0.03:
+            part = f"#{rng.choice(_WORDS)}"
+        elif roll < 0.05:
+            part = f"@user{rng.randint(1, 999)}"
+        elif roll < 0.06:
+            part = f"https://t.co/{rng.getrandbits(32):x}"
+        elif roll < 0.08:
+            part = rng.choice(_WORDS).upper() + "!!!"
+        else:
+            part = rng.choice(_WORDS)
+        parts.append(part)
+        size += len(part) + 1
+    return " ".join(parts)[:length]
+
+
+def measure(fn: Callable[[], object], iterations: int, setup: Optional[Callable[[], None]] = None,
+            warmup: int = 3, memory_iterations: int = 3) -> dict:
+    """
+    Time fn() one call at a time.
+
+    setup() runs before every call, outside the timed region (e.g. to
+    clear a cache). Peak memory is traced in a separate, shorter pass so
+    tracemalloc's overhead doesn't distort the latencies.
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        fn()
+
+    samples = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        peak = 0
+        for _ in range(max(1, min(memory_iterations, iterations))):
+            if setup:
+                setup()
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            fn()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+
+    samples.sort()
+    total = sum(samples)
+
+    def percentile(p: float) -> float:
+        return samples[min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))] * 1000
+
+    return {
+        "iterations": len(samples),
+        "mean_ms": round(total / len(samples) * 1000, 4),
+        "p50_ms": round(percentile(50), 4),
+        "p90_ms": round(percentile(90), 4),
+        "p99_ms": round(percentile(99), 4),
+        "max_ms": round(samples[-1] * 1000, 4),
+        "stdev_ms": round(statistics.pstdev(samples) * 1000, 4),
+        "ops_per_sec": round(len(samples) / total, 1) if total else 0.0,
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def bench_model(results: Dict[str, dict], rng: random.Random, iterations: int) -> None:
+    import model.model as model
+    from routes.predict_route import get_word_contributions
+
+    model._ensure_loaded()
+    inputs = {
+        "tweet": [synthetic_text(rng, rng.randint(80, 280)) for _ in range(200)],
+        "10k": [synthetic_text(rng, 10000) for _ in range(20)],
+    }
+    for name, texts in inputs.items():
+        cursor = {"i": 0}
+
+        def next_text(texts=texts, cursor=cursor):
+            cursor["i"] += 1
+            return texts[cursor["i"] % len(texts)]
+
+        n = iterations if name == "tweet" else max(10, iterations // 10)
+        results[f"model.preprocess_text[{name}]"] = measure(lambda: model.preprocess_text(next_text()), n)
+        results[f"model.predict_text[{name}]"] = measure(lambda: model.predict_text(next_text()), n)
+        # the prediction cache would turn repeats into lookups; time the uncached path
+        results[f"get_word_contributions[{name}]"] = measure(
+            lambda: get_word_contributions(next_text()), n, setup=model._cache.clear
+        )
+        results[f"get_word_contributions[{name},cached]"] = measure(
+            lambda: get_word_contributions(texts[0]), n
+        )
+
+
+def populate(store, size: int, rng: random.Random) -> None:
+    start = datetime.now() - timedelta(days=3)
+    step = timedelta(days=3) / max(1, size)
+    for i in range(size):
+        text = synthetic_text(rng, rng.randint(80, 280))
+        words = text.split()[:5]
+        store.add(
+            text,
+            "Fake" if rng.random() < 0.4 else "Real",
+            round(rng.uniform(0.5, 1.0), 3),
+            {word: round(rng.uniform(-1, 1), 4) for word in words},
+            timestamp=start + step * i,
+        )
+
+
+def bench_history(results: Dict[str, dict], rng: random.Random, sizes: List[int], backend: str,
+                  iterations: int) -> None:
+    import history.store as history_store
+    from history.export import iter_ndjson
+    from history.memory_store import MemoryHistoryStore
+    from routes import history_routes
+
+    for size in sizes:
+        tmpdir = None
+        if backend == "sqlite":
+            from history.sqlite_store import SQLiteHistoryStore
+
+            tmpdir = tempfile.TemporaryDirectory()
+            store = SQLiteHistoryStore(os.path.join(tmpdir.name, "bench.db"))
+        else:
+            store = MemoryHistoryStore(max_entries=size + 1, max_bytes=1 << 40)
+
+        started = time.perf_counter()
+        populate(store, size, rng)
+        logger.warning(f"Populated {size} records ({backend}) in {time.perf_counter() - started:.1f}s")
+        history_store._store = store
+        try:
+            tag = f"{backend},{size}"
+            ids = [rng.randint(1, size) for _ in range(64)]
+            pick = {"i": 0}
+
+            def next_id():
+                pick["i"] += 1
+                return ids[pick["i"] % len(ids)]
+
+            results[f"history.list[{tag}]"] = measure(
+                lambda: history_routes.get_analysis_history_endpoint(limit=10, offset=0), iterations)
+            results[f"history.list_deep_offset[{tag}]"] = measure(
+                lambda: history_routes.get_analysis_history_endpoint(limit=10, offset=size - 10), iterations)
+            results[f"history.list_cursor[{tag}]"] = measure(
+                lambda: history_routes.get_analysis_history_endpoint(limit=10, cursor=size - 10), iterations)
+            results[f"history.get_by_id[{tag}]"] = measure(
+                lambda: history_routes.get_analysis_by_id(next_id()), iterations)
+            results[f"history.stats_summary[{tag}]"] = measure(history_routes.get_statistics, iterations)
+            results[f"history.search[{tag}]"] = measure(
+                lambda: history_routes.search_history("vaccine micro", limit=10), iterations)
+            results[f"history.search_phrase[{tag}]"] = measure(
+                lambda: history_routes.search_history('"news report"', limit=10), iterations)
+            results[f"history.distinct_words[{tag}]"] = measure(
+                lambda: history_routes.get_distinct_words(limit=40, min_count=2), iterations)
+
+            def export_all():
+                # the body generator behind GET /history/export (the response
+                # itself wraps it for async iteration)
+                for _ in iter_ndjson(store.iter_filtered(), ["id", "prediction", "confidence"]):
+                    pass
+
+            results[f"history.export_ndjson[{tag}]"] = measure(export_all, 1, warmup=0, memory_iterations=1)
+        finally:
+            history_store._store = None
+            if tmpdir is not None:
+                tmpdir.cleanup()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: List[int], backend: str = "memory", iterations: int = 200, seed: int = 1234,
+        only: Optional[str] = None) -> dict:
+    """Run the suite and return {"meta": ..., "results": {name: stats}}."""
+    # the handlers log every call at INFO
+    logging.getLogger().setLevel(logging.WARNING)
+    for name in ("routes.history_routes", "routes.predict_route", "model.model"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    rng = random.Random(seed)
+    results = {}
+    if only in (None, "model"):
+        bench_model(results, rng, iterations)
+    if only in (None, "history"):
+        bench_history(results, rng, sizes, backend, iterations)
+
+    import model.model as model
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "model_engine": model.MODEL_ENGINE,
+            "history_backend": backend,
+            "history_sizes": sizes,
+            "seed": seed,
+            "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.2, metric: str = "p50_ms") -> List[dict]:
+    """
+    Per-benchmark change in metric between two runs.
+
+    Returns:
+        [{"name", "baseline", "current", "change", "regression"}], where change
+        is the relative difference and regression means it got slower by more
+        than threshold
+    """
+    rows = []
+    for name, stats in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or not before.get(metric):
+            continue
+        change = stats[metric] / before[metric] - 1
+        rows.append({
+            "name": name,
+            "baseline": before[metric],
+            "current": stats[metric],
+            "change": round(change, 4),
+            "regression": change > threshold,
+        })
+    return rows
+
+
+def _print_results(results: Dict[str, dict]) -> None:
+    width = max(len(name) for name in results) if results else 0
+    print(f"{'benchmark':<{width}}  {'p50 ms':>10} {'p90 ms':>10} {'p99 ms':>10} {'ops/s':>10} {'peak KiB':>10}")
+    for name, stats in results.items():
+        print(f"{name:<{width}}  {stats['p50_ms']:>10.3f} {stats['p90_ms']:>10.3f} {stats['p99_ms']:>10.3f} "
+              f"{stats['ops_per_sec']:>10.1f} {stats['peak_memory_kib']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inference and history microbenchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the suite")
+    run_parser.add_argument("--out", help="write results JSON here")
+    run_parser.add_argument("--sizes", help="comma-separated history sizes (default: 1000,100000,1000000)")
+    run_parser.add_argument("--quick", action="store_true", help="small histories and fewer iterations")
+    run_parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory")
+    run_parser.add_argument("--iterations", type=int, default=200)
+    run_parser.add_argument("--only", choices=["model", "history"])
+    run_parser.add_argument("--seed", type=int, default=1234)
+
+    compare_parser = commands.add_parser("compare", help="compare a run against a baseline")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown (0.2 = 20%%)")
+    compare_parser.add_argument("--metric", default="p50_ms")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        if args.sizes:
+            sizes = [int(size) for size in args.sizes.split(",")]
+        else:
+            sizes = QUICK_HISTORY_SIZES if args.quick else HISTORY_SIZES
+        iterations = min(args.iterations, 50) if args.quick else args.iterations
+        report = run(sizes, backend=args.backend, iterations=iterations, seed=args.seed, only=args.only)
+        _print_results(report["results"])
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"Saved results to {args.out}")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.threshold, args.metric)
+    regressions = [row for row in rows if row["regression"]]
+    for row in rows:
+        flag = "  REGRESSION" if row["regression"] else ""
+        print(f"{row['name']}: {row['baseline']:.3f} -> {row['current']:.3f} ms ({row['change']:+.1%}){flag}")
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than {args.threshold:.0%} threshold")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
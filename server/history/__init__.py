@@ -0,0 +1,3 @@
+"""Analysis history storage package."""
+
+__all__ = ["store", "memory_store", "sqlite_store", "stats", "word_stats", "search_index", "export", "events", "contributions"]
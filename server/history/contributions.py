@@ -0,0 +1,75 @@
+"""
+Compact storage for per-record word contributions.
+
+As a dict, each record would hold one str key and one boxed float per
+contributing word: well over 100 bytes per entry. Instead, the memory
+backend keeps two parallel arrays per record: feature indices into a
+store-wide FeatureTable (each distinct word is stored once) and float32
+values, 8 bytes per entry. Only the top-k contributions by magnitude are
+kept (HISTORY_CONTRIBUTIONS_TOP_K, default 20, the same number /predict/
+returns). Deferred explanations are stored uncapped (capped=False): the
+worker already computed exactly as many as the request asked for, and an
+explain=full result should come back in full from GET /history/{id}.
+
+Indices point into the store's own table rather than the model's
+vocabulary, so they stay valid when the model is reloaded with a
+different vocabulary.
+"""
+import os
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+CONTRIBUTIONS_TOP_K = int(os.environ.get("HISTORY_CONTRIBUTIONS_TOP_K", "20"))
+
+# float32 keeps about 7 significant digits; rounding drops the float32
+# artifacts (0.1 -> 0.10000000149011612) from the JSON
+_DECIMALS = 6
+
+
+class FeatureTable:
+    """Append-only word <-> index table shared by every record in a store."""
+
+    def __init__(self):
+        self._index: Dict[str, int] = {}
+        self.words: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def intern(self, word: str) -> int:
+        index = self._index.get(word)
+        if index is None:
+            index = self._index[word] = len(self.words)
+            self.words.append(word)
+        return index
+
+    def clear(self) -> None:
+        self._index.clear()
+        self.words = []
+
+
+def top_k(contributions: Optional[dict], limit: Optional[int] = None,
+          capped: bool = True) -> List[Tuple[str, float]]:
+    """The limit largest contributions by absolute value, largest first (all of them if not capped)."""
+    items = sorted((contributions or {}).items(), key=lambda item: -abs(item[1]))
+    if not capped:
+        return items
+    limit = CONTRIBUTIONS_TOP_K if limit is None else limit
+    return items[:limit]
+
+
+def pack(contributions: Optional[dict], table: FeatureTable, limit: Optional[int] = None,
+         capped: bool = True) -> Tuple[array, array]:
+    """(feature indices, float32 values) for the top-k contributions."""
+    items = top_k(contributions, limit, capped)
+    return array("I", [table.intern(word) for word, _ in items]), array("f", [value for _, value in items])
+
+
+def unpack(indices: array, values: array, table: FeatureTable) -> dict:
+    words = table.words
+    return {words[index]: round(value, _DECIMALS) for index, value in zip(indices, values)}
+
+
+def compact_dict(contributions: Optional[dict], limit: Optional[int] = None, capped: bool = True) -> dict:
+    """Top-k contributions with values rounded like unpack(), for backends storing JSON."""
+    return {word: round(float(value), _DECIMALS) for word, value in top_k(contributions, limit, capped)}
@@ -0,0 +1,97 @@
+"""
+In-process broadcaster behind GET /history/events (server-sent events).
+
+The history store notifies the broadcaster once per change. The
+broadcaster then hands the event to every subscriber's bounded queue, so a
+new analysis costs O(subscribers) queue puts instead of every open Insights
+tab polling and recomputing on its own. A slow client whose queue is full
+loses its oldest events instead of holding up the others or growing memory.
+
+Events are per process: with several uvicorn workers, a subscriber only
+sees the changes made by the worker it is connected to.
+"""
+import asyncio
+import logging
+import threading
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One connected client: its event loop and bounded queue."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+
+    def offer(self, item: Tuple[str, dict]) -> None:
+        """Queue an event, dropping the oldest one if the client is behind (runs on self.loop)."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(item)
+
+    async def next(self, timeout: float) -> Optional[Tuple[str, dict]]:
+        """Next (event, data), or None if nothing arrived within timeout."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class EventBroadcaster:
+    """Fan events out to subscribers; publish() is safe to call from any thread."""
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        """Register a subscriber on the running event loop."""
+        subscription = Subscription(asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscribers.discard(subscription)
+        if subscription.dropped:
+            logger.info(f"Event subscriber disconnected after dropping {subscription.dropped} events")
+
+    def publish(self, event: str, data: dict) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.offer, (event, data))
+            except RuntimeError:
+                # the subscriber's loop has closed
+                self.unsubscribe(subscription)
+
+
+_broadcaster = EventBroadcaster()
+
+
+def get_broadcaster() -> EventBroadcaster:
+    return _broadcaster
+
+
+def on_history_change(store, event: str, data: dict) -> None:
+    """
+    HistoryStore listener: publish the change, followed by the new summary
+    (O(1) to compute, see history/stats.py). Does nothing without subscribers.
+    """
+    if not _broadcaster.subscriber_count:
+        return
+    _broadcaster.publish(event, data)
+    _broadcaster.publish("summary", store.summary())
@@ -0,0 +1,60 @@
+"""
+Streaming serializers for GET /history/export.
+
+Both take an iterator of records and yield text chunks, so a
+StreamingResponse can send any amount of history while only one chunk of
+rows is held in memory at a time.
+"""
+import csv
+import io
+import json
+from typing import Iterable, Iterator, List
+
+RECORD_FIELDS = ["id", "text", "prediction", "confidence", "timestamp", "user_feedback", "word_contributions",
+                 "model_version"]
+
+# rows per yielded chunk
+CHUNK_ROWS = 500
+
+
+def _value(record: dict, field: str):
+    value = record.get(field)
+    if field == "timestamp" and value is not None and not isinstance(value, str):
+        return value.isoformat()
+    return value
+
+
+def iter_ndjson(records: Iterable[dict], fields: List[str]) -> Iterator[str]:
+    """One JSON object per line."""
+    lines = []
+    for record in records:
+        lines.append(json.dumps({field: _value(record, field) for field in fields}))
+        if len(lines) == CHUNK_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def iter_csv(records: Iterable[dict], fields: List[str]) -> Iterator[str]:
+    """CSV with a header row; word_contributions is written as a JSON string."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    rows = 0
+    for record in records:
+        row = []
+        for field in fields:
+            value = _value(record, field)
+            if field == "word_contributions":
+                value = json.dumps(value or {})
+            row.append("" if value is None else value)
+        writer.writerow(row)
+        rows += 1
+        if rows == CHUNK_ROWS:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue()
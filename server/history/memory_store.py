@@ -0,0 +1,324 @@
+"""
+Thread-safe, bounded in-process history store.
+
+Records live in an id -> record dict for O(1) lookup, plus an id-ordered
+list used as a ring buffer: once the entry or memory cap is reached the
+oldest records are evicted. Ids come from a monotonically increasing
+counter, so they are never reused after deletes or evictions.
+
+The FeatureTable of contribution words only grows as records are added, so
+it is rebuilt from the live records whenever _order is compacted; words of
+evicted, deleted or re-explained records (e.g. from an earlier model
+version) are dropped then. Records are read under the lock, since a rebuild
+renumbers their indices.
+"""
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from datetime import datetime
+from typing import Collection, Iterator, List, Optional, Tuple
+
+from history.contributions import FeatureTable, pack, unpack
+from history.search_index import InvertedIndex, substring_of
+from history.stats import HistoryStats
+from history.store import HistoryStore, project
+from history.word_stats import WordCounts
+
+
+class AnalysisRecord:
+    """
+    One stored analysis; __slots__ keeps per-record overhead small.
+
+    Word contributions are kept as parallel arrays of FeatureTable indices
+    and float32 values (see history/contributions.py).
+    """
+
+    __slots__ = ("id", "text", "prediction", "confidence", "timestamp", "user_feedback", "contrib_indices",
+                 "contrib_values", "model_version", "size")
+
+    def __init__(self, id, text, prediction, confidence, timestamp, contrib_indices, contrib_values,
+                 model_version=None):
+        self.id = id
+        self.text = text
+        self.prediction = prediction
+        self.confidence = confidence
+        self.timestamp = timestamp
+        self.user_feedback = None
+        self.contrib_indices = contrib_indices
+        self.contrib_values = contrib_values
+        self.model_version = model_version
+        self.size = 0
+
+    def to_dict(self, table: FeatureTable, fields: Optional[Collection[str]] = None) -> dict:
+        """The record as a dict; contributions are only decoded if fields asks for them."""
+        if fields is None or "word_contributions" in fields:
+            contributions = unpack(self.contrib_indices, self.contrib_values, table)
+        else:
+            contributions = None
+        return project({
+            "id": self.id,
+            "text": self.text,
+            "prediction": self.prediction,
+            "confidence": self.confidence,
+            "timestamp": self.timestamp,
+            "user_feedback": self.user_feedback,
+            "word_contributions": contributions,
+            "model_version": self.model_version,
+        }, fields)
+
+    def estimate_size(self) -> int:
+        """Approximate bytes held by this record (shared FeatureTable words not included)."""
+        size = 200 + sys.getsizeof(self.text) + sys.getsizeof(self.prediction)
+        if self.user_feedback:
+            size += sys.getsizeof(self.user_feedback)
+        size += sys.getsizeof(self.contrib_indices) + sys.getsizeof(self.contrib_values)
+        return size
+
+
+# what the stats and word counters read from a removed record
+_COUNTER_FIELDS = ("text", "prediction", "confidence", "timestamp")
+
+
+class MemoryHistoryStore(HistoryStore):
+    """In-memory HistoryStore capped by entry count and approximate bytes."""
+
+    def __init__(self, max_entries: int = 100000, max_bytes: int = 256 * 1024 * 1024):
+        super().__init__()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._records = {}  # id -> AnalysisRecord
+        self._order = []  # ids in insertion order; deleted ids are skipped lazily
+        self._head = 0  # index of the oldest possibly-live id in _order
+        self._next_id = 1
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._stats = HistoryStats()
+        self._words = WordCounts()
+        self._index = InvertedIndex()
+        self._features = FeatureTable()
+        self.evictions = 0
+
+    # -- internal helpers (call with the lock held) --
+
+    def _live_ids(self, start: int = None) -> Iterator[int]:
+        records = self._records
+        for index in range(self._head if start is None else max(start, self._head), len(self._order)):
+            analysis_id = self._order[index]
+            if analysis_id in records:
+                yield analysis_id
+
+    def _compact(self) -> None:
+        """Drop evicted/deleted ids from _order once they make up half of it."""
+        if len(self._order) - len(self._records) > len(self._order) // 2:
+            self._order = [analysis_id for analysis_id in self._order[self._head:] if analysis_id in self._records]
+            self._head = 0
+            self._rebuild_features()
+
+    def _rebuild_features(self) -> None:
+        """Re-intern the live records' contribution words into a fresh FeatureTable."""
+        words = self._features.words
+        features = FeatureTable()
+        for record in self._records.values():
+            record.contrib_indices = array("I", [features.intern(words[index]) for index in record.contrib_indices])
+        self._features = features
+
+    def _remove(self, analysis_id: int) -> Optional[AnalysisRecord]:
+        record = self._records.pop(analysis_id, None)
+        if record is not None:
+            self._bytes -= record.size
+            saved = record.to_dict(self._features, _COUNTER_FIELDS)
+            self._stats.on_delete(saved)
+            self._words.on_delete(saved)
+            self._index.remove(analysis_id, record.text)
+        return record
+
+    def _evict(self, keep: Optional[int] = None) -> List[int]:
+        """
+        Drop the oldest records until within limits, never the record keep
+        (the one just updated); returns their ids, to notify once unlocked.
+        """
+        evicted = []
+        position = self._head
+        while position < len(self._order) and (
+                len(self._records) > self.max_entries or self._bytes > self.max_bytes):
+            analysis_id = self._order[position]
+            position += 1
+            if analysis_id != keep and self._remove(analysis_id) is not None:
+                self.evictions += 1
+                evicted.append(analysis_id)
+        while self._head < position and self._order[self._head] not in self._records:
+            self._head += 1
+        self._compact()
+        return evicted
+
+    def _notify_evicted(self, evicted: List[int]) -> None:
+        for analysis_id in evicted:
+            self._notify("deleted", {"id": analysis_id})
+
+    # -- HistoryStore interface --
+
+    def add(self, text, prediction, confidence, word_contributions, timestamp=None, model_version=None) -> dict:
+        with self._lock:
+            indices, values = pack(word_contributions, self._features)
+            record = AnalysisRecord(
+                self._next_id, text, prediction, float(confidence), timestamp or datetime.now(), indices, values,
+                model_version,
+            )
+            self._next_id += 1
+            record.size = record.estimate_size()
+            self._records[record.id] = record
+            self._order.append(record.id)
+            self._bytes += record.size
+            saved = record.to_dict(self._features)
+            self._stats.on_add(saved)
+            self._words.on_add(saved)
+            self._index.add(record.id, text)
+            evicted = self._evict()
+        self._notify("analysis", saved)
+        self._notify_evicted(evicted)
+        return saved
+
+    def get(self, analysis_id: int, fields: Optional[Collection[str]] = None) -> Optional[dict]:
+        with self._lock:
+            record = self._records.get(analysis_id)
+            return record.to_dict(self._features, fields) if record is not None else None
+
+    def count(self) -> int:
+        return len(self._records)
+
+    def list(self, limit: int, offset: int = 0, fields: Optional[Collection[str]] = None) -> List[dict]:
+        with self._lock:
+            items = []
+            for position, analysis_id in enumerate(self._live_ids()):
+                if position >= offset + limit:
+                    break
+                if position >= offset:
+                    items.append(self._records[analysis_id].to_dict(self._features, fields))
+            return items
+
+    def list_after(self, cursor: Optional[int], limit: int,
+                   fields: Optional[Collection[str]] = None) -> Tuple[List[dict], Optional[int]]:
+        with self._lock:
+            # ids are appended in increasing order, so _order is sorted
+            start = bisect_right(self._order, cursor) if cursor is not None else None
+            items = []
+            has_more = False
+            for analysis_id in self._live_ids(start):
+                if len(items) == limit:
+                    has_more = True
+                    break
+                items.append(self._records[analysis_id].to_dict(self._features, fields))
+            next_cursor = items[-1]["id"] if items and has_more else None
+            return items, next_cursor
+
+    def update_feedback(self, analysis_id: int, feedback: str) -> Optional[dict]:
+        with self._lock:
+            record = self._records.get(analysis_id)
+            if record is None:
+                return None
+            record.user_feedback = feedback
+            old_size, record.size = record.size, record.estimate_size()
+            self._bytes += record.size - old_size
+            evicted = self._evict(keep=analysis_id)
+            updated = record.to_dict(self._features)
+        self._notify("feedback", updated)
+        self._notify_evicted(evicted)
+        return updated
+
+    def set_word_contributions(self, analysis_id: int, word_contributions: dict) -> Optional[dict]:
+        with self._lock:
+            record = self._records.get(analysis_id)
+            if record is None:
+                return None
+            record.contrib_indices, record.contrib_values = pack(word_contributions, self._features, capped=False)
+            old_size, record.size = record.size, record.estimate_size()
+            self._bytes += record.size - old_size
+            evicted = self._evict(keep=analysis_id)
+            updated = record.to_dict(self._features)
+        self._notify("explained", updated)
+        self._notify_evicted(evicted)
+        return updated
+
+    def delete(self, analysis_id: int) -> bool:
+        with self._lock:
+            removed = self._remove(analysis_id) is not None
+            if removed:
+                self._compact()
+        if removed:
+            self._notify("deleted", {"id": analysis_id})
+        return removed
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._records)
+            self._records.clear()
+            self._order = []
+            self._head = 0
+            self._bytes = 0
+            self._stats.on_clear()
+            self._words.on_clear()
+            self._index.clear()
+            self._features.clear()
+        self._notify("cleared", {"removed": count})
+        return count
+
+    def _text_of(self, analysis_id: int) -> Optional[str]:
+        record = self._records.get(analysis_id)
+        return record.text if record is not None else None
+
+    def search(self, query: str, limit: int, fields: Optional[Collection[str]] = None) -> List[dict]:
+        ids = self._index.search(query, limit, self._text_of)
+        if ids is not None:
+            with self._lock:
+                records = (self._records.get(analysis_id) for analysis_id in ids)
+                return [record.to_dict(self._features, fields) for record in records if record is not None]
+
+        # no indexable words (e.g. punctuation only): substring scan
+        query_lower = substring_of(query)
+        found = []
+        for record in self._snapshot():
+            if query_lower in record.text.lower():
+                found.append(record)
+                if len(found) == limit:
+                    break
+        with self._lock:
+            return [record.to_dict(self._features, fields) for record in found]
+
+    def iter_records(self) -> Iterator[dict]:
+        # copy out 1000 records at a time so long iterations (exports) don't
+        # hold the lock or materialize the whole history
+        cursor = 0
+        while True:
+            with self._lock:
+                chunk = []
+                for analysis_id in self._live_ids(bisect_right(self._order, cursor)):
+                    chunk.append(self._records[analysis_id].to_dict(self._features))
+                    if len(chunk) == 1000:
+                        break
+            if not chunk:
+                return
+            yield from chunk
+            cursor = chunk[-1]["id"]
+
+    def summary(self) -> dict:
+        return self._stats.summary()
+
+    def distinct_words(self, limit: int = 40, min_count: int = 2) -> dict:
+        return self._words.distinct_words(limit, min_count)
+
+    def _snapshot(self) -> List[AnalysisRecord]:
+        with self._lock:
+            return [self._records[analysis_id] for analysis_id in self._live_ids()]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._records),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "indexed_words": len(self._index),
+                "contribution_features": len(self._features),
+            }
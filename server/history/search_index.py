@@ -0,0 +1,173 @@
+"""
+Token-level inverted index over analysis text.
+
+Backs /history/search for the in-memory store (the SQLite store uses FTS5
+with the same query syntax):
+
+    vaccine chip      every term must match (AND); each term also matches
+                      longer words it is a prefix of ("vacc" -> "vaccine")
+    "microchip in"    quoted: exact substring (phrase) match
+
+Term results are ranked by tf-idf of the matched words, newest first on
+ties, and only the intersected postings are scored, never the whole
+history. Phrases use the index to narrow candidates, then check the
+substring on those texts.
+"""
+import heapq
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from typing import Callable, Dict, List, Optional
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def parse_query(query: str):
+    """
+    Split a search query into index terms.
+
+    Returns:
+        (terms, phrase) where terms are the words to prefix-match and phrase
+        is the lowercased quoted text (None for an unquoted query)
+    """
+    query = query.strip().lower()
+    if not (len(query) >= 2 and query[0] == query[-1] == '"'):
+        return tokenize(query), None
+    phrase = query[1:-1]
+    terms = tokenize(phrase)
+    # every word after the first starts at a word boundary in the text, so it
+    # is a prefix of an indexed word; the first may be the tail of a longer one
+    if _WORD_RE.match(phrase):
+        terms = terms[1:]
+    return terms, phrase
+
+
+def substring_of(query: str) -> str:
+    """Lowercased text to look for when falling back to a substring scan."""
+    _, phrase = parse_query(query)
+    return phrase if phrase is not None else query.strip().lower()
+
+
+class InvertedIndex:
+    """word -> {analysis id: term frequency}, plus a sorted vocabulary for prefix lookups."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._vocabulary: List[str] = []  # sorted keys of _postings
+        self._documents = 0
+
+    def __len__(self) -> int:
+        return len(self._vocabulary)
+
+    def add(self, analysis_id: int, text: str) -> None:
+        counts = {}
+        for word in tokenize(text):
+            counts[word] = counts.get(word, 0) + 1
+        with self._lock:
+            self._documents += 1
+            for word, tf in counts.items():
+                postings = self._postings.get(word)
+                if postings is None:
+                    postings = self._postings[word] = {}
+                    insort(self._vocabulary, word)
+                postings[analysis_id] = tf
+
+    def remove(self, analysis_id: int, text: str) -> None:
+        with self._lock:
+            self._documents -= 1
+            for word in set(tokenize(text)):
+                postings = self._postings.get(word)
+                if postings is None:
+                    continue
+                postings.pop(analysis_id, None)
+                if not postings:
+                    del self._postings[word]
+                    del self._vocabulary[bisect_left(self._vocabulary, word)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings = {}
+            self._vocabulary = []
+            self._documents = 0
+
+    def _expand(self, term: str) -> List[str]:
+        """Indexed words starting with term."""
+        vocabulary = self._vocabulary
+        start = bisect_left(vocabulary, term)
+        end = start
+        while end < len(vocabulary) and vocabulary[end].startswith(term):
+            end += 1
+        return vocabulary[start:end]
+
+    def _idf(self, document_frequency: int) -> float:
+        return math.log(1 + self._documents / max(1, document_frequency))
+
+    def search(self, query: str, limit: int, text_of: Callable[[int], Optional[str]]) -> Optional[List[int]]:
+        """
+        Ids of matching analyses, best first.
+
+        Args:
+            query: Search query (see module docstring)
+            limit: Maximum number of ids to return
+            text_of: Returns the stored text for an id (used to verify phrases)
+
+        Returns:
+            Matching ids, or None when the index can't answer the query
+            (no word characters, or a one-word phrase) and the caller should
+            fall back to a substring scan
+        """
+        terms, phrase = parse_query(query)
+        if not terms:
+            return None
+
+        with self._lock:
+            # (postings size, idf, matching words) per term, cheapest first;
+            # the summed postings size doubles as the term's document frequency
+            plans = []
+            for term in set(terms):
+                words = self._expand(term)
+                size = sum(len(self._postings[word]) for word in words)
+                plans.append((size, self._idf(size), words))
+            plans.sort(key=lambda plan: plan[0])
+
+            scores = {}
+            _, idf, words = plans[0]
+            for word in words:
+                for analysis_id, tf in self._postings[word].items():
+                    scores[analysis_id] = scores.get(analysis_id, 0.0) + tf * idf
+            for size, idf, words in plans[1:]:
+                if not scores:
+                    break
+                postings = [self._postings[word] for word in words]
+                narrowed = {}
+                if size <= len(scores) * len(words):
+                    # walk this term's postings
+                    for word_postings in postings:
+                        for analysis_id, tf in word_postings.items():
+                            if analysis_id in scores:
+                                narrowed[analysis_id] = narrowed.get(analysis_id, scores[analysis_id]) + tf * idf
+                else:
+                    # few candidates left: probe them instead of walking a huge prefix
+                    for analysis_id, score in scores.items():
+                        tf = sum(word_postings.get(analysis_id, 0) for word_postings in postings)
+                        if tf:
+                            narrowed[analysis_id] = score + tf * idf
+                scores = narrowed
+
+        if phrase is not None:
+            matches = []
+            for analysis_id in sorted(scores):
+                text = text_of(analysis_id)
+                if text is not None and phrase in text.lower():
+                    matches.append(analysis_id)
+                    if len(matches) == limit:
+                        break
+            return matches
+
+        return heapq.nlargest(limit, scores, key=lambda analysis_id: (scores[analysis_id], analysis_id))
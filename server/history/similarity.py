@@ -0,0 +1,277 @@
+"""
+Near-duplicate lookup over past analyses (MinHash + LSH).
+
+Reposted misinformation usually differs from the original by an emoji, a
+swapped word or another link, so the exact-text prediction cache misses
+it. Each analysis's preprocessed text (model.preprocess_text, which
+drops emoji; links and mentions are left out as well) is cut
+into overlapping 5-character shingles and summarised as a MinHash
+signature. The estimated Jaccard similarity of two texts is the fraction
+of equal signature positions.
+
+Signatures are split into bands. Texts sharing any whole band land in
+the same bucket, so a lookup only compares against those candidates
+instead of the whole history. With 8 bands of 8 rows, a pair at
+similarity 0.9 becomes a candidate 99% of the time; at 0.5, 3% of the time.
+
+The index follows the history store through a listener (added on
+"analysis", dropped on "deleted", emptied on "cleared") and keeps at most
+NEAR_DUPLICATE_MAX_ENTRIES signatures, evicting the least recently
+matched first. A match whose record has left the store is dropped at
+lookup time. Like the prediction cache, the index is per worker process.
+
+Configuration (environment):
+    NEAR_DUPLICATE_THRESHOLD    similarity needed to reuse a result (default 0.9)
+    NEAR_DUPLICATE_MAX_ENTRIES  signatures kept (default 20000; 0 disables)
+"""
+import logging
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Collection, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from history.store import HistoryStore, get_history_store
+from model.normalizer import normalize_text
+
+logger = logging.getLogger(__name__)
+
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+
+# Placeholders model.preprocess_text leaves for links and mentions: a
+# repost with a different (or no) link is still the same text
+_PLACEHOLDER_RE = re.compile(r"\s*\b(?:URL_PLACEHOLDER|USER_MENTION)\b")
+
+# Largest prime below 2**32: (a * x + b) stays below 2**64 for 32-bit x
+_PRIME = np.uint64(4294967291)
+
+
+class NearDuplicateIndex:
+    """
+    Thread-safe MinHash/LSH index of record id -> signature.
+
+    Args:
+        num_perm: Signature length (hash functions)
+        bands: LSH bands; num_perm must be a multiple of it
+        shingle_size: Characters per shingle
+        max_entries: Signatures kept before the least recently used is evicted (0 disables)
+        seed: Seed for the hash function parameters
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 8, shingle_size: int = 5,
+                 max_entries: int = 20000, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.max_entries = max_entries
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.randint(0, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+        # id -> signature bytes, least recently used first
+        self._signatures: "OrderedDict[int, bytes]" = OrderedDict()
+        # one dict per band: band hash -> id, or a list of ids on collisions
+        self._buckets: List[Dict[int, object]] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.hits = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature (uint32, num_perm values) of a raw text."""
+        processed = _PLACEHOLDER_RE.sub("", normalize_text(text)).strip()
+        size = self.shingle_size
+        if len(processed) <= size:
+            shingles = {processed}
+        else:
+            shingles = {processed[i:i + size] for i in range(len(processed) - size + 1)}
+        # crc32 rather than the salted str hash: similarities stay the same across restarts
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        return ((self._a * hashes + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        # bytes hashes are salted per process, which is fine for bucket keys
+        return [hash(band.tobytes()) for band in signature.reshape(self.bands, self.rows)]
+
+    def add(self, record_id: int, text: str) -> None:
+        if not self.enabled:
+            return
+        signature = self.signature(text)
+        with self._lock:
+            if record_id in self._signatures:
+                self._remove_locked(record_id)
+            self._signatures[record_id] = signature.tobytes()
+            for buckets, key in zip(self._buckets, self._band_keys(signature)):
+                current = buckets.get(key)
+                if current is None:
+                    buckets[key] = record_id
+                elif isinstance(current, list):
+                    current.append(record_id)
+                else:
+                    buckets[key] = [current, record_id]
+            while len(self._signatures) > self.max_entries:
+                self._remove_locked(next(iter(self._signatures)))
+                self.evictions += 1
+
+    def _remove_locked(self, record_id: int) -> None:
+        signature = np.frombuffer(self._signatures.pop(record_id), dtype=np.uint32)
+        for buckets, key in zip(self._buckets, self._band_keys(signature)):
+            current = buckets.get(key)
+            if isinstance(current, list):
+                if record_id in current:
+                    current.remove(record_id)
+                if len(current) == 1:
+                    buckets[key] = current[0]
+            elif current == record_id:
+                del buckets[key]
+
+    def remove(self, record_id: int) -> None:
+        with self._lock:
+            if record_id in self._signatures:
+                self._remove_locked(record_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._signatures.clear()
+            self._buckets = [{} for _ in range(self.bands)]
+
+    def query(self, text: str, threshold: float, limit: int = 5) -> List[Tuple[int, float]]:
+        """
+        Indexed records whose estimated similarity to text is at least threshold.
+
+        Returns:
+            (record id, similarity) pairs, most similar first
+        """
+        if not self.enabled:
+            return []
+        signature = self.signature(text)
+        keys = self._band_keys(signature)
+        with self._lock:
+            self.lookups += 1
+            candidates = set()
+            for buckets, key in zip(self._buckets, keys):
+                current = buckets.get(key)
+                if isinstance(current, list):
+                    candidates.update(current)
+                elif current is not None:
+                    candidates.add(current)
+            matches = []
+            for record_id in candidates:
+                other = np.frombuffer(self._signatures[record_id], dtype=np.uint32)
+                similarity = float(np.count_nonzero(other == signature)) / self.num_perm
+                if similarity >= threshold:
+                    matches.append((record_id, similarity))
+            matches.sort(key=lambda match: (-match[1], -match[0]))
+            for record_id, _ in matches[:limit]:
+                self._signatures.move_to_end(record_id)
+        return matches[:limit]
+
+    def record_hit(self) -> None:
+        """Count a lookup whose result was reused."""
+        with self._lock:
+            self.hits += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._signatures),
+                "max_entries": self.max_entries,
+                "buckets": sum(len(buckets) for buckets in self._buckets),
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "threshold": NEAR_DUPLICATE_THRESHOLD,
+            }
+
+    def on_history_change(self, store: HistoryStore, event: str, data: dict) -> None:
+        """HistoryStore listener keeping the index in step with the history."""
+        if event == "analysis":
+            self.add(data["id"], data["text"])
+        elif event == "deleted":
+            self.remove(data["id"])
+        elif event == "cleared":
+            self.clear()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_similarity_index() -> NearDuplicateIndex:
+    """
+    Process-wide index, created on first use from the most recent history
+    records (up to max_entries) and then kept current by a store listener.
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = NearDuplicateIndex(max_entries=int(os.environ.get("NEAR_DUPLICATE_MAX_ENTRIES", "20000")))
+                if index.enabled:
+                    store = get_history_store()
+                    store.add_listener(index.on_history_change)
+                    # the newest records, oldest first, so eviction order matches the history's
+                    offset = max(0, store.count() - index.max_entries)
+                    for record in store.list(index.max_entries, offset, fields=("text",)):
+                        index.add(record["id"], record["text"])
+                _index = index
+    return _index
+
+
+def find_similar(text: str, threshold: Optional[float] = None, limit: int = 5,
+                 fields: Optional[Collection[str]] = None) -> List[dict]:
+    """
+    History records similar to text, each with a "similarity" key.
+
+    Args:
+        text: Raw text to look up
+        threshold: Minimum estimated similarity (default NEAR_DUPLICATE_THRESHOLD)
+        limit: Maximum number of records
+        fields: Record fields to return (default: all)
+    """
+    index = get_similarity_index()
+    threshold = NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+    store = get_history_store()
+    results = []
+    for record_id, similarity in index.query(text, threshold, limit):
+        record = store.get(record_id, fields=fields)
+        if record is None:
+            # evicted from (or deleted behind the back of) this worker's history
+            index.remove(record_id)
+            continue
+        record["similarity"] = round(similarity, 4)
+        results.append(record)
+    return results
+
+
+def find_near_duplicate(text: str, model_version: Optional[str] = None) -> Optional[dict]:
+    """
+    The most similar past analysis at or above NEAR_DUPLICATE_THRESHOLD whose
+    result can be reused, or None.
+
+    Args:
+        text: Raw text about to be scored
+        model_version: Only reuse results from this model version (None: any)
+
+    Returns:
+        The history record plus "similarity", or None
+    """
+    index = get_similarity_index()
+    if not index.enabled:
+        return None
+    for record in find_similar(text, limit=3):
+        if model_version is not None and record["model_version"] != model_version:
+            continue
+        index.record_hit()
+        return record
+    return None
@@ -0,0 +1,471 @@
+"""
+Durable history store backed by SQLite.
+
+The database runs in WAL mode so readers in every uvicorn worker proceed
+while one writer commits. Each thread gets its own connection; sqlite3's
+statement cache means the fixed, parameterized queries below are prepared
+once per connection and reused.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Collection, Iterator, List, Optional, Tuple
+
+from history.contributions import compact_dict
+from history.search_index import parse_query, substring_of
+from history.store import HistoryStore, matches_filters
+from history.word_stats import RankCache, rank_distinct_words, tokenize_words, word_label
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    text TEXT NOT NULL,
+    prediction TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    timestamp TEXT NOT NULL,
+    user_feedback TEXT,
+    word_contributions TEXT,
+    model_version TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_analyses_timestamp ON analyses (timestamp);
+CREATE INDEX IF NOT EXISTS idx_analyses_prediction ON analyses (prediction);
+
+-- Running totals and per-minute insert counts, kept current by triggers so
+-- every worker reads the same O(1) summary
+CREATE TABLE IF NOT EXISTS analysis_stats (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total INTEGER NOT NULL,
+    fake INTEGER NOT NULL,
+    confidence_sum REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS analysis_minutes (
+    minute TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TRIGGER IF NOT EXISTS analyses_stats_insert AFTER INSERT ON analyses BEGIN
+    UPDATE analysis_stats SET
+        total = total + 1,
+        fake = fake + (instr(lower(NEW.prediction), 'fake') > 0),
+        confidence_sum = confidence_sum + NEW.confidence
+    WHERE id = 1;
+    INSERT INTO analysis_minutes (minute, count) VALUES (substr(NEW.timestamp, 1, 16), 1)
+        ON CONFLICT (minute) DO UPDATE SET count = count + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS analyses_stats_delete AFTER DELETE ON analyses BEGIN
+    UPDATE analysis_stats SET
+        total = total - 1,
+        fake = fake - (instr(lower(OLD.prediction), 'fake') > 0),
+        confidence_sum = confidence_sum - OLD.confidence
+    WHERE id = 1;
+    UPDATE analysis_minutes SET count = count - 1 WHERE minute = substr(OLD.timestamp, 1, 16);
+END;
+
+-- Per-label document frequencies for /history/distinct-words, updated by the
+-- store on add/delete/clear; version changes with every update so cached
+-- rankings in any worker can tell they are stale
+CREATE TABLE IF NOT EXISTS analysis_words (
+    word TEXT PRIMARY KEY,
+    real INTEGER NOT NULL DEFAULT 0,
+    fake INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS analysis_words_meta (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    total_real INTEGER NOT NULL,
+    total_fake INTEGER NOT NULL,
+    version INTEGER NOT NULL
+);
+"""
+
+# Full-text index over analysis text for /history/search, kept in sync by
+# triggers (text is never updated after insert). External content: the text
+# itself is only stored in analyses.
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS analyses_fts USING fts5(text, content='analyses', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS analyses_fts_insert AFTER INSERT ON analyses BEGIN
+    INSERT INTO analyses_fts (rowid, text) VALUES (NEW.id, NEW.text);
+END;
+CREATE TRIGGER IF NOT EXISTS analyses_fts_delete AFTER DELETE ON analyses BEGIN
+    INSERT INTO analyses_fts (analyses_fts, rowid, text) VALUES ('delete', OLD.id, OLD.text);
+END;
+"""
+
+# Seeds the counters from existing rows (databases created before the stats tables existed)
+_SEED_STATS = [
+    "INSERT INTO analysis_stats (id, total, fake, confidence_sum) "
+    "SELECT 1, COUNT(*), COALESCE(SUM(instr(lower(prediction), 'fake') > 0), 0), COALESCE(SUM(confidence), 0) "
+    "FROM analyses",
+    "DELETE FROM analysis_minutes",
+    "INSERT INTO analysis_minutes (minute, count) "
+    "SELECT substr(timestamp, 1, 16), COUNT(*) FROM analyses GROUP BY 1",
+]
+
+# Per-minute rows older than this are pruned (only the last 24 hours are read)
+_MINUTES_RETENTION = timedelta(hours=25)
+
+_COLUMNS = "id, text, prediction, confidence, timestamp, user_feedback, word_contributions, model_version"
+_FIELD_COLUMNS = _COLUMNS.split(", ")
+
+
+def _columns_for(fields: Optional[Collection[str]]) -> List[str]:
+    """Columns to select for a field projection (id is always included)."""
+    if fields is None:
+        return _FIELD_COLUMNS
+    return [column for column in _FIELD_COLUMNS if column == "id" or column in fields]
+
+
+def _to_partial(row, columns: List[str]) -> dict:
+    """Like _to_record, for rows holding only the given columns."""
+    if columns is _FIELD_COLUMNS:
+        return _to_record(row)
+    record = {}
+    for column, value in zip(columns, row):
+        if column == "timestamp":
+            value = datetime.fromisoformat(value)
+        elif column == "word_contributions":
+            value = json.loads(value) if value else {}
+        record[column] = value
+    return record
+
+
+def _to_record(row) -> dict:
+    return {
+        "id": row[0],
+        "text": row[1],
+        "prediction": row[2],
+        "confidence": row[3],
+        "timestamp": datetime.fromisoformat(row[4]),
+        "user_feedback": row[5],
+        "word_contributions": json.loads(row[6]) if row[6] else {},
+        "model_version": row[7],
+    }
+
+
+def _apply_words(conn: sqlite3.Connection, text: str, prediction: str, delta: int) -> None:
+    """Add (delta=1) or remove (delta=-1) one document's tokens from the word tables."""
+    label = word_label(prediction)
+    tokens = tokenize_words(text)
+    if label is None or not tokens:
+        return
+    # label is 'real' or 'fake', so it is safe to use as a column name
+    conn.executemany(
+        f"INSERT INTO analysis_words (word, {label}) VALUES (?, ?) "
+        f"ON CONFLICT (word) DO UPDATE SET {label} = {label} + excluded.{label}",
+        [(word, delta) for word in tokens],
+    )
+    if delta < 0:
+        conn.executemany(
+            "DELETE FROM analysis_words WHERE word = ? AND real <= 0 AND fake <= 0",
+            [(word,) for word in tokens],
+        )
+    conn.execute(
+        f"UPDATE analysis_words_meta SET total_{label} = total_{label} + ?, version = version + 1 WHERE id = 1",
+        (delta,),
+    )
+
+
+def _lower(text: Optional[str]) -> Optional[str]:
+    return text.lower() if text is not None else None
+
+
+def _escape_like(query: str) -> str:
+    return query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class SQLiteHistoryStore(HistoryStore):
+    """HistoryStore persisted to a SQLite database file."""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._inserts = 0
+        self._word_cache = RankCache()
+        self._word_cache_lock = threading.Lock()
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        if "model_version" not in {row[1] for row in conn.execute("PRAGMA table_info(analyses)")}:
+            # databases created before the model version was recorded
+            try:
+                conn.execute("ALTER TABLE analyses ADD COLUMN model_version TEXT")
+            except sqlite3.OperationalError as e:
+                # another worker added it first
+                if "duplicate column" not in str(e):
+                    raise
+        fts_existed = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'analyses_fts'"
+        ).fetchone() is not None
+        try:
+            conn.executescript(_FTS_SCHEMA)
+            self._fts = True
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5: search falls back to LIKE scans
+            logger.warning(f"Full-text search unavailable, using substring search: {e}")
+            self._fts = False
+        # IMMEDIATE so two workers starting together don't both seed the counters
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM analysis_stats WHERE id = 1").fetchone() is None:
+                for statement in _SEED_STATS:
+                    conn.execute(statement)
+            if conn.execute("SELECT 1 FROM analysis_words_meta WHERE id = 1").fetchone() is None:
+                conn.execute("DELETE FROM analysis_words")
+                conn.execute("INSERT INTO analysis_words_meta (id, total_real, total_fake, version) VALUES (1, 0, 0, 0)")
+                for text, prediction in conn.execute("SELECT text, prediction FROM analyses").fetchall():
+                    _apply_words(conn, text, prediction, 1)
+            if self._fts and not fts_existed:
+                conn.execute("INSERT INTO analyses_fts (analyses_fts) VALUES ('rebuild')")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WAL + NORMAL: commits are atomic and durable across app crashes,
+            # without an fsync on every insert
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # SQLite's lower() and LIKE only fold ASCII; searches compare
+            # py_lower(text) so "Éire" matches "éire" as in the memory store
+            conn.create_function("py_lower", 1, _lower, deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    def add(self, text, prediction, confidence, word_contributions, timestamp=None, model_version=None) -> dict:
+        timestamp = timestamp or datetime.now()
+        word_contributions = compact_dict(word_contributions)
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO analyses (text, prediction, confidence, timestamp, user_feedback, word_contributions, "
+                "model_version) VALUES (?, ?, ?, ?, NULL, ?, ?)",
+                (text, prediction, float(confidence), timestamp.isoformat(timespec="microseconds"),
+                 json.dumps(word_contributions, separators=(",", ":")), model_version),
+            )
+            _apply_words(conn, text, prediction, 1)
+            self._inserts += 1
+            if self._inserts % 1000 == 0:
+                conn.execute(
+                    "DELETE FROM analysis_minutes WHERE minute < ?",
+                    ((datetime.now() - _MINUTES_RETENTION).isoformat(timespec="minutes"),),
+                )
+        saved = {
+            "id": cursor.lastrowid,
+            "text": text,
+            "prediction": prediction,
+            "confidence": float(confidence),
+            "timestamp": timestamp,
+            "user_feedback": None,
+            "word_contributions": word_contributions,
+            "model_version": model_version,
+        }
+        self._notify("analysis", saved)
+        return saved
+
+    def get(self, analysis_id: int, fields: Optional[Collection[str]] = None) -> Optional[dict]:
+        columns = _columns_for(fields)
+        row = self._connection().execute(
+            f"SELECT {', '.join(columns)} FROM analyses WHERE id = ?", (analysis_id,)
+        ).fetchone()
+        return _to_partial(row, columns) if row else None
+
+    def count(self) -> int:
+        # maintained by the stats triggers, so no table scan
+        return self._connection().execute("SELECT total FROM analysis_stats WHERE id = 1").fetchone()[0]
+
+    def list(self, limit: int, offset: int = 0, fields: Optional[Collection[str]] = None) -> List[dict]:
+        columns = _columns_for(fields)
+        rows = self._connection().execute(
+            f"SELECT {', '.join(columns)} FROM analyses ORDER BY id LIMIT ? OFFSET ?", (limit, offset)
+        ).fetchall()
+        return [_to_partial(row, columns) for row in rows]
+
+    def list_after(self, cursor: Optional[int], limit: int,
+                   fields: Optional[Collection[str]] = None) -> Tuple[List[dict], Optional[int]]:
+        columns = _columns_for(fields)
+        # fetch one extra row to know whether another page exists
+        rows = self._connection().execute(
+            f"SELECT {', '.join(columns)} FROM analyses WHERE id > ? ORDER BY id LIMIT ?",
+            (cursor or 0, limit + 1),
+        ).fetchall()
+        items = [_to_partial(row, columns) for row in rows[:limit]]
+        next_cursor = items[-1]["id"] if len(rows) > limit and items else None
+        return items, next_cursor
+
+    def update_feedback(self, analysis_id: int, feedback: str) -> Optional[dict]:
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE analyses SET user_feedback = ? WHERE id = ?", (feedback, analysis_id)
+            )
+        if cursor.rowcount == 0:
+            return None
+        updated = self.get(analysis_id)
+        if updated is not None:
+            self._notify("feedback", updated)
+        return updated
+
+    def set_word_contributions(self, analysis_id: int, word_contributions: dict) -> Optional[dict]:
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE analyses SET word_contributions = ? WHERE id = ?",
+                (json.dumps(compact_dict(word_contributions, capped=False), separators=(",", ":")), analysis_id)
+            )
+        if cursor.rowcount == 0:
+            return None
+        updated = self.get(analysis_id)
+        if updated is not None:
+            self._notify("explained", updated)
+        return updated
+
+    def delete(self, analysis_id: int) -> bool:
+        conn = self._connection()
+        # IMMEDIATE takes the write lock before the read, so two workers
+        # deleting the same id can't both see the row and decrement its words twice
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT text, prediction FROM analyses WHERE id = ?", (analysis_id,)).fetchone()
+            removed = row is not None and conn.execute(
+                "DELETE FROM analyses WHERE id = ?", (analysis_id,)
+            ).rowcount == 1
+            if removed:
+                _apply_words(conn, row[0], row[1], -1)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if removed:
+            self._notify("deleted", {"id": analysis_id})
+        return removed
+
+    def clear(self) -> int:
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute("DELETE FROM analyses")
+            conn.execute("DELETE FROM analysis_minutes")
+            conn.execute("DELETE FROM analysis_words")
+            conn.execute("UPDATE analysis_words_meta SET total_real = 0, total_fake = 0, version = version + 1 WHERE id = 1")
+        self._notify("cleared", {"removed": cursor.rowcount})
+        return cursor.rowcount
+
+    def search(self, query: str, limit: int, fields: Optional[Collection[str]] = None) -> List[dict]:
+        conn = self._connection()
+        columns = _columns_for(fields)
+        selected = ", ".join(columns)
+        terms, phrase = parse_query(query)
+        # every term is a quoted prefix query, ANDed together
+        match = " ".join('"' + term.replace('"', '""') + '"*' for term in terms)
+        if self._fts and terms and phrase is None:
+            rows = conn.execute(
+                f"SELECT {', '.join(f'a.{column}' for column in columns)} "
+                "FROM analyses_fts f JOIN analyses a ON a.id = f.rowid "
+                "WHERE analyses_fts MATCH ? ORDER BY f.rank, a.id DESC LIMIT ?",
+                (match, limit),
+            ).fetchall()
+        elif self._fts and terms:
+            # phrase: the index narrows the candidates, LIKE checks the substring
+            rows = conn.execute(
+                f"SELECT {selected} FROM analyses WHERE id IN "
+                "(SELECT rowid FROM analyses_fts WHERE analyses_fts MATCH ?) "
+                "AND py_lower(text) LIKE ? ESCAPE '\\' ORDER BY id LIMIT ?",
+                (match, f"%{_escape_like(phrase)}%", limit),
+            ).fetchall()
+        else:
+            # both sides lowercased: substring_of() lowercases the query
+            rows = conn.execute(
+                f"SELECT {selected} FROM analyses WHERE py_lower(text) LIKE ? ESCAPE '\\' ORDER BY id LIMIT ?",
+                (f"%{_escape_like(substring_of(query))}%", limit),
+            ).fetchall()
+        return [_to_partial(row, columns) for row in rows]
+
+    def iter_records(self) -> Iterator[dict]:
+        # page through by id so a long iteration never holds a read transaction open
+        cursor = 0
+        while True:
+            rows = self._connection().execute(
+                f"SELECT {_COLUMNS} FROM analyses WHERE id > ? ORDER BY id LIMIT 1000", (cursor,)
+            ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield _to_record(row)
+            cursor = rows[-1][0]
+
+    def iter_filtered(self, start=None, end=None, label=None, has_feedback=None) -> Iterator[dict]:
+        # time range and feedback go into the query (timestamps are ISO strings,
+        # which sort chronologically); the label is checked per record
+        conditions = ["id > ?"]
+        params = []
+        if start is not None:
+            conditions.append("timestamp >= ?")
+            params.append(start.isoformat(timespec="microseconds"))
+        if end is not None:
+            conditions.append("timestamp < ?")
+            params.append(end.isoformat(timespec="microseconds"))
+        if has_feedback is not None:
+            conditions.append("user_feedback IS NOT NULL AND user_feedback != ''" if has_feedback
+                              else "(user_feedback IS NULL OR user_feedback = '')")
+        sql = f"SELECT {_COLUMNS} FROM analyses WHERE {' AND '.join(conditions)} ORDER BY id LIMIT 1000"
+
+        cursor = 0
+        while True:
+            rows = self._connection().execute(sql, (cursor, *params)).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                record = _to_record(row)
+                if label is None or matches_filters(record, label=label):
+                    yield record
+            cursor = rows[-1][0]
+
+    def summary(self) -> dict:
+        conn = self._connection()
+        total, fake, confidence_sum = conn.execute(
+            "SELECT total, fake, confidence_sum FROM analysis_stats WHERE id = 1"
+        ).fetchone()
+        if not total:
+            return {
+                "total_analyses": 0,
+                "fake_count": 0,
+                "real_count": 0,
+                "avg_confidence": 0,
+                "recent_analyses": 0
+            }
+        cutoff = (datetime.now() - timedelta(hours=24)).isoformat(timespec="minutes")
+        recent = conn.execute(
+            "SELECT COALESCE(SUM(count), 0) FROM analysis_minutes WHERE minute >= ?", (cutoff,)
+        ).fetchone()[0]
+        return {
+            "total_analyses": total,
+            "fake_count": fake,
+            "real_count": total - fake,
+            "avg_confidence": round(confidence_sum / total, 3),
+            "recent_analyses": recent
+        }
+
+    def distinct_words(self, limit: int = 40, min_count: int = 2) -> dict:
+        conn = self._connection()
+        total_real, total_fake, version = conn.execute(
+            "SELECT total_real, total_fake, version FROM analysis_words_meta WHERE id = 1"
+        ).fetchone()
+        with self._word_cache_lock:
+            cached = self._word_cache.get(version, limit, min_count)
+        if cached is not None:
+            return cached
+        counts = conn.execute(
+            "SELECT word, real, fake FROM analysis_words WHERE real + fake >= ?", (min_count,)
+        ).fetchall()
+        result = rank_distinct_words(counts, total_real, total_fake, limit, min_count)
+        with self._word_cache_lock:
+            self._word_cache.put(version, limit, min_count, result)
+        return result
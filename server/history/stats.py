@@ -0,0 +1,129 @@
+"""
+Incrementally maintained history statistics.
+
+Totals, label counts and the confidence sum are adjusted on every insert,
+delete and clear, and the "last 24 hours" count comes from a ring of
+per-minute buckets, so a summary costs the same no matter how much
+history exists.
+"""
+import threading
+import time
+from datetime import datetime
+
+
+def is_fake(prediction: str) -> bool:
+    return "fake" in str(prediction).lower()
+
+
+class SlidingWindowCounter:
+    """
+    Count of events in the trailing window, kept in fixed time buckets.
+
+    Accurate to one bucket: events up to bucket_seconds older than the window
+    may still be counted.
+    """
+
+    def __init__(self, window_seconds: int = 24 * 3600, bucket_seconds: int = 60):
+        self.bucket_seconds = bucket_seconds
+        self._size = int(window_seconds // bucket_seconds) + 1
+        self._counts = [0] * self._size
+        self._buckets = [-1] * self._size  # bucket number currently held by each slot
+        self._expired_before = 0  # every bucket below this has been dropped
+        self._total = 0
+
+    def _bucket(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def _expire(self, now_bucket: int) -> None:
+        oldest = now_bucket - self._size + 1
+        if oldest - self._expired_before >= self._size:
+            # idle for longer than the whole window
+            self.reset()
+        else:
+            for bucket in range(self._expired_before, oldest):
+                slot = bucket % self._size
+                if self._buckets[slot] == bucket:
+                    self._total -= self._counts[slot]
+                    self._counts[slot] = 0
+                    self._buckets[slot] = -1
+        self._expired_before = max(self._expired_before, oldest)
+
+    def add(self, timestamp: float, delta: int = 1) -> None:
+        now_bucket = self._bucket(time.time())
+        self._expire(now_bucket)
+        bucket = min(self._bucket(timestamp), now_bucket)
+        if bucket < self._expired_before:
+            return
+        slot = bucket % self._size
+        if self._buckets[slot] != bucket:
+            if delta < 0:
+                return
+            self._buckets[slot] = bucket
+            self._counts[slot] = 0
+        self._counts[slot] += delta
+        self._total += delta
+
+    def count(self) -> int:
+        self._expire(self._bucket(time.time()))
+        return self._total
+
+    def reset(self) -> None:
+        self._counts = [0] * self._size
+        self._buckets = [-1] * self._size
+        self._total = 0
+
+
+def _epoch(timestamp) -> float:
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    return timestamp.timestamp()
+
+
+class HistoryStats:
+    """Running counters behind GET /history/stats/summary."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._recent = SlidingWindowCounter()
+        self.total = 0
+        self.fake = 0
+        self.confidence_sum = 0.0
+
+    def on_add(self, record: dict) -> None:
+        with self._lock:
+            self.total += 1
+            self.fake += is_fake(record["prediction"])
+            self.confidence_sum += record["confidence"]
+            self._recent.add(_epoch(record["timestamp"]))
+
+    def on_delete(self, record: dict) -> None:
+        with self._lock:
+            self.total -= 1
+            self.fake -= is_fake(record["prediction"])
+            self.confidence_sum -= record["confidence"]
+            self._recent.add(_epoch(record["timestamp"]), -1)
+
+    def on_clear(self) -> None:
+        with self._lock:
+            self.total = 0
+            self.fake = 0
+            self.confidence_sum = 0.0
+            self._recent.reset()
+
+    def summary(self) -> dict:
+        with self._lock:
+            if not self.total:
+                return {
+                    "total_analyses": 0,
+                    "fake_count": 0,
+                    "real_count": 0,
+                    "avg_confidence": 0,
+                    "recent_analyses": 0
+                }
+            return {
+                "total_analyses": self.total,
+                "fake_count": self.fake,
+                "real_count": self.total - self.fake,
+                "avg_confidence": round(self.confidence_sum / self.total, 3),
+                "recent_analyses": self._recent.count()
+            }
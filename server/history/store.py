@@ -0,0 +1,197 @@
+"""
+Pluggable storage for analysis history.
+
+Routes talk to a HistoryStore instead of a shared list. The backend is picked
+with the HISTORY_BACKEND environment variable:
+
+    memory  (default) in-process store capped by HISTORY_MAX_ENTRIES /
+            HISTORY_MAX_BYTES (oldest evicted first), lost on restart
+    sqlite  durable SQLite database at HISTORY_DB_PATH, shared by all workers
+"""
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Callable, Collection, Iterator, List, Optional, Tuple
+
+from history.word_stats import word_label
+
+logger = logging.getLogger(__name__)
+
+SERVER_DIR = os.path.dirname(os.path.dirname(__file__))
+DEFAULT_DB_PATH = os.path.join(SERVER_DIR, "history.db")
+
+
+class HistoryStore:
+    """
+    Interface every history backend implements.
+
+    Records are plain dicts with the keys id, text, prediction, confidence,
+    timestamp, user_feedback, word_contributions and model_version (None
+    for records saved before versions were recorded). Ids are positive
+    integers that increase with insertion order.
+
+    Listeners registered with add_listener() are called after each change
+    (outside any store lock) as listener(store, event, data), with event one
+    of "analysis" (the new record), "feedback" (the updated record),
+    "explained" (the record, after set_word_contributions), "deleted"
+    ({"id"}, also sent for records a bounded store evicts) or "cleared"
+    ({"removed"}).
+    """
+
+    def __init__(self):
+        self._listeners = []
+
+    def add_listener(self, listener: Callable[["HistoryStore", str, dict], None]) -> None:
+        self._listeners.append(listener)
+
+    def _notify(self, event: str, data: dict) -> None:
+        for listener in self._listeners:
+            try:
+                listener(self, event, data)
+            except Exception as e:
+                # a failing listener must never fail the write that triggered it
+                logger.error(f"History listener failed on {event}: {e}")
+
+    def add(self, text: str, prediction: str, confidence: float, word_contributions: dict,
+            timestamp: Optional[datetime] = None, model_version: Optional[str] = None) -> dict:
+        """Store a new analysis and return the saved record (with its id)."""
+        raise NotImplementedError
+
+    def get(self, analysis_id: int, fields: Optional[Collection[str]] = None) -> Optional[dict]:
+        """The record, restricted to fields (plus id) when given."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def list(self, limit: int, offset: int = 0, fields: Optional[Collection[str]] = None) -> List[dict]:
+        """
+        Records in id order, skipping the first offset (slower the deeper you
+        page). fields restricts each record to those keys (plus id), so
+        backends can skip decoding what isn't asked for.
+        """
+        raise NotImplementedError
+
+    def list_after(self, cursor: Optional[int], limit: int,
+                   fields: Optional[Collection[str]] = None) -> Tuple[List[dict], Optional[int]]:
+        """
+        Keyset pagination: up to limit records with id > cursor, in id order
+        (fields as for list()).
+
+        Returns:
+            (items, next_cursor) where next_cursor is None on the last page
+        """
+        raise NotImplementedError
+
+    def update_feedback(self, analysis_id: int, feedback: str) -> Optional[dict]:
+        """Set user feedback; returns the updated record, or None if not found."""
+        raise NotImplementedError
+
+    def set_word_contributions(self, analysis_id: int, word_contributions: dict) -> Optional[dict]:
+        """
+        Replace a record's word contributions (e.g. a deferred explanation);
+        returns the updated record, or None if not found. The contributions
+        are stored as given, without the HISTORY_CONTRIBUTIONS_TOP_K cap.
+        """
+        raise NotImplementedError
+
+    def delete(self, analysis_id: int) -> bool:
+        raise NotImplementedError
+
+    def clear(self) -> int:
+        """Remove every record; returns how many were removed."""
+        raise NotImplementedError
+
+    def search(self, query: str, limit: int, fields: Optional[Collection[str]] = None) -> List[dict]:
+        """
+        Case-insensitive search over analysis text, best matches first
+        (fields as for list()).
+
+        Words are ANDed and prefix-matched; a quoted query is matched as an
+        exact substring (see history/search_index.py).
+        """
+        raise NotImplementedError
+
+    def iter_records(self) -> Iterator[dict]:
+        """Iterate over all records in id order."""
+        raise NotImplementedError
+
+    def iter_filtered(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                      label: Optional[str] = None, has_feedback: Optional[bool] = None) -> Iterator[dict]:
+        """
+        Records in id order, optionally restricted to start <= timestamp < end,
+        a label ('real' or 'fake') and whether user feedback is present.
+        Backends can override this to push the filters into their queries.
+        """
+        for record in self.iter_records():
+            if matches_filters(record, start, end, label, has_feedback):
+                yield record
+
+    def summary(self) -> dict:
+        """
+        Totals behind GET /history/stats/summary: total_analyses, fake_count,
+        real_count, avg_confidence and recent_analyses (last 24 hours).
+        Backends keep these incrementally so the call is O(1).
+        """
+        raise NotImplementedError
+
+    def distinct_words(self, limit: int = 40, min_count: int = 2) -> dict:
+        """
+        Words ranked by real-vs-fake log-odds, for GET /history/distinct-words.
+        Backends keep per-label document frequencies incrementally (see
+        history/word_stats.py) instead of re-tokenizing the history.
+        """
+        raise NotImplementedError
+
+
+def project(record: dict, fields: Optional[Collection[str]]) -> dict:
+    """record restricted to fields; id is always kept (clients page by it)."""
+    if fields is None:
+        return record
+    return {key: value for key, value in record.items() if key == "id" or key in fields}
+
+
+def matches_filters(record: dict, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                    label: Optional[str] = None, has_feedback: Optional[bool] = None) -> bool:
+    timestamp = record["timestamp"]
+    if start is not None and timestamp < start:
+        return False
+    if end is not None and timestamp >= end:
+        return False
+    if label is not None and word_label(record["prediction"]) != label:
+        return False
+    if has_feedback is not None and bool(record["user_feedback"]) != has_feedback:
+        return False
+    return True
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def create_store(backend: Optional[str] = None) -> HistoryStore:
+    backend = (backend or os.environ.get("HISTORY_BACKEND", "memory")).lower()
+    if backend == "sqlite":
+        from history.sqlite_store import SQLiteHistoryStore
+        return SQLiteHistoryStore(os.environ.get("HISTORY_DB_PATH", DEFAULT_DB_PATH))
+    if backend == "memory":
+        from history.memory_store import MemoryHistoryStore
+        return MemoryHistoryStore(
+            max_entries=int(os.environ.get("HISTORY_MAX_ENTRIES", "100000")),
+            max_bytes=int(os.environ.get("HISTORY_MAX_BYTES", str(256 * 1024 * 1024))),
+        )
+    raise ValueError(f"Unknown HISTORY_BACKEND: {backend!r} (expected 'memory' or 'sqlite')")
+
+
+def get_history_store() -> HistoryStore:
+    """Process-wide history store, created on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                from history.events import on_history_change
+                store = create_store()
+                store.add_listener(on_history_change)
+                _store = store
+    return _store
@@ -0,0 +1,192 @@
+"""
+Incrementally maintained per-label word document frequencies.
+
+Backs GET /history/distinct-words: each analysis adds (or, when deleted,
+removes) one count per distinct token to its label's table, so ranking
+words by log-odds never re-tokenizes the stored history. Ranked results
+are cached per (limit, min_count) and recomputed with a bounded heap only
+after the tables change.
+"""
+import heapq
+import math
+import re
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+# tokenization helper (simple, same as frontend)
+_TOKEN_RE = re.compile(r"\b[a-z0-9']+\b", re.I)
+
+PRIOR = 0.01
+
+
+def tokenize_words(text) -> List[str]:
+    """Distinct lowercase tokens of a text."""
+    if not text:
+        return []
+    return list({token.lower() for token in _TOKEN_RE.findall(str(text))})
+
+
+def word_label(prediction) -> Optional[str]:
+    """
+    'real' or 'fake' (best-effort), or None when the label is unknown.
+    Numeric labels follow model.postprocess_prediction: 0 is Real, 1 is Fake.
+    """
+    label_raw = str(prediction or "").lower()
+    if "fake" in label_raw or label_raw == "1" or label_raw == "false":
+        return "fake"
+    if "real" in label_raw or label_raw == "0" or label_raw == "true":
+        return "real"
+    return None
+
+
+def _logodds(count_real: int, count_fake: int, total_real: int, total_fake: int) -> float:
+    # avoid divide by zero: use totals minus A/B
+    denom_a = max(1e-9, (total_real - count_real + PRIOR))
+    denom_b = max(1e-9, (total_fake - count_fake + PRIOR))
+    odds_a = (count_real + PRIOR) / denom_a
+    odds_b = (count_fake + PRIOR) / denom_b
+    # signed log-odds: positive => associated with real, negative => fake
+    return math.log(max(1e-9, odds_a / odds_b))
+
+
+def rank_distinct_words(counts: Iterable[Tuple[str, int, int]], total_real: int, total_fake: int,
+                        limit: int = 40, min_count: int = 2) -> dict:
+    """
+    Rank words by absolute log-odds between the real and fake documents.
+
+    Args:
+        counts: (word, count_real, count_fake) document frequencies
+        total_real: Number of real documents that had at least one token
+        total_fake: Number of fake documents that had at least one token
+        limit: Number of words to return
+        min_count: Skip words seen in fewer documents than this
+
+    Returns:
+        The /history/distinct-words response body
+    """
+    total_real = max(1, total_real)
+    total_fake = max(1, total_fake)
+
+    def scored():
+        for word, count_real, count_fake in counts:
+            if count_real + count_fake < min_count:
+                continue
+            yield abs(_logodds(count_real, count_fake, total_real, total_fake)), word, count_real, count_fake
+
+    # only the top `limit` are kept, instead of sorting the whole vocabulary
+    top = []
+    for _, word, count_real, count_fake in heapq.nlargest(max(0, limit), scored(), key=lambda item: item[0]):
+        top.append({
+            "word": word,
+            "logodds": float(_logodds(count_real, count_fake, total_real, total_fake)),
+            "count_real": int(count_real),
+            "count_fake": int(count_fake),
+            "sum": int(count_real + count_fake)
+        })
+
+    # split into top_by_label for compatibility with frontend WordShiftDiverging
+    real_list = []
+    fake_list = []
+    for r in top:
+        if r["logodds"] >= 0:
+            real_list.append({"word": r["word"], "log_odds": float(r["logodds"]), "count": r["count_real"] or r["sum"]})
+        else:
+            # present fake side values as positive magnitude for chart but keep sign in items
+            fake_list.append({"word": r["word"], "log_odds": float(abs(r["logodds"])), "count": r["count_fake"] or r["sum"]})
+
+    return {
+        "items": top,
+        "top_by_label": {
+            "real": real_list,
+            "fake": fake_list
+        },
+        "total_real": total_real,
+        "total_fake": total_fake
+    }
+
+
+class RankCache:
+    """
+    Ranked results keyed by (limit, min_count), valid for one table version.
+
+    Any change to the counts bumps the version, which lazily invalidates
+    every cached ranking.
+    """
+
+    def __init__(self, max_entries: int = 32):
+        self.max_entries = max_entries
+        self._version = None
+        self._results = {}
+
+    def get(self, version, limit: int, min_count: int) -> Optional[dict]:
+        if version != self._version:
+            return None
+        return self._results.get((limit, min_count))
+
+    def put(self, version, limit: int, min_count: int, result: dict) -> None:
+        if version != self._version:
+            self._version = version
+            self._results = {}
+        if len(self._results) >= self.max_entries:
+            self._results.pop(next(iter(self._results)))
+        self._results[(limit, min_count)] = result
+
+
+class WordCounts:
+    """In-memory per-label document frequencies (used by MemoryHistoryStore)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._real = {}
+        self._fake = {}
+        self.total_real = 0
+        self.total_fake = 0
+        self._version = 0
+        self._cache = RankCache()
+
+    def _apply(self, record: dict, delta: int) -> None:
+        label = word_label(record["prediction"])
+        if label is None:
+            return
+        tokens = tokenize_words(record["text"])
+        if not tokens:
+            return
+        table = self._real if label == "real" else self._fake
+        with self._lock:
+            if label == "real":
+                self.total_real += delta
+            else:
+                self.total_fake += delta
+            for word in tokens:
+                count = table.get(word, 0) + delta
+                if count > 0:
+                    table[word] = count
+                else:
+                    table.pop(word, None)
+            self._version += 1
+
+    def on_add(self, record: dict) -> None:
+        self._apply(record, 1)
+
+    def on_delete(self, record: dict) -> None:
+        self._apply(record, -1)
+
+    def on_clear(self) -> None:
+        with self._lock:
+            self._real = {}
+            self._fake = {}
+            self.total_real = 0
+            self.total_fake = 0
+            self._version += 1
+
+    def distinct_words(self, limit: int = 40, min_count: int = 2) -> dict:
+        with self._lock:
+            cached = self._cache.get(self._version, limit, min_count)
+            if cached is not None:
+                return cached
+            real, fake = self._real, self._fake
+            counts = [(word, count, fake.get(word, 0)) for word, count in real.items()]
+            counts.extend((word, 0, count) for word, count in fake.items() if word not in real)
+            result = rank_distinct_words(counts, self.total_real, self.total_fake, limit, min_count)
+            self._cache.put(self._version, limit, min_count, result)
+            return result
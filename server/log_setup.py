@@ -0,0 +1,261 @@
+"""
+Central logging setup: a queue-based writer, structured events and
+per-event sampling.
+
+Request handlers put records on an in-memory queue, and a background
+QueueListener thread formats and writes them. Formatting is done in the
+writer thread, so the caller only pays for creating the record. If the
+queue fills up (e.g. stderr is blocked), records below ERROR are dropped
+and counted rather than stalling requests.
+
+Hot-path code logs named events with log_event(). Each event name has a
+sample rate, so "predict.completed" can be written for 1 in 100 requests.
+Events at ERROR and above are never sampled.
+
+Configuration (environment):
+    LOG_LEVEL          root level (default INFO)
+    LOG_FORMAT         "text" (default) or "json"
+    LOG_QUEUE_SIZE     records buffered before dropping (default 10000)
+    LOG_SAMPLE_RATES   per-event overrides, e.g. "predict.completed=0.1,history.get=1"
+    LOG_SAMPLE_DEFAULT rate for events without their own (default 1)
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+# Events emitted on every /predict/ or history read; others default to LOG_SAMPLE_DEFAULT
+DEFAULT_SAMPLE_RATES = {
+    "predict.request": 0.01,
+    "predict.completed": 0.01,
+    "predict.long_text": 0.1,
+    "model.batch": 0.01,
+    "model.score": 0.01,
+    "history.list": 0.1,
+    "history.get": 0.1,
+    "history.search": 0.1,
+    "history.stats": 0.1,
+    "history.similar": 0.1,
+    "predict.near_duplicate": 0.1,
+    "predict.rejected": 0.1,
+    "explain.dropped": 0.1,
+}
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse "event=rate,event=rate" into a dict, clamping rates to [0, 1]."""
+    rates = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, rate = item.split("=", 1)
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+class Sampler:
+    """Per-event sample rates; should_log() is a dict lookup and one random()."""
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None, default: float = 1.0):
+        self.rates = dict(rates or {})
+        self.default = default
+
+    def rate(self, event: str) -> float:
+        return self.rates.get(event, self.default)
+
+    def should_log(self, event: str, level: int) -> bool:
+        if level >= logging.ERROR:
+            return True
+        rate = self.rates.get(event, self.default)
+        return rate >= 1.0 or (rate > 0.0 and random.random() < rate)
+
+
+_sampler = Sampler(DEFAULT_SAMPLE_RATES)
+
+
+def log_event(log: logging.Logger, event: str, level: int = logging.INFO, exc_info=None, **fields) -> None:
+    """
+    Log a named event with key/value fields.
+
+    Nothing is formatted here: fields stay on the record until the writer
+    thread renders them. Pass plain values (numbers, short strings), since
+    they are read later.
+
+    Args:
+        log: Module logger
+        event: Dotted event name, also the sampling key (e.g. "predict.completed")
+        level: Logging level
+        exc_info: Attach the current exception's traceback
+        **fields: Structured fields
+    """
+    if not log.isEnabledFor(level) or not _sampler.should_log(event, level):
+        return
+    rate = _sampler.rate(event)
+    if rate < 1.0 and level < logging.ERROR:
+        # lets readers scale sampled counts back up
+        fields["sample_rate"] = rate
+    log.log(level, event, exc_info=exc_info, extra={"event": event, "fields": fields})
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    fields = dict(getattr(record, "fields", None) or {})
+    for key, value in vars(record).items():
+        if key not in _RECORD_ATTRS and key not in ("event", "fields"):
+            fields[key] = value
+    return fields
+
+
+def _format_value(value) -> str:
+    text = str(value)
+    if not text or any(char in text for char in ' ="\n'):
+        return json.dumps(text)
+    return text
+
+
+class TextFormatter(logging.Formatter):
+    """time LEVEL logger: message key=value ..."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = (
+            f"{datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds')} "
+            f"{record.levelname} {record.name}: {record.getMessage()}"
+        )
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={_format_value(value)}" for key, value in fields.items())
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line, for log shippers."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that hands records over unformatted and never blocks the
+    caller on a full queue, except briefly for errors.
+    """
+
+    def __init__(self, record_queue: queue.Queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+        self._formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stdlib version formats the message here, on the caller's
+        # thread. Only the traceback has to be rendered now, while the
+        # frames still exist.
+        if record.exc_info:
+            record.exc_text = self._formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.ERROR:
+                try:
+                    self.queue.put(record, timeout=1.0)
+                    return
+                except queue.Full:
+                    pass
+            self.dropped += 1
+
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional[_NonBlockingQueueHandler] = None
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None, stream=None) -> None:
+    """
+    Route the root logger through the background writer. Safe to call more
+    than once; later calls are ignored.
+
+    Args:
+        level: Root level name (default: LOG_LEVEL or INFO)
+        fmt: "text" or "json" (default: LOG_FORMAT or text)
+        stream: Where the writer thread writes (default: stderr)
+    """
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return
+
+        fmt = fmt or os.environ.get("LOG_FORMAT", "text")
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JSONFormatter() if fmt == "json" else TextFormatter())
+
+        _sampler.default = float(os.environ.get("LOG_SAMPLE_DEFAULT", "1"))
+        _sampler.rates.update(parse_sample_rates(os.environ.get("LOG_SAMPLE_RATES", "")))
+
+        _handler = _NonBlockingQueueHandler(queue.Queue(int(os.environ.get("LOG_QUEUE_SIZE", "10000"))))
+        _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+
+        # The formatters don't print file/line/process info, so skip
+        # collecting it on every record (see the logging HOWTO, "Optimization")
+        logging._srcfile = None
+        logging.logProcesses = False
+        logging.logMultiprocessing = False
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(_handler)
+        root.setLevel((level or os.environ.get("LOG_LEVEL", "INFO")).upper())
+
+        # flush whatever is still queued when the process exits
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Stop the writer thread after flushing queued records."""
+    global _listener, _handler
+    with _lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        logging.getLogger().removeHandler(_handler)
+        _listener = _handler = None
+
+
+def dropped_records() -> int:
+    """Records discarded because the queue was full."""
+    return _handler.dropped if _handler is not None else 0
+
+
+def sample_rates() -> Dict[str, float]:
+    return {"default": _sampler.default, **_sampler.rates}
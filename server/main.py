@@ -1,11 +1,48 @@
+import logging
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from routes import predict_route, history_routes
+from fastapi.responses import PlainTextResponse
+from routes import predict_route, history_routes, model_routes
+import metrics
+import log_setup
+import model.model as model
+from model.explanations import get_explanation_worker
+from history.events import get_broadcaster
+from history.similarity import get_similarity_index
+from history.store import get_history_store
+from profiler import profiler
+
+# Every module logs through the background writer (see log_setup.py)
+log_setup.configure_logging()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load and warm the model before serving, so the first requests don't
+    # pay for unpickling (MODEL_PRELOAD=0 defers it to the first request)
+    if os.environ.get("MODEL_PRELOAD", "1").lower() not in ("0", "false", "no"):
+        try:
+            model._ensure_loaded()
+        except FileNotFoundError as e:
+            logger.error(f"Model not loaded at startup: {e}")
+    # Signatures for the existing history are computed once, before serving
+    get_similarity_index()
+    watcher = None
+    interval = float(os.environ.get("MODEL_WATCH_INTERVAL", "0"))
+    if interval > 0:
+        watcher = model.watch_artifacts(interval)
+    yield
+    if watcher is not None:
+        watcher.stop()
 
 app = FastAPI(
     title="Misinformation Detection API",
     description="FastAPI backend for the Misinformation Detection Web App",
-    version="1.0"
+    version="1.0",
+    lifespan=lifespan
 )
 
 # Enable CORS (allow React frontend to communicate)
@@ -17,10 +54,96 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Count and time every request per route (see metrics.py)
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Include route modules
 app.include_router(predict_route.router)
 app.include_router(history_routes.router)
+app.include_router(model_routes.router)
 
 @app.get("/")
 def root():
     return {"message": "FastAPI server is running!"}
+
+# Gauges are read when /metrics is scraped
+metrics.gauge("prediction_cache_entries", "Entries in the prediction cache", lambda: model.cache_stats()["entries"])
+metrics.gauge("prediction_cache_bytes", "Approximate bytes held by the prediction cache", lambda: model.cache_stats()["bytes"])
+metrics.gauge(
+    "prediction_cache_events_total", "Prediction cache hits, misses and evictions since start",
+    lambda: {key: model.cache_stats()[key] for key in ("hits", "misses", "evictions")}, labelname="event",
+    metric_type="counter"
+)
+metrics.gauge("predict_batch_queued", "Requests waiting for the next micro-batch", lambda: predict_route.batcher_stats()["queued"])
+metrics.gauge("predict_batch_in_flight", "Micro-batches being scored", lambda: predict_route.batcher_stats()["in_flight_batches"])
+metrics.gauge("predict_batch_avg_size", "Average micro-batch size since start", lambda: predict_route.batcher_stats()["avg_batch_size"])
+metrics.gauge("predict_admission_in_flight_units", "Cost units of admitted /predict requests", lambda: predict_route._admission.stats()["in_flight_units"])
+metrics.gauge("predict_admission_queued", "Requests waiting for admission", lambda: predict_route._admission.stats()["queued"])
+metrics.gauge("predict_admission_admitted_total", "Requests admitted since start", lambda: predict_route._admission.admitted, metric_type="counter")
+metrics.gauge(
+    "predict_admission_rejected_total", "Requests rejected since start (queue_full: 429, timeout: 503)",
+    lambda: predict_route._admission.stats()["rejected"], labelname="reason", metric_type="counter"
+)
+metrics.gauge("explain_queued", "Deferred explanations waiting to be computed", lambda: get_explanation_worker().stats()["queued"])
+metrics.gauge(
+    "explain_events_total", "Deferred explanations completed, dropped (queue full or model reloaded) and failed",
+    lambda: {key: get_explanation_worker().stats()[key] for key in ("completed", "dropped", "failed")}, labelname="event",
+    metric_type="counter"
+)
+metrics.gauge(
+    "model_info", "Active model version (the value is always 1)",
+    lambda: {version: 1 for version in [model.model_status()["version"]] if version}, labelname="version"
+)
+metrics.gauge("history_records", "Analyses in the history store", lambda: get_history_store().count())
+metrics.gauge("log_records_dropped_total", "Log records dropped because the log queue was full", log_setup.dropped_records, metric_type="counter")
+metrics.gauge("near_duplicate_entries", "Signatures in the near-duplicate index", lambda: get_similarity_index().stats()["entries"])
+metrics.gauge(
+    "near_duplicate_events_total", "Near-duplicate lookups, reused results and evictions since start",
+    lambda: {key: get_similarity_index().stats()[key] for key in ("lookups", "hits", "evictions")}, labelname="event",
+    metric_type="counter"
+)
+metrics.gauge("history_event_subscribers", "Connected /history/events clients", lambda: get_broadcaster().subscriber_count)
+
+# GET - Prometheus metrics
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """
+    Per-stage latency histograms, request counts, cache/queue gauges and
+    history size in the Prometheus text format
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# POST - Start the sampling profiler
+@app.post("/metrics/profiler/start")
+def start_profiler(interval_ms: float = 5, include_idle: bool = False, reset: bool = True):
+    """
+    Start sampling every thread's stack
+
+    - **interval_ms**: Milliseconds between samples (default: 5)
+    - **include_idle**: Also count threads blocked waiting for work
+    - **reset**: Discard samples from earlier runs (default: true)
+    """
+    if reset:
+        profiler.reset()
+    profiler.start(interval_ms / 1000, include_idle)
+    return profiler.status()
+
+# POST - Stop the sampling profiler
+@app.post("/metrics/profiler/stop")
+def stop_profiler():
+    profiler.stop()
+    return profiler.status()
+
+# GET - Sampled stacks
+@app.get("/metrics/profiler")
+def get_profile(format: str = "top", limit: int = 20):
+    """
+    Profiler results
+
+    - **format**: `top` (functions most often on top of the stack, JSON) or
+      `collapsed` (flamegraph.pl / speedscope input)
+    - **limit**: Number of functions for `top`
+    """
+    if format == "collapsed":
+        return PlainTextResponse(profiler.collapsed())
+    return {**profiler.status(), "top": [{"function": name, "samples": count} for name, count in profiler.top(limit)]}
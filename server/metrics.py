@@ -0,0 +1,243 @@
+"""
+In-process metrics, rendered in the Prometheus text format by GET /metrics.
+
+Counters and histograms are plain Python objects. Recording a value costs
+one lock plus a bisect into the bucket bounds, so they are cheap enough for
+per-request timing. Gauges are callbacks evaluated at scrape time, so
+nothing is tracked between scrapes.
+
+Values are per process: with several uvicorn workers, each scrape sees the
+worker that answered it.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Seconds; tuned for stages that take from tens of microseconds to seconds
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _label_text(names: Sequence[str], values: Tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic count, optionally split by labels."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labelvalues) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(labelvalues, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_label_text(self.labelnames, labelvalues)} {_number(value)}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labelvalues", "start")
+
+    def __init__(self, histogram: "Histogram", labelvalues: Tuple):
+        self.histogram = histogram
+        self.labelvalues = labelvalues
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labelvalues)
+        return False
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values, optionally split by labels."""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labelvalues -> [per-bucket counts (last is +Inf), sum, count]
+        self._series: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labelvalues) -> _Timer:
+        """Context manager observing the elapsed seconds of its block."""
+        return _Timer(self, labelvalues)
+
+    def snapshot(self, *labelvalues) -> dict:
+        """{"count", "sum", "buckets": [(le, cumulative count)]} for one series."""
+        with self._lock:
+            counts, total, count = self._series.get(labelvalues, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            counts = list(counts)
+        cumulative = []
+        running = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            running += bucket_count
+            cumulative.append((bound, running))
+        return {"count": count, "sum": total, "buckets": cumulative}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            keys = list(self._series)
+        for labelvalues in keys:
+            snapshot = self.snapshot(*labelvalues)
+            for bound, cumulative in snapshot["buckets"]:
+                labels = _label_text(self.labelnames + ("le",), labelvalues + (_number(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {_number(snapshot['sum'])}")
+            lines.append(f"{self.name}_count{labels} {snapshot['count']}")
+        return lines
+
+
+class Gauge:
+    """
+    Value read from a callback at scrape time. The callback returns a number,
+    or a dict of label value -> number when labelname is set. metric_type
+    "counter" exposes a running total kept elsewhere (e.g. cache hits).
+    """
+
+    def __init__(self, name: str, help: str, fn: Callable[[], object], labelname: str = None, metric_type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelname = labelname
+        self.metric_type = metric_type
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.metric_type}"]
+        value = self.fn()
+        if self.labelname is None:
+            lines.append(f"{self.name} {_number(value)}")
+        else:
+            for labelvalue, item in value.items():
+                lines.append(f"{self.name}{_label_text((self.labelname,), (labelvalue,))} {_number(item)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            # re-registering a name (e.g. a module reloaded in tests) replaces it
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # one broken gauge callback shouldn't take down the whole scrape
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labelnames))
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+
+def gauge(name: str, help: str, fn: Callable[[], object], labelname: str = None, metric_type: str = "gauge") -> Gauge:
+    return REGISTRY.register(Gauge(name, help, fn, labelname, metric_type))
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# Shared by model.py, the batcher and predict_route.py: where /predict/ time goes
+STAGE_SECONDS = histogram(
+    "predict_stage_seconds",
+    "Time spent per prediction pipeline stage (per batch for model stages)",
+    ("stage",),
+)
+
+REQUESTS = counter("http_requests_total", "HTTP requests by method, route and status", ("method", "route", "status"))
+REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds", "Time until the response starts, by route", ("method", "route")
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them per route template
+    (e.g. /history/{analysis_id}), so ids don't create a series each.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                # the router has matched by now and stored the route in scope
+                route = getattr(scope.get("route"), "path", "unmatched")
+                REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], route)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUESTS.inc(1, scope["method"], route, status["code"])
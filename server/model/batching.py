@@ -0,0 +1,118 @@
+"""
+Micro-batching for concurrent prediction requests.
+
+Requests that arrive within a short window (or until the batch is full) are
+scored together with one vectorized model call, run in the event loop's
+default executor. Each caller awaits its own future and gets its own result,
+so the async endpoint never ties up a threadpool thread while it waits.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """Coalesce concurrent submit() calls into batched score_batch() calls."""
+
+    def __init__(self, score_batch: Callable[[List[str]], List[dict]], max_batch_size: int = 64, max_wait: float = 0.002,
+                 on_queue_wait: Optional[Callable[[float], None]] = None):
+        """
+        Args:
+            score_batch: Function scoring a list of texts, returning one result per text
+            max_batch_size: Flush as soon as this many requests are waiting
+            max_wait: Seconds to wait for more requests after the first one arrives
+            on_queue_wait: Called with the seconds each request waited before its batch started
+        """
+        self.score_batch = score_batch
+        self.on_queue_wait = on_queue_wait
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+
+        self._loop = None
+        self._pending = []  # (text, future, enqueue time)
+        self._timer = None
+        # running _run tasks: the loop only keeps weak references to tasks,
+        # so an unreferenced flush could be garbage-collected mid-flight
+        self._tasks = set()
+        self._lock = threading.Lock()  # guards the counters read by stats()
+        self.in_flight = 0
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, text: str) -> dict:
+        """Queue one text for the next batch and wait for its result."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # first use, or a new event loop (e.g. after a server restart in-process)
+            self._loop = loop
+            self._pending = []
+            self._timer = None
+
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = self._loop.create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._on_task_done)
+
+    def _on_task_done(self, task: "asyncio.Task") -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Batch flush task failed: {task.exception()!r}")
+
+    async def _run(self, batch: list) -> None:
+        texts = [text for text, _, _ in batch]
+        if self.on_queue_wait is not None:
+            now = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.on_queue_wait(now - enqueued)
+        with self._lock:
+            self.in_flight += 1
+        try:
+            results = await self._loop.run_in_executor(None, self.score_batch, texts)
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} failed: {e}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.batches += 1
+                self.items += len(batch)
+
+        for (_, future, _), result in zip(batch, results):
+            # the caller may have gone away (client disconnect / cancellation)
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": len(self._pending),
+                "in_flight_batches": self.in_flight,
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+            }
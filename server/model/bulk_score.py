@@ -0,0 +1,233 @@
+"""
+Offline bulk scoring of a CSV or JSONL dump, without going through HTTP.
+
+Records are read as a stream and grouped into chunks. Each chunk is scored
+with model.predict_texts (one preprocess + vectorized model call) in a
+process pool; each worker loads the model once, in its initializer.
+Results are written in input order, and a checkpoint is saved after every
+chunk, so an interrupted run can pick up where it stopped.
+
+Usage (from server/):
+    python -m model.bulk_score posts.csv scored.csv --text-column text --id-column id
+    python -m model.bulk_score posts.jsonl scored.jsonl --workers 8 --chunk-size 2000
+    python -m model.bulk_score posts.jsonl scored.jsonl --resume
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FIELDS = ["row", "id", "prediction", "confidence"]
+
+
+def _format_of(path: str, explicit: Optional[str]) -> str:
+    if explicit:
+        return explicit
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def read_records(path: str, fmt: str, text_field: str, id_field: Optional[str]) -> Iterator[Tuple[object, str]]:
+    """Yield (id, text) for every record in the input file."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                yield (row.get(id_field) if id_field else None), row.get(text_field) or ""
+        else:
+            for line in f:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                yield (item.get(id_field) if id_field else None), str(item.get(text_field) or "")
+
+
+def _chunks(records: Iterator[Tuple[object, str]], size: int, skip: int) -> Iterator[List[Tuple[int, object, str]]]:
+    chunk = []
+    for row, (record_id, text) in enumerate(records):
+        if row < skip:
+            continue
+        chunk.append((row, record_id, text))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _init_worker() -> None:
+    """Load the model once per worker process."""
+    from model import model
+
+    # per-batch INFO logs would swamp the progress output
+    logging.getLogger(model.__name__).setLevel(logging.WARNING)
+    model._ensure_loaded()
+
+
+def _score_chunk(texts: List[str]) -> List[Tuple[str, float]]:
+    from model import model
+
+    return model.predict_texts(texts)
+
+
+class Checkpoint:
+    """Records done and output size, saved next to the output file."""
+
+    def __init__(self, output_path: str):
+        self.path = output_path + ".checkpoint"
+
+    def load(self) -> Optional[dict]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, input_path: str, records: int, output_bytes: int, done: bool = False) -> None:
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "input": os.path.abspath(input_path),
+                "records": records,
+                "output_bytes": output_bytes,
+                "done": done,
+            }, f)
+        os.replace(tmp_path, self.path)
+
+
+class _Writer:
+    def __init__(self, f, fmt: str, write_header: bool):
+        self.f = f
+        self.fmt = fmt
+        self._csv = csv.writer(f) if fmt == "csv" else None
+        if self._csv and write_header:
+            self._csv.writerow(OUTPUT_FIELDS)
+
+    def write(self, chunk: List[Tuple[int, object, str]], results: List[Tuple[str, float]]) -> None:
+        for (row, record_id, _), (label, confidence) in zip(chunk, results):
+            if self._csv:
+                self._csv.writerow([row, "" if record_id is None else record_id, label, confidence])
+            else:
+                self.f.write(json.dumps({"row": row, "id": record_id, "prediction": label, "confidence": confidence}) + "\n")
+
+
+def bulk_score(input_path: str, output_path: str, text_field: str = "text", id_field: Optional[str] = None,
+               input_format: Optional[str] = None, output_format: Optional[str] = None,
+               chunk_size: int = 1000, workers: Optional[int] = None, resume: bool = False,
+               progress_interval: float = 2.0) -> dict:
+    """
+    Score every record of input_path and write the results to output_path.
+
+    Args:
+        input_path: CSV (with a header row) or JSONL file
+        output_path: Where to write results (CSV or JSONL, by extension)
+        text_field: Column / key holding the text
+        id_field: Optional column / key copied into the output
+        input_format: "csv" or "jsonl" (default: from the extension)
+        output_format: "csv" or "jsonl" (default: from the extension)
+        chunk_size: Records per model call
+        workers: Worker processes (default: CPU count; 0 or 1 scores in-process)
+        resume: Continue from the checkpoint left by an interrupted run
+        progress_interval: Seconds between progress reports
+
+    Returns:
+        {"records", "skipped", "seconds", "records_per_second"}
+    """
+    input_format = _format_of(input_path, input_format)
+    output_format = _format_of(output_path, output_format)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    checkpoint = Checkpoint(output_path)
+
+    skip = 0
+    output_bytes = 0
+    state = checkpoint.load() if resume else None
+    if state is not None:
+        if state["input"] != os.path.abspath(input_path):
+            raise ValueError(f"Checkpoint {checkpoint.path} belongs to {state['input']}, not {input_path}")
+        if state.get("done"):
+            logger.info(f"{output_path} is already complete ({state['records']} records)")
+            return {"records": 0, "skipped": state["records"], "seconds": 0.0, "records_per_second": 0.0}
+        skip, output_bytes = state["records"], state["output_bytes"]
+        logger.info(f"Resuming after {skip} records")
+    elif resume:
+        logger.warning(f"No checkpoint at {checkpoint.path}; starting from the beginning")
+
+    mode = "r+" if output_bytes else "w"
+    with open(output_path, mode, encoding="utf-8", newline="") as out:
+        # drop anything written after the last checkpoint
+        out.seek(output_bytes)
+        out.truncate()
+        writer = _Writer(out, output_format, write_header=not output_bytes)
+
+        done = skip
+        scored = 0
+        started = last_report = time.perf_counter()
+
+        def flush(chunk, results):
+            nonlocal done, scored, last_report
+            writer.write(chunk, results)
+            out.flush()
+            done += len(chunk)
+            scored += len(chunk)
+            checkpoint.save(input_path, done, out.tell())
+            now = time.perf_counter()
+            if now - last_report >= progress_interval:
+                last_report = now
+                logger.info(f"{done} records scored ({scored / (now - started):.0f} records/s)")
+
+        chunks = _chunks(read_records(input_path, input_format, text_field, id_field), chunk_size, skip)
+        if workers <= 1:
+            _init_worker()
+            for chunk in chunks:
+                flush(chunk, _score_chunk([text for _, _, text in chunk]))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+                # bounded read-ahead keeps memory flat; results are written in input order
+                pending = deque()
+                for chunk in chunks:
+                    pending.append((chunk, pool.submit(_score_chunk, [text for _, _, text in chunk])))
+                    if len(pending) >= workers * 2:
+                        chunk, future = pending.popleft()
+                        flush(chunk, future.result())
+                while pending:
+                    chunk, future = pending.popleft()
+                    flush(chunk, future.result())
+
+        checkpoint.save(input_path, done, out.tell(), done=True)
+
+    seconds = time.perf_counter() - started
+    rate = scored / seconds if seconds else 0.0
+    logger.info(f"Scored {scored} records in {seconds:.1f}s ({rate:.0f} records/s) -> {output_path}")
+    return {"records": scored, "skipped": skip, "seconds": round(seconds, 3), "records_per_second": round(rate, 1)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV/JSONL dump with the fake news model")
+    parser.add_argument("input", help="CSV (with header) or JSONL file")
+    parser.add_argument("output", help="results file (.csv, otherwise JSONL)")
+    parser.add_argument("--text-column", "--text-field", dest="text_field", default="text")
+    parser.add_argument("--id-column", "--id-field", dest="id_field", help="copied into the output")
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--output-format", choices=["csv", "jsonl"])
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--resume", action="store_true", help="continue from the last checkpoint")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr, format="%(asctime)s %(message)s")
+    result = bulk_score(
+        args.input, args.output,
+        text_field=args.text_field, id_field=args.id_field,
+        input_format=args.input_format, output_format=args.output_format,
+        chunk_size=args.chunk_size, workers=args.workers, resume=args.resume,
+    )
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Bounded LRU cache for prediction results.
+
+Entries are keyed on a hash of the *preprocessed* text, so inputs that only
+differ in case, whitespace, URLs or repeated punctuation share one entry.
+The cache is capped both by entry count and by an estimate of the memory
+held by cached results; the least recently used entries are evicted first.
+"""
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+def make_key(processed_text: str) -> bytes:
+    """Compact, collision-resistant cache key for a preprocessed text."""
+    return hashlib.blake2b(processed_text.encode("utf-8"), digest_size=16).digest()
+
+
+def estimate_size(result: dict) -> int:
+    """Rough number of bytes held by a cached scoring result."""
+    contributions = result.get("word_contributions") or {}
+    size = 256 + sys.getsizeof(contributions)
+    for word in contributions:
+        # key string + boxed float value
+        size += sys.getsizeof(word) + 24
+    return size
+
+
+class PredictionCache:
+    """Thread-safe LRU cache capped by entry count and approximate bytes."""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (result, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_bytes > 0
+
+    def get(self, key: bytes) -> Optional[dict]:
+        """Return the cached result for key (marking it recently used), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: bytes, result: dict) -> None:
+        """Insert or replace a result, evicting least recently used entries as needed."""
+        if not self.enabled:
+            return
+        size = estimate_size(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (result, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
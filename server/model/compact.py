@@ -0,0 +1,267 @@
+"""
+Build a smaller vectorizer/classifier pair by dropping features whose
+logistic regression weight is (near) zero.
+
+A feature with |coef| below the threshold barely moves the decision score,
+but it still costs vocabulary memory and lookups on every transform.
+Dropping it does change one thing: it no longer counts towards the row's
+TF-IDF norm, so predictions can shift slightly. The tool therefore scores
+an evaluation set with both pairs and reports label agreement, the largest
+probability change and, when labels are given, the accuracy of each.
+
+Coefficients can also be quantized:
+    float16   half precision
+    int8      round(coef / scale), with scale = max|coef| / 127
+
+The pickles keep float64 coefficients holding the quantized values, so the
+sklearn engine scores exactly like the numpy engine. The mapped export in
+<out>/compiled stores the float16/int8 array itself.
+
+Output (<out>): vectorizer.pkl, logistic_regression.pkl, compiled/, report.json
+
+Usage (from server/):
+    python -m model.compact --out model/compact --threshold 0.05 [--quantize int8]
+        [--eval posts.csv --text-column text --label-column label]
+
+Serve it with MODEL_DIR=model/compact (sklearn) or
+MODEL_EXPORT_DIR=model/compact/compiled (numpy).
+"""
+import argparse
+import copy
+import json
+import os
+import pickle
+import sys
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from model.export import QUANTIZED_FORMAT_VERSION, build_arrays, write_arrays
+
+BASE_DIR = os.path.dirname(__file__)
+QUANTIZE_MODES = ("float16", "int8")
+
+
+def quantize(coef: np.ndarray, mode: Optional[str], scale: Optional[float] = None) -> Tuple[np.ndarray, float]:
+    """
+    Quantize a coefficient vector.
+
+    Args:
+        coef: float64 coefficients
+        mode: None, "float16" or "int8"
+        scale: int8 scale to reuse (default: max|coef| / 127)
+
+    Returns:
+        (stored array, scale); stored * scale gives back the weights
+    """
+    if mode is None:
+        return np.asarray(coef, dtype=np.float64), 1.0
+    if mode == "float16":
+        return np.asarray(coef, dtype=np.float16), 1.0
+    if mode == "int8":
+        if scale is None:
+            peak = float(np.abs(coef).max()) if len(coef) else 0.0
+            scale = peak / 127 if peak else 1.0
+        return np.clip(np.rint(coef / scale), -127, 127).astype(np.int8), scale
+    raise ValueError(f"Unknown quantization mode: {mode!r} (expected one of {QUANTIZE_MODES})")
+
+
+def dequantize(stored: np.ndarray, scale: float) -> np.ndarray:
+    return stored.astype(np.float64) * scale
+
+
+def compact_estimators(vectorizer, clf, threshold: float = 0.0, quantize_mode: Optional[str] = None):
+    """
+    Drop features with |coef| <= threshold and remap the rest to contiguous
+    indices, keeping their original order.
+
+    Args:
+        vectorizer: Fitted TfidfVectorizer (or CountVectorizer)
+        clf: Fitted binary linear classifier with coef_
+        threshold: Features with an absolute weight at or below this are dropped
+        quantize_mode: None, "float16" or "int8"
+
+    Returns:
+        (vectorizer, classifier, info), where info holds the kept feature
+        count and the quantization scale
+    """
+    if not hasattr(vectorizer, "vocabulary_"):
+        raise ValueError("Vectorizer has no vocabulary_ (HashingVectorizer is not supported)")
+    if not hasattr(clf, "coef_") or clf.coef_.shape[0] != 1:
+        raise ValueError("Only binary linear classifiers (coef_ with one row) are supported")
+
+    coef = np.asarray(clf.coef_[0], dtype=np.float64)
+    keep = np.flatnonzero(np.abs(coef) > threshold)
+    if not len(keep):
+        raise ValueError(f"Threshold {threshold} drops every feature")
+
+    term_of = {column: term for term, column in vectorizer.vocabulary_.items()}
+
+    # A fresh vectorizer with a fixed vocabulary: fitting-only state such as
+    # stop_words_ (every term cut by max_features) is left behind
+    params = vectorizer.get_params()
+    params.update(vocabulary={term_of[column]: index for index, column in enumerate(keep)})
+    if "max_features" in params:
+        params["max_features"] = None
+    compacted = type(vectorizer)(**params)
+    if getattr(vectorizer, "use_idf", False) and hasattr(vectorizer, "idf_"):
+        compacted.idf_ = np.asarray(vectorizer.idf_)[keep]
+    else:
+        # CountVectorizer: the vocabulary param is all the fitting it needs
+        compacted._validate_vocabulary()
+
+    stored, scale = quantize(coef[keep], quantize_mode)
+    clf_compacted = copy.deepcopy(clf)
+    clf_compacted.coef_ = dequantize(stored, scale).reshape(1, -1)
+    clf_compacted.n_features_in_ = len(keep)
+
+    info = {
+        "features_before": int(len(coef)),
+        "features_after": int(len(keep)),
+        "threshold": threshold,
+        "quantize": quantize_mode,
+        "coef_scale": scale,
+    }
+    return compacted, clf_compacted, info
+
+
+def evaluate(original: tuple, compacted: tuple, texts: List[str], labels: Optional[List[str]] = None) -> dict:
+    """
+    Score preprocessed texts with both (vectorizer, classifier) pairs.
+
+    Returns:
+        {"texts", "agreement", "label_mismatches", "max_proba_diff",
+         "mean_proba_diff"} plus "accuracy_original", "accuracy_compact" and
+        "accuracy_delta" when labels are given
+    """
+    if not texts:
+        return {"texts": 0}
+    proba_a = original[1].predict_proba(original[0].transform(texts))
+    proba_b = compacted[1].predict_proba(compacted[0].transform(texts))
+    classes = original[1].classes_
+    pred_a = classes[proba_a.argmax(axis=1)]
+    pred_b = classes[proba_b.argmax(axis=1)]
+    diff = np.abs(proba_a - proba_b).max(axis=1)
+
+    result = {
+        "texts": len(texts),
+        "agreement": round(float((pred_a == pred_b).mean()), 6),
+        "label_mismatches": int((pred_a != pred_b).sum()),
+        "max_proba_diff": float(diff.max()),
+        "mean_proba_diff": float(diff.mean()),
+    }
+    if labels is not None:
+        expected = np.array([str(label).strip().lower() for label in labels])
+        known = np.isin(expected, [str(c).lower() for c in classes])
+        if known.any():
+            lowered_a = np.char.lower(pred_a.astype(str))
+            lowered_b = np.char.lower(pred_b.astype(str))
+            accuracy_a = float((lowered_a[known] == expected[known]).mean())
+            accuracy_b = float((lowered_b[known] == expected[known]).mean())
+            result.update({
+                "labelled": int(known.sum()),
+                "accuracy_original": round(accuracy_a, 6),
+                "accuracy_compact": round(accuracy_b, 6),
+                "accuracy_delta": round(accuracy_b - accuracy_a, 6),
+            })
+    return result
+
+
+def _pickle_to(obj, path: str) -> int:
+    with open(path + ".tmp", "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + ".tmp", path)
+    return os.path.getsize(path)
+
+
+def write_compacted(vectorizer, clf, info: dict, out_dir: str) -> dict:
+    """
+    Write the pickles and a mapped export (quantized coef.npy if requested).
+
+    Returns:
+        {"vectorizer_bytes", "classifier_bytes", "export_dir"}
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    sizes = {
+        "vectorizer_bytes": _pickle_to(vectorizer, os.path.join(out_dir, "vectorizer.pkl")),
+        "classifier_bytes": _pickle_to(clf, os.path.join(out_dir, "logistic_regression.pkl")),
+    }
+
+    export_dir = os.path.join(out_dir, "compiled")
+    try:
+        arrays = build_arrays(vectorizer, clf)
+    except ValueError as e:
+        # the numpy engine can't reproduce this vectorizer; the pickles still work
+        sizes["export_dir"] = None
+        sizes["export_skipped"] = str(e)
+        return sizes
+    if info["quantize"]:
+        # build_arrays reorders by token; re-quantizing with the same scale is exact
+        arrays["coef"], _ = quantize(arrays["coef"], info["quantize"], info["coef_scale"])
+        arrays["manifest"].update({
+            "format_version": QUANTIZED_FORMAT_VERSION,
+            "coef_dtype": info["quantize"],
+            "coef_scale": info["coef_scale"],
+        })
+    write_arrays(arrays, export_dir, sources={
+        "vectorizer": os.path.join(out_dir, "vectorizer.pkl"),
+        "classifier": os.path.join(out_dir, "logistic_regression.pkl"),
+    })
+    sizes["export_dir"] = export_dir
+    return sizes
+
+
+def _load_eval_set(path: Optional[str], text_field: str, label_field: Optional[str]) -> Tuple[List[str], Optional[List[str]]]:
+    from model.bulk_score import _format_of, read_records
+    from model.mapped import PARITY_SAMPLES
+
+    if not path:
+        return list(PARITY_SAMPLES), None
+    labels, texts = [], []
+    for label, text in read_records(path, _format_of(path, None), text_field, label_field):
+        labels.append(label)
+        texts.append(text)
+    return texts, (labels if label_field else None)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prune near-zero-weight features from the model")
+    parser.add_argument("--vectorizer", default=os.path.join(BASE_DIR, "vectorizer.pkl"))
+    parser.add_argument("--classifier", default=os.path.join(BASE_DIR, "logistic_regression.pkl"))
+    parser.add_argument("--out", default=os.path.join(BASE_DIR, "compact"))
+    parser.add_argument("--threshold", type=float, default=0.0, help="drop features with |coef| <= threshold")
+    parser.add_argument("--quantize", choices=QUANTIZE_MODES)
+    parser.add_argument("--eval", help="CSV/JSONL of texts to compare on (default: built-in samples)")
+    parser.add_argument("--text-column", "--text-field", dest="text_field", default="text")
+    parser.add_argument("--label-column", "--label-field", dest="label_field", help="true label (Fake/Real) for accuracy")
+    parser.add_argument("--min-agreement", type=float, default=0.0, help="exit 1 if label agreement is lower")
+    args = parser.parse_args(argv)
+
+    from model import model
+
+    vectorizer = model._load_pickle(args.vectorizer)
+    clf = model._load_pickle(args.classifier)
+    compacted, clf_compacted, info = compact_estimators(vectorizer, clf, args.threshold, args.quantize)
+
+    raw_texts, labels = _load_eval_set(args.eval, args.text_field, args.label_field)
+    texts = model.preprocess_texts(raw_texts)
+    report = dict(info)
+    report["evaluation"] = evaluate((vectorizer, clf), (compacted, clf_compacted), texts, labels)
+    report["original_bytes"] = {
+        "vectorizer_bytes": os.path.getsize(args.vectorizer),
+        "classifier_bytes": os.path.getsize(args.classifier),
+    }
+    report["compact_bytes"] = write_compacted(compacted, clf_compacted, info, args.out)
+
+    with open(os.path.join(args.out, "report.json"), "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+
+    agreement = report["evaluation"].get("agreement", 1.0)
+    if agreement < args.min_agreement:
+        print(f"Label agreement {agreement:.4f} is below {args.min_agreement}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
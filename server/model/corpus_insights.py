@@ -0,0 +1,373 @@
+"""
+Regenerate the Insights page's static JSON artifacts from a labeled corpus.
+
+Writes, in the schemas client/src/pages/insights.js imports:
+    top_words.json     most frequent words per label (number of posts using them)
+    word_shift.json    words most associated with each label: log-odds ratio
+                       of token counts with an informative z-score
+    top_hashtags.json  most frequent hashtags per label
+
+Records are streamed from a CSV or JSONL file and grouped into chunks. Each
+chunk is tokenized in a process pool with the model's own preprocessing
+(model.preprocess_text, then the vectorizer's token pattern) and comes back
+as per-label counters, which are merged as they arrive. Memory therefore
+grows with the vocabulary, not with the corpus. For very large corpora,
+--max-vocab caps the vocabulary, and separately the set of distinct
+hashtags: when either is exceeded, its rarest entries are dropped (they
+can't make a top list anyway), so their counts become approximate.
+
+Labels may be Real/Fake, True/False or 0/1. Numeric labels follow the
+model's convention (model.postprocess_prediction: 0 = Real, 1 = Fake);
+corpora using other codes can say so with --label-map, e.g. 0=fake,1=real.
+
+Usage (from server/):
+    python -m model.corpus_insights posts.csv --text-column text --label-column label
+    python -m model.corpus_insights posts.jsonl --workers 8 --out ../client/src/components
+"""
+import argparse
+import heapq
+import json
+import logging
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from history.word_stats import word_label
+from model.bulk_score import _format_of, read_records
+from model.normalizer import normalize_texts
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(__file__)
+DEFAULT_OUT_DIR = os.path.join(BASE_DIR, "..", "..", "client", "src", "components")
+LABELS = ("real", "fake")
+
+# Same as the vectorizer's token_pattern, applied to preprocessed text
+_TOKEN_RE = re.compile(r"(?u)\b\w\w+\b")
+# Hashtags are read from the raw text: preprocessing drops the '#'
+_HASHTAG_RE = re.compile(r"#(\w+)")
+# Placeholders model.preprocess_text substitutes for URLs and @mentions
+_PLACEHOLDERS = frozenset({"url_placeholder", "user_mention"})
+
+# Added to every count (Haldane-Anscombe correction), so a word never seen
+# under one label still gets a finite log-odds and variance
+PRIOR = 0.5
+
+
+class LabelCounts:
+    """Token counts, post counts and hashtag counts for one label."""
+
+    __slots__ = ("posts", "tokens", "docs", "hashtags")
+
+    def __init__(self):
+        self.posts = 0
+        self.tokens = Counter()
+        self.docs = Counter()
+        self.hashtags = Counter()
+
+    def update(self, other: "LabelCounts") -> None:
+        self.posts += other.posts
+        self.tokens.update(other.tokens)
+        self.docs.update(other.docs)
+        self.hashtags.update(other.hashtags)
+
+
+def load_stop_words(spec: str) -> FrozenSet[str]:
+    """"none", "english" (scikit-learn's list) or a file with one word per line."""
+    if spec == "none":
+        return frozenset()
+    if spec == "english":
+        from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS
+
+        return frozenset(ENGLISH_STOP_WORDS)
+    with open(spec, encoding="utf-8") as f:
+        return frozenset(line.strip().lower() for line in f if line.strip())
+
+
+def parse_label_map(spec: str) -> Dict[str, str]:
+    """
+    "0=fake,1=real" -> {"0": "fake", "1": "real"} (raw values are matched
+    case-insensitively; every target must be real or fake).
+    """
+    label_map = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        raw, sep, label = item.partition("=")
+        label = label.strip().lower()
+        if not sep or label not in LABELS:
+            raise argparse.ArgumentTypeError(f"expected value=real|fake, got {item!r}")
+        label_map[raw.strip().lower()] = label
+    return label_map
+
+
+_stop_words: FrozenSet[str] = frozenset()
+_label_map: Dict[str, str] = {}
+
+
+def _init_worker(stop_words: FrozenSet[str], label_map: Optional[Dict[str, str]] = None) -> None:
+    global _stop_words, _label_map
+    _stop_words = stop_words
+    _label_map = label_map or {}
+
+
+def corpus_label(raw, label_map: Optional[Dict[str, str]] = None) -> Optional[str]:
+    """
+    "real"/"fake" for a raw corpus label, or None if it isn't one.
+
+    JSONL labels may be numbers or booleans: they are converted with str()
+    first, since word_label treats a falsy 0/False as missing. Values in
+    label_map take precedence over word_label's 0 = Real, 1 = Fake.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, float) and raw.is_integer():
+        raw = int(raw)
+    raw = str(raw)
+    if label_map:
+        mapped = label_map.get(raw.strip().lower())
+        if mapped is not None:
+            return mapped
+    return word_label(raw)
+
+
+def count_chunk(records: List[Tuple[object, str]]) -> Tuple[Dict[str, LabelCounts], int]:
+    """
+    Count one chunk of (label, text) records.
+
+    Returns:
+        (label ("real"/"fake") -> LabelCounts, number of unlabeled records skipped)
+    """
+    counts = {label: LabelCounts() for label in LABELS}
+    labeled = [(corpus_label(label, _label_map), text) for label, text in records]
+    labeled = [(label, text) for label, text in labeled if label is not None]
+    unlabeled = len(records) - len(labeled)
+    cleaned = normalize_texts([text for _, text in labeled])
+    for (label, raw), text in zip(labeled, cleaned):
+        target = counts[label]
+        target.posts += 1
+        tokens = [token for token in _TOKEN_RE.findall(text.lower())
+                  if token not in _stop_words and token not in _PLACEHOLDERS]
+        target.tokens.update(tokens)
+        target.docs.update(set(tokens))
+        target.hashtags.update("#" + tag.lower() for tag in _HASHTAG_RE.findall(raw))
+    return counts, unlabeled
+
+
+def _chunks(records: Iterator[Tuple[object, str]], size: int) -> Iterator[List[Tuple[object, str]]]:
+    chunk = []
+    for label, text in records:
+        chunk.append((label, text))
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _size(totals: Dict[str, LabelCounts], table: str) -> int:
+    return sum(len(getattr(counts, table)) for counts in totals.values())
+
+
+def _prune(totals: Dict[str, LabelCounts], max_vocab: int, counted: str = "tokens",
+           tables: Tuple[str, ...] = ("tokens", "docs")) -> int:
+    """
+    Drop the rarest entries of the counted table (words, or hashtags with
+    counted="hashtags") from tables until there are at most half of max_vocab.
+
+    Returns:
+        The count at or below which entries were dropped
+    """
+    combined = Counter()
+    for counts in totals.values():
+        combined.update(getattr(counts, counted))
+    frequency_of_counts = Counter(combined.values())
+    remaining, cutoff = len(combined), 0
+    for count in sorted(frequency_of_counts):
+        if remaining <= max_vocab // 2:
+            break
+        remaining -= frequency_of_counts[count]
+        cutoff = count
+    for counts in totals.values():
+        for table in (getattr(counts, name) for name in tables):
+            for word in [word for word in table if combined[word] <= cutoff]:
+                del table[word]
+    return cutoff
+
+
+def log_odds_z(count_a: int, count_b: int, total_a: int, total_b: int, prior: float = PRIOR) -> Tuple[float, float]:
+    """
+    Log-odds ratio of a word between two token totals and its z-score
+    (the ratio divided by its approximate standard deviation).
+    """
+    a, b = count_a + prior, count_b + prior
+    rest_a = max(prior, total_a - count_a + prior)
+    rest_b = max(prior, total_b - count_b + prior)
+    log_odds = math.log(a / rest_a) - math.log(b / rest_b)
+    variance = 1 / a + 1 / b + 1 / rest_a + 1 / rest_b
+    return log_odds, log_odds / math.sqrt(variance)
+
+
+def word_shift(totals: Dict[str, LabelCounts], limit: int = 25, min_count: int = 5) -> Dict[str, List[dict]]:
+    """top_by_label for word_shift.json: each label's words with the highest z-scores."""
+    token_totals = {label: sum(totals[label].tokens.values()) for label in LABELS}
+    result = {}
+    for label, rest in (("real", "fake"), ("fake", "real")):
+        own, other = totals[label].tokens, totals[rest].tokens
+
+        def scored():
+            for word, count in own.items():
+                count_rest = other.get(word, 0)
+                if count + count_rest < min_count:
+                    continue
+                log_odds, z = log_odds_z(count, count_rest, token_totals[label], token_totals[rest])
+                if log_odds > 0:
+                    yield z, log_odds, word, count, count_rest
+
+        result[label] = [
+            {"word": word, "count_in_label": count, "count_in_rest": count_rest,
+             "log_odds": round(log_odds, 4), "z": round(z, 3)}
+            for z, log_odds, word, count, count_rest in heapq.nlargest(limit, scored())
+        ]
+    return result
+
+
+def _top(counter: Counter, key: str, limit: int) -> List[dict]:
+    # ties broken alphabetically, so the output doesn't depend on merge order
+    top = heapq.nsmallest(limit, counter.items(), key=lambda item: (-item[1], item[0]))
+    return [{key: item, "count": count} for item, count in top]
+
+
+def build_artifacts(totals: Dict[str, LabelCounts], words: int = 25, hashtags: int = 10,
+                    min_count: int = 5) -> Dict[str, dict]:
+    """file name -> JSON document, matching the shipped artifacts' schemas."""
+    generated_at = datetime.now().isoformat()
+    total_posts = sum(counts.posts for counts in totals.values())
+    vocab = set(totals["real"].tokens)
+    vocab.update(totals["fake"].tokens)
+    return {
+        "top_words.json": {label: _top(totals[label].docs, "text", words) for label in LABELS},
+        "word_shift.json": {
+            "generatedAt": generated_at,
+            "totalPosts": total_posts,
+            "vocabSize": len(vocab),
+            "top_by_label": word_shift(totals, words, min_count),
+        },
+        "top_hashtags.json": {
+            "generatedAt": generated_at,
+            "totalPosts": total_posts,
+            "topHashtags": {label: _top(totals[label].hashtags, "tag", hashtags) for label in ("fake", "real")},
+        },
+    }
+
+
+def count_corpus(chunks: Iterable[List[Tuple[object, str]]], workers: int = 1, stop_words: FrozenSet[str] = frozenset(),
+                 max_vocab: Optional[int] = None, progress_interval: float = 2.0,
+                 label_map: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, LabelCounts], dict]:
+    """
+    Count every chunk, in a process pool when workers > 1.
+
+    Returns:
+        (label -> merged LabelCounts, {"records", "unlabeled", "posts", "seconds",
+        "prune_cutoff", "hashtag_prune_cutoff"})
+    """
+    totals = {label: LabelCounts() for label in LABELS}
+    info = {"records": 0, "unlabeled": 0, "prune_cutoff": 0, "hashtag_prune_cutoff": 0}
+    started = last_report = time.perf_counter()
+
+    def merge(chunk, result):
+        nonlocal last_report
+        counts, unlabeled = result
+        for label in LABELS:
+            totals[label].update(counts[label])
+        info["records"] += len(chunk)
+        info["unlabeled"] += unlabeled
+        if max_vocab and _size(totals, "tokens") > max_vocab:
+            info["prune_cutoff"] = max(info["prune_cutoff"], _prune(totals, max_vocab))
+        if max_vocab and _size(totals, "hashtags") > max_vocab:
+            info["hashtag_prune_cutoff"] = max(
+                info["hashtag_prune_cutoff"], _prune(totals, max_vocab, "hashtags", ("hashtags",))
+            )
+        now = time.perf_counter()
+        if now - last_report >= progress_interval:
+            last_report = now
+            logger.info(f"{info['records']} records counted ({info['records'] / (now - started):.0f} records/s)")
+
+    if workers <= 1:
+        _init_worker(stop_words, label_map)
+        for chunk in chunks:
+            merge(chunk, count_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(stop_words, label_map)) as pool:
+            # bounded read-ahead keeps memory flat
+            pending = deque()
+            for chunk in chunks:
+                pending.append((chunk, pool.submit(count_chunk, chunk)))
+                if len(pending) >= workers * 2:
+                    chunk, future = pending.popleft()
+                    merge(chunk, future.result())
+            while pending:
+                chunk, future = pending.popleft()
+                merge(chunk, future.result())
+
+    info["posts"] = sum(counts.posts for counts in totals.values())
+    info["seconds"] = round(time.perf_counter() - started, 3)
+    return totals, info
+
+
+def write_artifacts(artifacts: Dict[str, dict], out_dir: str) -> None:
+    os.makedirs(out_dir, exist_ok=True)
+    for name, document in artifacts.items():
+        path = os.path.join(out_dir, name)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Regenerate the Insights JSON artifacts from a labeled corpus")
+    parser.add_argument("input", help="CSV (with header) or JSONL file")
+    parser.add_argument("--text-column", "--text-field", dest="text_field", default="text")
+    parser.add_argument("--label-column", "--label-field", dest="label_field", default="label",
+                        help="Real/Fake, True/False or 0/1 (0 = Real, 1 = Fake) label")
+    parser.add_argument("--label-map", type=parse_label_map, default={},
+                        help='override label values, e.g. "0=fake,1=real" for corpora coded the other way')
+    parser.add_argument("--input-format", choices=["csv", "jsonl"])
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR, help="directory for the JSON files (default: client/src/components)")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--stop-words", default="english", help='"english", "none" or a file with one word per line')
+    parser.add_argument("--top-words", type=int, default=25)
+    parser.add_argument("--top-hashtags", type=int, default=10)
+    parser.add_argument("--min-count", type=int, default=5, help="ignore rarer words in word_shift.json")
+    parser.add_argument("--max-vocab", type=int, default=2_000_000, help="prune the rarest words, and the rarest hashtags, above this many (0: never)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr, format="%(asctime)s %(message)s")
+    workers = (os.cpu_count() or 1) if args.workers is None else args.workers
+    records = read_records(args.input, _format_of(args.input, args.input_format), args.text_field, args.label_field)
+    totals, info = count_corpus(
+        _chunks(records, args.chunk_size), workers=workers, stop_words=load_stop_words(args.stop_words),
+        max_vocab=args.max_vocab or None, label_map=args.label_map,
+    )
+    if info["unlabeled"]:
+        logger.warning(f"Skipped {info['unlabeled']} records without a real/fake label in --label-column")
+    if info["prune_cutoff"]:
+        logger.warning(f"Vocabulary exceeded {args.max_vocab} words; counts of {info['prune_cutoff']} or less were dropped")
+    if info["hashtag_prune_cutoff"]:
+        logger.warning(f"Hashtags exceeded {args.max_vocab}; counts of {info['hashtag_prune_cutoff']} or less were dropped")
+
+    artifacts = build_artifacts(totals, args.top_words, args.top_hashtags, args.min_count)
+    write_artifacts(artifacts, args.out)
+    info["vocab_size"] = artifacts["word_shift.json"]["vocabSize"]
+    info["out"] = os.path.abspath(args.out)
+    logger.info(f"Counted {info['posts']} labeled posts of {info['records']} records in {info['seconds']}s")
+    print(json.dumps(info))
+
+
+if __name__ == "__main__":
+    main()
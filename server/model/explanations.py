@@ -0,0 +1,154 @@
+"""
+Deferred word-contribution explanations.
+
+POST /predict/ with defer_explanation returns the label as soon as it is
+known. The explanation is queued here and computed afterwards by one
+background thread, which drains whatever has queued up and scores it with
+a single model.score_texts call per top_k. The result is written to the
+analysis's history record, so GET /history/{id} shows it once it is done.
+
+The queue is bounded (EXPLAIN_QUEUE_SIZE, default 1000). When it is full,
+the explanation is dropped rather than slowing down predictions; the
+record then keeps its empty contributions. An explanation is also dropped
+if the model was reloaded in between: the contributions would describe a
+different model than the stored label.
+"""
+import logging
+import os
+import queue
+import threading
+from typing import Callable, List, Optional, Set, Tuple
+
+from log_setup import log_event
+
+logger = logging.getLogger(__name__)
+
+
+class ExplanationWorker:
+    """
+    Background thread computing explanations for saved analyses.
+
+    Args:
+        score_texts: model.score_texts(texts, top_k) -> results with
+            "word_contributions" and "model_version"
+        attach: Called as attach(record_id, word_contributions) with each result
+        max_queue: Explanations waiting before new ones are dropped
+        max_batch_size: Explanations scored per model call
+    """
+
+    def __init__(self, score_texts: Callable[..., List[dict]], attach: Callable[[int, dict], object],
+                 max_queue: int = 1000, max_batch_size: int = 64):
+        self.score_texts = score_texts
+        self.attach = attach
+        self.max_batch_size = max(1, max_batch_size)
+        self._queue: "queue.Queue[Tuple[int, str, Optional[int], str]]" = queue.Queue(max(1, max_queue))
+        self._pending: Set[int] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.completed = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="explanations", daemon=True)
+                    self._thread.start()
+
+    def submit(self, record_id: int, text: str, top_k: Optional[int], model_version: str) -> bool:
+        """
+        Queue an explanation for a saved record.
+
+        Args:
+            record_id: History record to attach the contributions to
+            text: The analyzed text
+            top_k: Contributions to keep (None for all)
+            model_version: Version that produced the record's label
+
+        Returns:
+            False if the queue was full and the explanation was dropped
+        """
+        self._ensure_started()
+        with self._lock:
+            self._pending.add(record_id)
+        try:
+            self._queue.put_nowait((record_id, text, top_k, model_version))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._pending.discard(record_id)
+                self.dropped += 1
+            log_event(logger, "explain.dropped", logging.WARNING, id=record_id)
+            return False
+
+    def is_pending(self, record_id: int) -> bool:
+        return record_id in self._pending
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for top_k in {item[2] for item in batch}:
+                self._explain([item for item in batch if item[2] == top_k], top_k)
+
+    def _explain(self, items: list, top_k: Optional[int]) -> None:
+        try:
+            results = self.score_texts([text for _, text, _, _ in items], top_k=top_k)
+            for (record_id, _, _, model_version), result in zip(items, results):
+                if result["model_version"] != model_version:
+                    log_event(logger, "explain.stale", id=record_id, version=model_version,
+                              active=result["model_version"])
+                    with self._lock:
+                        self.dropped += 1
+                    continue
+                self.attach(record_id, result["word_contributions"])
+                with self._lock:
+                    self.completed += 1
+        except Exception as e:
+            logger.error(f"Deferred explanation failed for {len(items)} records: {e}")
+            with self._lock:
+                self.failed += len(items)
+        finally:
+            with self._lock:
+                for record_id, _, _, _ in items:
+                    self._pending.discard(record_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "pending": len(self._pending),
+                "completed": self.completed,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+
+def _attach_to_history(record_id: int, word_contributions: dict) -> None:
+    from history.store import get_history_store
+
+    get_history_store().set_word_contributions(record_id, word_contributions)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_explanation_worker() -> ExplanationWorker:
+    """Process-wide worker writing explanations to the history store, created on first use."""
+    global _worker
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                from model import model
+
+                _worker = ExplanationWorker(
+                    model.score_texts, _attach_to_history,
+                    max_queue=int(os.environ.get("EXPLAIN_QUEUE_SIZE", "1000")),
+                )
+    return _worker
@@ -0,0 +1,158 @@
+"""
+Export the pickled vectorizer/classifier pair to a memory-mappable format.
+
+The output directory holds plain .npy arrays that every worker can
+np.load(..., mmap_mode="r"), so all processes on a box share the same
+physical pages instead of each unpickling its own copy:
+
+    tokens.npy      sorted vocabulary, fixed-width UTF-8 bytes (S<n>)
+    idf.npy         float64 IDF weight per token (same order as tokens)
+    coef.npy        logistic regression coefficient per token: float64, or
+                    float16/int8 for models quantized by model/compact.py
+                    (the manifest then records coef_dtype and coef_scale)
+    manifest.json   analyzer settings, intercept, class labels, shapes
+
+Usage (from server/):
+    python -m model.export [--out model/compiled]
+"""
+import argparse
+import hashlib
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(__file__)
+DEFAULT_EXPORT_DIR = os.path.join(BASE_DIR, "compiled")
+
+FORMAT_VERSION = 1
+# Written when coef.npy is quantized, so readers that only know float64 refuse it
+QUANTIZED_FORMAT_VERSION = 2
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _check_supported(vectorizer, clf) -> None:
+    """Raise ValueError for configurations the numpy scorer can't reproduce."""
+    if not hasattr(vectorizer, "vocabulary_"):
+        raise ValueError("Vectorizer has no vocabulary_ (HashingVectorizer is not supported)")
+    if getattr(vectorizer, "analyzer", "word") != "word":
+        raise ValueError(f"Unsupported analyzer: {vectorizer.analyzer!r}")
+    for attr in ("preprocessor", "tokenizer", "stop_words", "strip_accents"):
+        if getattr(vectorizer, attr, None) is not None:
+            raise ValueError(f"Unsupported vectorizer setting: {attr}={getattr(vectorizer, attr)!r}")
+    if not hasattr(clf, "coef_") or clf.coef_.shape[0] != 1:
+        raise ValueError("Only binary linear classifiers (coef_ with one row) are supported")
+
+
+def build_arrays(vectorizer, clf) -> dict:
+    """
+    Extract the token table, weights and analyzer settings from fitted estimators.
+
+    Returns:
+        {"tokens": ndarray, "idf": ndarray, "coef": ndarray, "manifest": dict}
+    """
+    _check_supported(vectorizer, clf)
+
+    vocabulary = vectorizer.vocabulary_
+    encoded = sorted((token.encode("utf-8"), column) for token, column in vocabulary.items())
+    columns = np.array([column for _, column in encoded], dtype=np.int64)
+    width = max(len(token) for token, _ in encoded)
+    tokens = np.array([token for token, _ in encoded], dtype=f"S{width}")
+
+    use_idf = bool(getattr(vectorizer, "use_idf", False)) and hasattr(vectorizer, "idf_")
+    if use_idf:
+        idf = np.asarray(vectorizer.idf_, dtype=np.float64)[columns]
+    else:
+        idf = np.ones(len(columns), dtype=np.float64)
+    coef = np.asarray(clf.coef_[0], dtype=np.float64)[columns]
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "n_features": int(len(tokens)),
+        "token_width": int(width),
+        "token_pattern": vectorizer.token_pattern,
+        "lowercase": bool(vectorizer.lowercase),
+        "ngram_range": list(vectorizer.ngram_range),
+        "binary": bool(vectorizer.binary),
+        "sublinear_tf": bool(getattr(vectorizer, "sublinear_tf", False)),
+        "norm": getattr(vectorizer, "norm", None),
+        "use_idf": use_idf,
+        "intercept": float(np.ravel(clf.intercept_)[0]),
+        "classes": [c.item() if hasattr(c, "item") else c for c in clf.classes_],
+    }
+    return {"tokens": tokens, "idf": idf, "coef": coef, "manifest": manifest}
+
+
+def export_artifacts(vectorizer, clf, out_dir: str = DEFAULT_EXPORT_DIR, sources: Optional[dict] = None) -> dict:
+    """
+    Write the mappable arrays and manifest for a fitted vectorizer/classifier.
+
+    Args:
+        vectorizer: Fitted TfidfVectorizer (or CountVectorizer)
+        clf: Fitted binary linear classifier with coef_ and intercept_
+        out_dir: Directory to write into (created if missing)
+        sources: Optional {name: path} of the source artifacts, recorded by hash
+
+    Returns:
+        The manifest that was written
+    """
+    return write_arrays(build_arrays(vectorizer, clf), out_dir, sources)
+
+
+def write_arrays(arrays: dict, out_dir: str, sources: Optional[dict] = None) -> dict:
+    """
+    Write arrays as returned by build_arrays (possibly modified, e.g. a
+    quantized coef) and their manifest.
+
+    Returns:
+        The manifest that was written
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Write arrays first and the manifest last, so a reader never sees a
+    # manifest pointing at half-written arrays. Each file is replaced rather
+    # than rewritten in place: a running server may still have the old one
+    # memory-mapped (see model/reload.py)
+    for name in ("tokens", "idf", "coef"):
+        path = os.path.join(out_dir, f"{name}.npy")
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, arrays[name])
+        os.replace(path + ".tmp", path)
+
+    manifest = dict(arrays["manifest"])
+    manifest["sources"] = {name: _file_digest(path) for name, path in (sources or {}).items()}
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export model artifacts to a memory-mappable format")
+    parser.add_argument("--vectorizer", default=os.path.join(BASE_DIR, "vectorizer.pkl"))
+    parser.add_argument("--classifier", default=os.path.join(BASE_DIR, "logistic_regression.pkl"))
+    parser.add_argument("--out", default=DEFAULT_EXPORT_DIR)
+    args = parser.parse_args(argv)
+
+    from model.model import _load_pickle
+
+    vectorizer = _load_pickle(args.vectorizer)
+    clf = _load_pickle(args.classifier)
+    manifest = export_artifacts(
+        vectorizer, clf, args.out,
+        sources={"vectorizer": args.vectorizer, "classifier": args.classifier},
+    )
+    print(f"Exported {manifest['n_features']} features to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
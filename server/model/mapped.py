@@ -0,0 +1,241 @@
+"""
+Numpy-only prediction from the artifacts written by model/export.py.
+
+Used by model.py when MODEL_ENGINE=numpy, so requests never go through
+sklearn's input validation. Exported arrays are opened with
+np.load(..., mmap_mode="r"): loading is near-instant and every process
+that maps the same files shares one copy of the pages.
+Feature extraction reproduces sklearn's word analyzer and TF-IDF weighting
+with plain numpy; token lookup is a binary search over the sorted,
+fixed-width token table.
+
+Check parity with the pickled sklearn pipeline (from server/):
+    python -m model.mapped --check [--texts FILE] [--export-dir DIR]
+tests/test_mapped.py runs the same check under pytest.
+"""
+import json
+import os
+import re
+from collections import namedtuple
+from typing import List
+
+import numpy as np
+
+from model.export import DEFAULT_EXPORT_DIR, FORMAT_VERSION, QUANTIZED_FORMAT_VERSION, build_arrays
+
+# CSR-style batch of feature rows: row i is indices/data[indptr[i]:indptr[i + 1]]
+SparseRows = namedtuple("SparseRows", ["indptr", "indices", "data", "shape"])
+
+
+class MappedModel:
+    """TF-IDF + binary logistic regression scored with numpy only."""
+
+    def __init__(self, tokens: np.ndarray, idf: np.ndarray, coef: np.ndarray, manifest: dict, path: str = None):
+        if manifest.get("format_version") not in (FORMAT_VERSION, QUANTIZED_FORMAT_VERSION):
+            raise ValueError(f"Unsupported model format version: {manifest.get('format_version')}")
+
+        self.path = path
+        self.manifest = manifest
+        self.tokens = tokens
+        self.idf = idf
+        # float16/int8 for quantized models; coef * coef_scale is the weight
+        self.coef = coef
+        self.coef_scale = float(manifest.get("coef_scale", 1.0))
+        self.intercept = float(manifest["intercept"])
+        self.classes_ = np.array(manifest["classes"])
+
+        self._token_width = int(manifest["token_width"])
+        self._token_re = re.compile(manifest["token_pattern"])
+        self._lowercase = manifest["lowercase"]
+        self._min_n, self._max_n = manifest["ngram_range"]
+        self._binary = manifest["binary"]
+        self._sublinear_tf = manifest["sublinear_tf"]
+        self._norm = manifest["norm"]
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_EXPORT_DIR) -> "MappedModel":
+        """Memory-map an exported model directory."""
+        manifest_path = os.path.join(path, "manifest.json")
+        if not os.path.exists(manifest_path):
+            raise FileNotFoundError(f"No exported model found in {path}. Run: python -m model.export")
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        return cls(
+            np.load(os.path.join(path, "tokens.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "idf.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, "coef.npy"), mmap_mode="r"),
+            manifest,
+            path=path,
+        )
+
+    @classmethod
+    def from_estimators(cls, vectorizer, clf) -> "MappedModel":
+        """Build an in-memory scorer from fitted sklearn estimators (no export needed)."""
+        arrays = build_arrays(vectorizer, clf)
+        return cls(arrays["tokens"], arrays["idf"], arrays["coef"], arrays["manifest"])
+
+    @property
+    def n_features(self) -> int:
+        return len(self.tokens)
+
+    def coef_at(self, indices: np.ndarray) -> np.ndarray:
+        """float64 weights of the given features (dequantized if needed)."""
+        weights = self.coef[indices].astype(np.float64, copy=False)
+        if self.coef_scale != 1.0:
+            weights = weights * self.coef_scale
+        return weights
+
+    def feature_name(self, index: int) -> str:
+        return self.tokens[index].decode("utf-8")
+
+    def analyze(self, doc: str) -> List[str]:
+        """Unigrams/n-grams exactly as sklearn's word analyzer produces them."""
+        if self._lowercase:
+            doc = doc.lower()
+        tokens = self._token_re.findall(doc)
+        min_n, max_n = self._min_n, self._max_n
+        if max_n == 1:
+            return tokens
+
+        terms = list(tokens) if min_n == 1 else []
+        min_n = max(min_n, 2)
+        for n in range(min_n, min(max_n, len(tokens)) + 1):
+            terms.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return terms
+
+    def _lookup(self, terms: List[str]) -> np.ndarray:
+        """Feature indices of the in-vocabulary terms (with repeats)."""
+        width = self._token_width
+        encoded = [term.encode("utf-8") for term in terms]
+        # longer terms can't be in the vocabulary, and would be truncated by the S<n> dtype
+        encoded = [term for term in encoded if len(term) <= width]
+        if not encoded:
+            return np.empty(0, dtype=np.int64)
+        probe = np.array(encoded, dtype=self.tokens.dtype)
+        positions = np.searchsorted(self.tokens, probe)
+        positions[positions == len(self.tokens)] = 0
+        return positions[self.tokens[positions] == probe]
+
+    def transform(self, docs: List[str]) -> SparseRows:
+        """TF-IDF feature rows for already-preprocessed documents."""
+        indptr = [0]
+        all_indices = []
+        all_data = []
+        for doc in docs:
+            indices, counts = np.unique(self._lookup(self.analyze(doc)), return_counts=True)
+            if self._binary:
+                tf = np.ones(len(indices))
+            elif self._sublinear_tf:
+                tf = 1.0 + np.log(counts)
+            else:
+                tf = counts.astype(np.float64)
+            data = tf * self.idf[indices]
+            if self._norm == "l2" and len(data):
+                data /= np.sqrt(np.dot(data, data))
+            elif self._norm == "l1" and len(data):
+                data /= np.abs(data).sum()
+            all_indices.append(indices)
+            all_data.append(data)
+            indptr.append(indptr[-1] + len(indices))
+
+        return SparseRows(
+            indptr=np.array(indptr, dtype=np.int64),
+            indices=np.concatenate(all_indices) if all_indices else np.empty(0, dtype=np.int64),
+            data=np.concatenate(all_data) if all_data else np.empty(0),
+            shape=(len(docs), self.n_features),
+        )
+
+    def decision_function(self, X: SparseRows) -> np.ndarray:
+        """One dot product per row: data . coef[indices] + intercept."""
+        n_rows = X.shape[0]
+        rows = np.repeat(np.arange(n_rows), np.diff(X.indptr))
+        return np.bincount(rows, weights=X.data * self.coef_at(X.indices), minlength=n_rows) + self.intercept
+
+    def predict_proba(self, X: SparseRows) -> np.ndarray:
+        positive = 1.0 / (1.0 + np.exp(-self.decision_function(X)))
+        return np.column_stack([1.0 - positive, positive])
+
+    def predict(self, X: SparseRows) -> np.ndarray:
+        return self.classes_[(self.decision_function(X) > 0).astype(int)]
+
+
+def load_mapped_model(path: str = DEFAULT_EXPORT_DIR) -> MappedModel:
+    """Open an exported model directory (see model/export.py)."""
+    return MappedModel.load(path)
+
+
+# Sample inputs for the parity check, covering URLs, mentions, hashtags,
+# punctuation runs, repeated characters, n-grams and out-of-vocabulary text
+PARITY_SAMPLES = [
+    "The vaccine contains microchips!!! Share before they delete this http://t.co/abc",
+    "Government confirms new budget for schools and hospitals.",
+    "@WHO says #COVID19 cases are falling... soooo good news??",
+    "BREAKING: celebrity arrested, media won't report it!!!!",
+    "Scientists publish peer-reviewed study on climate change",
+    "zzzz qqqq xxyyzz",
+    "the the the of of and",
+]
+
+
+def check_parity(vectorizer, clf, scorer: MappedModel, texts: List[str], tolerance: float = 1e-9) -> dict:
+    """
+    Compare scorer against the sklearn pipeline on preprocessed texts.
+
+    Returns:
+        {"texts", "label_mismatches", "max_proba_diff", "ok"}
+    """
+    X = vectorizer.transform(texts)
+    expected_proba = clf.predict_proba(X)
+    expected_labels = clf.predict(X)
+
+    rows = scorer.transform(texts)
+    proba = scorer.predict_proba(rows)
+    labels = scorer.predict(rows)
+
+    max_diff = float(np.abs(expected_proba - proba).max()) if len(texts) else 0.0
+    mismatches = int((expected_labels != labels).sum())
+    return {
+        "texts": len(texts),
+        "label_mismatches": mismatches,
+        "max_proba_diff": max_diff,
+        "ok": mismatches == 0 and max_diff <= tolerance,
+    }
+
+
+def main(argv=None):
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Numpy model scorer utilities")
+    parser.add_argument("--check", action="store_true", help="compare against the pickled sklearn pipeline")
+    parser.add_argument("--texts", help="file with one raw text per line (default: built-in samples)")
+    parser.add_argument("--export-dir", help="check an exported directory instead of weights extracted in memory")
+    args = parser.parse_args(argv)
+
+    if not args.check:
+        parser.print_help()
+        return
+
+    from model import model
+
+    vectorizer, clf = model._load_sklearn_pair()
+    if args.texts:
+        with open(args.texts, encoding="utf-8") as f:
+            raw = [line.rstrip("\n") for line in f if line.strip()]
+    else:
+        raw = PARITY_SAMPLES
+    texts = model.preprocess_texts(raw)
+
+    if args.export_dir:
+        scorer = MappedModel.load(args.export_dir)
+    else:
+        scorer = MappedModel.from_estimators(vectorizer, clf)
+
+    result = check_parity(vectorizer, clf, scorer, texts)
+    print(result)
+    if not result["ok"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
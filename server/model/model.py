@@ -1,17 +1,28 @@
+import hashlib
 import os
 import pickle
-import re
 import string
-from typing import Tuple
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+import numpy as np
+
+from model.cache import PredictionCache, make_key
+from model.export import DEFAULT_EXPORT_DIR
+from model.mapped import MappedModel
+from model.normalizer import normalize_text, normalize_texts
+from model.reload import ArtifactWatcher, ModelHolder
+from metrics import STAGE_SECONDS
+from log_setup import log_event
+
 logger = logging.getLogger(__name__)
 
 BASE_DIR = os.path.dirname(__file__)
-VECT_PATH = os.path.join(BASE_DIR, "vectorizer.pkl")
-CLF_PATH = os.path.join(BASE_DIR, "logistic_regression.pkl")
+# Directory holding the pickled pair, e.g. the output of model/compact.py
+MODEL_DIR = os.environ.get("MODEL_DIR", BASE_DIR)
+VECT_PATH = os.path.join(MODEL_DIR, "vectorizer.pkl")
+CLF_PATH = os.path.join(MODEL_DIR, "logistic_regression.pkl")
 
 
 def _load_pickle(path: str):
@@ -19,24 +30,189 @@ def _load_pickle(path: str):
         return pickle.load(f)
 
 
-# lazy-loaded objects
-_vectorizer = None
-_clf = None
+# Number of word contributions returned per prediction (largest |contribution| first)
+CONTRIBUTIONS_TOP_K = 20
+
+# Result cache keyed on the preprocessed text; set either limit to 0 to disable
+_cache = PredictionCache(
+    max_entries=int(os.environ.get("PREDICTION_CACHE_MAX_ENTRIES", "10000")),
+    max_bytes=int(os.environ.get("PREDICTION_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
+
+# Inference engine: "numpy" scores with the numpy-only MappedModel (no sklearn
+# at request time, and no sklearn import at all when an exported model exists
+# in MODEL_EXPORT_DIR); "sklearn" uses the pickled estimators directly
+MODEL_ENGINE = os.environ.get("MODEL_ENGINE", "numpy").lower()
+EXPORT_DIR = os.environ.get("MODEL_EXPORT_DIR", DEFAULT_EXPORT_DIR)
+
+class LoadedModel:
+    """
+    One loaded model version. Nothing on it changes after loading; a reload
+    builds a new LoadedModel instead (see model/reload.py).
+
+    Attributes:
+        version: Short content hash of the artifact files
+        vectorizer, clf: Pickled sklearn estimators (None when the numpy
+            engine runs from an exported directory)
+        scorer: MappedModel used by the numpy engine, or None for sklearn
+        source: Directory the artifacts were loaded from
+    """
+
+    def __init__(self, version: str, source: str, vectorizer=None, clf=None, scorer: Optional[MappedModel] = None):
+        self.version = version
+        self.source = source
+        self.vectorizer = vectorizer
+        self.clf = clf
+        self.scorer = scorer
+        self.loaded_at = datetime.now().isoformat(timespec="seconds")
+        # index -> token lookup and coefficient row for the sklearn engine
+        self.feature_names = None
+        self.coef = None
+        if scorer is None:
+            # not available for HashingVectorizer; contributions fall back to idx_<n> names
+            if hasattr(vectorizer, "get_feature_names_out"):
+                self.feature_names = vectorizer.get_feature_names_out()
+            if hasattr(clf, "coef_"):
+                self.coef = np.asarray(clf.coef_[0], dtype=np.float64)
+            else:
+                logger.warning("Classifier has no coef_ attribute; contributions will be zeroed.")
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "engine": "numpy" if self.scorer is not None else "sklearn",
+            "source": self.source,
+            "n_features": self.scorer.n_features if self.scorer is not None else (
+                len(self.feature_names) if self.feature_names is not None else None),
+            "loaded_at": self.loaded_at,
+        }
+
+
+def _use_export() -> bool:
+    return MODEL_ENGINE == "numpy" and os.path.exists(os.path.join(EXPORT_DIR, "manifest.json"))
+
+
+def artifact_paths() -> List[str]:
+    """Files the next load reads (the manifest is written last by model/export.py)."""
+    if _use_export():
+        return [os.path.join(EXPORT_DIR, "manifest.json")]
+    return [VECT_PATH, CLF_PATH]
+
+
+def _artifacts_version(paths: List[str]) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def _load_sklearn_pair():
+    if not os.path.exists(VECT_PATH) or not os.path.exists(CLF_PATH):
+        raise FileNotFoundError("Model artifacts not found. Expected vectorizer.pkl and logistic_regression.pkl in server/model/")
+    return _load_pickle(VECT_PATH), _load_pickle(CLF_PATH)
+
+
+def load_model() -> LoadedModel:
+    """Load a new model version from the artifacts currently on disk."""
+    if _use_export():
+        paths = [os.path.join(EXPORT_DIR, name) for name in ("manifest.json", "tokens.npy", "idf.npy", "coef.npy")]
+        loaded = LoadedModel(_artifacts_version(paths), EXPORT_DIR, scorer=MappedModel.load(EXPORT_DIR))
+        logger.info(f"Loaded exported model {loaded.version} from {EXPORT_DIR}")
+        return loaded
+
+    vectorizer, clf = _load_sklearn_pair()
+    version = _artifacts_version([VECT_PATH, CLF_PATH])
+    scorer = None
+    if MODEL_ENGINE == "numpy":
+        try:
+            scorer = MappedModel.from_estimators(vectorizer, clf)
+        except ValueError as e:
+            logger.warning(f"Numpy engine unavailable ({e}); using sklearn")
+    loaded = LoadedModel(version, MODEL_DIR, vectorizer=vectorizer, clf=clf, scorer=scorer)
+    logger.info(f"Loaded model {loaded.version} from {MODEL_DIR}")
+    return loaded
+
+
+def warm_model(loaded: LoadedModel) -> None:
+    """Score the parity samples with a new version (bypassing the cache) before it serves requests."""
+    from model.mapped import PARITY_SAMPLES
+
+    X = _transform(loaded, preprocess_texts(PARITY_SAMPLES))
+    labels, confidences = _labels_and_confidences(loaded, X)
+    for row in range(len(PARITY_SAMPLES)):
+        _row_contributions(loaded, X, row, CONTRIBUTIONS_TOP_K)
+    if not all(np.isfinite(confidence) for confidence in confidences):
+        raise ValueError("Model produced non-finite confidences on the warm-up samples")
+
+
+def _on_swap(previous: Optional[LoadedModel], loaded: LoadedModel) -> None:
+    # cached results belong to the old version (lookups also check the
+    # version, in case an in-flight request caches an old result afterwards)
+    _cache.clear()
+
+
+_holder = ModelHolder(load_model, warm_model, on_swap=_on_swap)
+
+
+def _ensure_loaded() -> LoadedModel:
+    """The active model version, loading it on first use."""
+    return _holder.get()
+
+
+def current_version() -> str:
+    """Version of the active model, loading it on first use."""
+    return _holder.get().version
 
 
-def _ensure_loaded():
-    global _vectorizer, _clf
-    if _vectorizer is None:
-        if not os.path.exists(VECT_PATH) or not os.path.exists(CLF_PATH):
-            raise FileNotFoundError("Model artifacts not found. Expected vectorizer.pkl and logistic_regression.pkl in server/model/")
-        _vectorizer = _load_pickle(VECT_PATH)
-    if _clf is None:
-        _clf = _load_pickle(CLF_PATH)
+def reload_model(force: bool = False, reason: str = "manual") -> dict:
+    """Load, warm and atomically swap in the artifacts on disk (see ModelHolder.reload)."""
+    return _holder.reload(force=force, reason=reason)
+
+
+def reload_model_in_background(force: bool = False, reason: str = "manual") -> bool:
+    return _holder.reload_in_background(force=force, reason=reason)
+
+
+def model_status() -> dict:
+    """Active version details plus reload state and recent swaps."""
+    status = _holder.status()
+    current = _holder.current
+    status["active"] = current.info() if current is not None else None
+    return status
+
+
+def watch_artifacts(interval: float) -> ArtifactWatcher:
+    """Start polling the artifact files and reload when they change."""
+    watcher = ArtifactWatcher(_holder, artifact_paths, interval)
+    watcher.start()
+    return watcher
+
+
+def _transform(active: LoadedModel, processed_texts: List[str]):
+    """Vectorize preprocessed texts into CSR-shaped rows with the version's engine."""
+    if active.scorer is not None:
+        return active.scorer.transform(processed_texts)
+    return active.vectorizer.transform(processed_texts).tocsr()
+
+
+def _feature_name(active: LoadedModel, index: int) -> str:
+    if active.scorer is not None:
+        return active.scorer.feature_name(index)
+    if active.feature_names is not None:
+        return str(active.feature_names[index])
+    return f"idx_{index}"
 
 
 def preprocess_text(text: str) -> str:
     """
     Enhanced preprocessing for text before model prediction.
+
+    Lowercases, collapses whitespace, replaces URLs and mentions with
+    placeholders, keeps hashtag content, squashes punctuation runs, strips
+    other symbols and shortens repeated characters (e.g. "soooo" -> "soo").
+    The work is done by the single-pass normalizer in model/normalizer.py.
     
     Args:
         text: Raw input text
@@ -44,35 +220,20 @@ def preprocess_text(text: str) -> str:
     Returns:
         Preprocessed text ready for model input
     """
-    # Convert to lowercase
-    text = text.lower()
-    
-    # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Handle URLs (replace with placeholder)
-    text = re.sub(r'http[s]?://\S+', 'URL_PLACEHOLDER', text)
-    text = re.sub(r'www\.\S+', 'URL_PLACEHOLDER', text)
-    
-    # Handle mentions and hashtags (keep the content but normalize)
-    text = re.sub(r'@\w+', 'USER_MENTION', text)
-    text = re.sub(r'#(\w+)', r'\1', text)  # Keep hashtag content
-    
-    # Handle excessive punctuation
-    text = re.sub(r'[!]{2,}', '!', text)
-    text = re.sub(r'[?]{2,}', '?', text)
-    text = re.sub(r'[.]{2,}', '...', text)
-    
-    # Remove extra punctuation but keep sentence structure
-    text = re.sub(r'[^\w\s!?.,]', ' ', text)
-    
-    # Handle repeated characters (e.g., "soooo" -> "so")
-    text = re.sub(r'(.)\1{2,}', r'\1\1', text)
-    
-    # Clean up final spacing
-    text = text.strip()
-    
-    return text
+    return normalize_text(text)
+
+
+def preprocess_texts(texts: List[str]) -> List[str]:
+    """
+    Batch variant of preprocess_text.
+
+    Args:
+        texts: Raw input texts
+
+    Returns:
+        Preprocessed texts, in input order
+    """
+    return normalize_texts(texts)
 
 def postprocess_prediction(label: str, confidence: float) -> Tuple[str, float]:
     """
@@ -112,6 +273,8 @@ def postprocess_prediction(label: str, confidence: float) -> Tuple[str, float]:
 def predict_text(text: str) -> Tuple[str, float]:
     """
     Enhanced prediction function with preprocessing and postprocessing.
+
+    Goes through the same cached, single-classifier-call path as score_texts.
     
     Args:
         text: Input text to analyze
@@ -120,49 +283,220 @@ def predict_text(text: str) -> Tuple[str, float]:
         Tuple of (prediction_label, confidence_score)
     """
     try:
-        logger.info(f"Starting prediction for text of length: {len(text)}")
-        
-        # Ensure models are loaded
-        _ensure_loaded()
-        
-        # Preprocess the input text
-        processed_text = preprocess_text(text)
-        logger.info(f"Text preprocessed. Original length: {len(text)}, Processed length: {len(processed_text)}")
-        
-        # Transform text using the vectorizer
-        X = _vectorizer.transform([processed_text])
-        
-        # Get predicted label
-        label = _clf.predict(X)[0]
-        
-        # Calculate confidence score
-        confidence = 0.0
-        if hasattr(_clf, "predict_proba"):
-            probs = _clf.predict_proba(X)[0]
-            confidence = float(max(probs))
-            logger.info(f"Prediction probabilities: {probs}")
-        else:
-            # Fallback to decision function
-            if hasattr(_clf, "decision_function"):
-                score = _clf.decision_function(X)
-                # Convert to 0-1 confidence using sigmoid
-                import math
-                
-                def _sigmoid(x):
-                    return 1 / (1 + math.exp(-x))
-                
-                confidence = float(_sigmoid(float(score)))
-            else:
-                logger.warning("Classifier has no predict_proba or decision_function method")
-                confidence = 0.5  # Default neutral confidence
-        
-        # Postprocess the results
-        processed_label, processed_confidence = postprocess_prediction(label, confidence)
+        result = score_texts([text], top_k=0)[0]
+        processed_label, processed_confidence = result["prediction"], result["confidence"]
         
-        logger.info(f"Prediction completed: {processed_label} (confidence: {processed_confidence})")
+        log_event(logger, "model.score", text_length=len(text), prediction=processed_label,
+                  confidence=processed_confidence)
         
         return processed_label, processed_confidence
         
     except Exception as e:
         logger.error(f"Error in predict_text: {e}")
         raise e
+
+
+def _labels_and_confidences(active: LoadedModel, X) -> Tuple[list, list]:
+    """Score an already-vectorized batch with one classifier call."""
+    clf = active.scorer if active.scorer is not None else active.clf
+    if hasattr(clf, "predict_proba"):
+        probs = clf.predict_proba(X)
+        best = probs.argmax(axis=1)
+        labels = clf.classes_[best]
+        confidences = probs[np.arange(X.shape[0]), best]
+    else:
+        labels = clf.predict(X)
+        if hasattr(clf, "decision_function"):
+            # Convert to 0-1 confidence using sigmoid
+            scores = np.ravel(clf.decision_function(X))
+            confidences = 1 / (1 + np.exp(-scores))
+        else:
+            logger.warning("Classifier has no predict_proba or decision_function method")
+            confidences = [0.5] * X.shape[0]
+    return list(labels), list(confidences)
+
+
+def _row_contributions(active: LoadedModel, X, row: int, top_k: Optional[int]) -> Dict[str, float]:
+    """
+    Word contributions (tf-idf value * coefficient) for one row of a CSR matrix.
+
+    Only the row's stored entries are touched, so the cost follows the input
+    length rather than the vocabulary size.
+    """
+    start, end = X.indptr[row], X.indptr[row + 1]
+    if start == end:
+        return {}
+
+    indices = X.indices[start:end]
+    if active.scorer is not None:
+        # the scorer's feature indices follow its own (sorted) token table
+        contribs = X.data[start:end] * active.scorer.coef_at(indices)
+    elif active.coef is None:
+        contribs = np.zeros(end - start)
+    else:
+        contribs = X.data[start:end] * active.coef[indices]
+
+    magnitude = np.abs(contribs)
+    if top_k and len(contribs) > top_k:
+        order = np.argpartition(-magnitude, top_k - 1)[:top_k]
+        order = order[np.argsort(-magnitude[order], kind="stable")]
+    else:
+        order = np.argsort(-magnitude, kind="stable")
+
+    return {_feature_name(active, indices[i]): float(contribs[i]) for i in order}
+
+
+def score_texts(texts: List[str], top_k: Optional[int] = CONTRIBUTIONS_TOP_K) -> List[dict]:
+    """
+    Predict and explain many texts with a single transform and classifier call.
+
+    Texts whose preprocessed form is already in the prediction cache skip
+    the vectorizer, the classifier and the contribution computation.
+
+    Args:
+        texts: Input texts to analyze
+        top_k: Maximum number of word contributions per text (None for all,
+            0 for none: the label only, skipping the contribution step)
+
+    Returns:
+        One dict per text with "prediction", "confidence",
+        "word_contributions" (sorted by absolute contribution) and
+        "model_version"
+    """
+    if not texts:
+        return []
+
+    # the whole batch is scored by this version, even if a reload swaps
+    # in a new one meanwhile
+    active = _ensure_loaded()
+
+    with STAGE_SECONDS.time("preprocess"):
+        processed_texts = preprocess_texts(texts)
+
+    # Serve what we can from the cache; texts that preprocess to the same
+    # string are only scored once per batch
+    results = [None] * len(texts)
+    pending = {}  # cache key -> (processed text, positions in the batch)
+    with STAGE_SECONDS.time("cache_lookup"):
+        for position, processed_text in enumerate(processed_texts):
+            key = make_key(processed_text)
+            if key in pending:
+                pending[key][1].append(position)
+                continue
+            cached = _cache.get(key)
+            if cached is not None and cached["model_version"] == active.version and _covers_top_k(cached, top_k):
+                results[position] = _cached_result(cached, top_k)
+            else:
+                pending[key] = (processed_text, [position])
+
+    if pending:
+        keys = list(pending)
+        with STAGE_SECONDS.time("transform"):
+            X = _transform(active, [pending[key][0] for key in keys])
+        with STAGE_SECONDS.time("predict_proba"):
+            labels, confidences = _labels_and_confidences(active, X)
+
+        with STAGE_SECONDS.time("contributions"):
+            for row, key in enumerate(keys):
+                processed_label, processed_confidence = postprocess_prediction(labels[row], confidences[row])
+                entry = {
+                    "prediction": processed_label,
+                    "confidence": processed_confidence,
+                    "word_contributions": _row_contributions(active, X, row, top_k) if top_k != 0 else {},
+                    "top_k": top_k,
+                    "model_version": active.version,
+                }
+                _cache.put(key, entry)
+                for position in pending[key][1]:
+                    results[position] = _cached_result(entry, top_k)
+
+    return results
+
+
+def _covers_top_k(entry: dict, top_k: Optional[int]) -> bool:
+    """Whether a cached entry holds at least the requested number of contributions."""
+    if entry["top_k"] is None:
+        return True
+    return top_k is not None and top_k <= entry["top_k"]
+
+
+def _cached_result(entry: dict, top_k: Optional[int]) -> dict:
+    """Copy of a cache entry, trimmed to top_k contributions, safe for callers to mutate."""
+    contributions = entry["word_contributions"]
+    if top_k is not None and len(contributions) > top_k:
+        contributions = dict(list(contributions.items())[:top_k])
+    else:
+        contributions = dict(contributions)
+    return {
+        "prediction": entry["prediction"],
+        "confidence": entry["confidence"],
+        "word_contributions": contributions,
+        "model_version": entry["model_version"],
+    }
+
+
+def cache_stats() -> dict:
+    """Hit/miss/eviction counters and current size of the prediction cache."""
+    return _cache.stats()
+
+
+def score_text(text: str, top_k: Optional[int] = CONTRIBUTIONS_TOP_K) -> dict:
+    """
+    Predict and explain a single text in one pass.
+
+    Args:
+        text: Input text to analyze
+        top_k: Maximum number of word contributions to return (None for all)
+
+    Returns:
+        Dict with "prediction", "confidence", "word_contributions" and
+        "model_version"
+    """
+    try:
+        result = score_texts([text], top_k)[0]
+        log_event(logger, "model.score", text_length=len(text), prediction=result["prediction"],
+                  confidence=result["confidence"])
+        return result
+    except Exception as e:
+        logger.error(f"Error in score_text: {e}")
+        raise e
+
+
+def predict_texts(texts: List[str]) -> List[Tuple[str, float]]:
+    """
+    Batch prediction: preprocess, vectorize and score many texts at once.
+
+    The vectorizer transform and predict_proba run a single time over the
+    whole batch, so sklearn's per-call validation is paid once per batch
+    instead of once per text.
+
+    Args:
+        texts: Input texts to analyze
+
+    Returns:
+        List of (prediction_label, confidence_score), in input order
+    """
+    if not texts:
+        return []
+
+    try:
+        active = _ensure_loaded()
+
+        with STAGE_SECONDS.time("preprocess"):
+            processed_texts = preprocess_texts(texts)
+        with STAGE_SECONDS.time("transform"):
+            X = _transform(active, processed_texts)
+        with STAGE_SECONDS.time("predict_proba"):
+            labels, confidences = _labels_and_confidences(active, X)
+
+        results = [
+            postprocess_prediction(label, confidence)
+            for label, confidence in zip(labels, confidences)
+        ]
+
+        log_event(logger, "model.batch", size=len(results))
+        return results
+
+    except Exception as e:
+        logger.error(f"Error in predict_texts: {e}")
+        raise e
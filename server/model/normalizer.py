@@ -0,0 +1,80 @@
+"""
+Single-pass text normalizer used by model.preprocess_text.
+
+Produces exactly the same output as the original chain of re.sub passes
+(whitespace, URLs, www, mentions, hashtags, punctuation runs, character
+class), but does the substitutions in one scan of a combined pattern.
+Only the repeated-character collapse needs a second scan, because runs can
+form across the substitutions (e.g. "a#a#a" -> "aaa" -> "aa").
+"""
+import re
+from typing import Iterable, List
+
+# Every match starts with one character from [\Whw]; the branch that follows
+# looks back at that character to decide what it is. Leading with a plain
+# character class lets the regex engine skip ordinary word characters without
+# trying each alternative at every position.
+#
+# The branch order (and the shape of the mention/hashtag patterns) reproduces
+# the precedence the sequential passes had:
+#  - URLs swallow everything up to the next whitespace
+#  - a mention's \w+ also runs over any URL placeholder inside it
+#  - a '#' disappears when followed by a word char or a mention
+_COMBINED_RE = re.compile(
+    r"[\Whw]"
+    r"(?:(?P<space>(?<=\s)\s+|(?<=[^\S ]))"
+    r"|(?P<url>(?<=h)ttps?://\S+|(?<=w)ww\.\S+)"
+    r"|(?P<mention>(?<=@)(?:\w*?(?:https?://|www\.)\S+|\w+))"
+    r"|(?P<hashtag>(?<=\#)(?=@?\w))"
+    r"|(?P<bang>(?<=!)!+)"
+    r"|(?P<question>(?<=\?)\?+)"
+    r"|(?P<dots>(?<=\.)\.+)"
+    r"|(?P<other>(?<=[^\w\s!?.,])))"
+)
+
+_REPLACEMENTS = {
+    "space": " ",
+    "url": "URL_PLACEHOLDER",
+    "mention": "USER_MENTION",
+    "hashtag": "",
+    "bang": "!",
+    "question": "?",
+    "dots": "...",
+    "other": " ",
+}
+
+# Handle repeated characters (e.g., "soooo" -> "soo")
+_REPEAT_RE = re.compile(r"(.)\1{2,}")
+
+
+def _dispatch(match: "re.Match") -> str:
+    return _REPLACEMENTS[match.lastgroup]
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text for model input.
+
+    Args:
+        text: Raw input text
+
+    Returns:
+        Normalized text, identical to the original multi-pass preprocessing
+    """
+    text = _COMBINED_RE.sub(_dispatch, text.lower())
+    return _REPEAT_RE.sub(r"\1\1", text).strip()
+
+
+def normalize_texts(texts: Iterable[str]) -> List[str]:
+    """
+    Normalize a batch of texts.
+
+    Args:
+        texts: Raw input texts
+
+    Returns:
+        Normalized texts, in input order
+    """
+    sub = _COMBINED_RE.sub
+    repeat_sub = _REPEAT_RE.sub
+    return [repeat_sub(r"\1\1", sub(_dispatch, text.lower())).strip() for text in texts]
@@ -0,0 +1,210 @@
+"""
+Versioned model holder for reloading artifacts without a restart.
+
+The holder keeps one reference to the active model version. A reload
+builds the new version on the side, warms it with a few sample
+inferences and then replaces that reference in one assignment. A request
+reads the reference once at its start and keeps using that object, so a
+request already in flight finishes on the old version. The old version
+is freed when its last request drops it.
+
+Reloads come from POST /model/reload or from ArtifactWatcher, which polls
+the artifact files' modification times. Only one reload runs at a time.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ReloadInProgress(RuntimeError):
+    """Raised when a reload is requested while another one is running."""
+
+
+class ModelHolder:
+    """
+    Args:
+        loader: Builds a new model version from the artifacts on disk; the
+            returned object has a .version attribute
+        warm: Runs sample inferences on a freshly loaded version, raising if
+            the version is unusable
+        on_swap: Called as on_swap(old, new) right after a swap
+    """
+
+    def __init__(self, loader: Callable[[], object], warm: Callable[[object], None],
+                 on_swap: Optional[Callable[[object, object], None]] = None, keep_history: int = 10):
+        self._loader = loader
+        self._warm = warm
+        self._on_swap = on_swap
+        self._current = None
+        self._init_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._history: List[dict] = []
+        self._keep_history = keep_history
+        self.last_error: Optional[str] = None
+
+    @property
+    def current(self):
+        """The active version, or None before the first load."""
+        return self._current
+
+    def get(self):
+        """The active version, loading (and warming) the initial one on first use."""
+        current = self._current
+        if current is not None:
+            return current
+        with self._init_lock:
+            if self._current is None:
+                loaded = self._loader()
+                self._warm(loaded)
+                self._current = loaded
+                self._record(None, loaded, "initial")
+            return self._current
+
+    @property
+    def reloading(self) -> bool:
+        return self._reload_lock.locked()
+
+    def reload(self, force: bool = False, reason: str = "manual") -> dict:
+        """
+        Load, warm and swap in the artifacts currently on disk.
+
+        Args:
+            force: Swap even if the artifacts hash to the active version
+            reason: Recorded in the reload history (e.g. "manual", "watcher")
+
+        Returns:
+            {"swapped", "version", "previous_version", "seconds"}
+
+        Raises:
+            ReloadInProgress: Another reload is running
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgress("A model reload is already running")
+        try:
+            started = time.perf_counter()
+            previous = self._current
+            try:
+                loaded = self._loader()
+                if previous is not None and loaded.version == previous.version and not force:
+                    logger.info(f"Model artifacts unchanged (version {loaded.version}); not swapping")
+                    return {"swapped": False, "version": previous.version, "previous_version": previous.version,
+                            "seconds": round(time.perf_counter() - started, 3)}
+                self._warm(loaded)
+            except Exception as e:
+                self.last_error = f"{type(e).__name__}: {e}"
+                logger.error(f"Model reload failed, keeping version "
+                             f"{previous.version if previous else None}: {self.last_error}")
+                raise
+
+            self._current = loaded
+            self.last_error = None
+            if self._on_swap is not None:
+                self._on_swap(previous, loaded)
+            seconds = round(time.perf_counter() - started, 3)
+            self._record(previous, loaded, reason, seconds)
+            logger.info(f"Swapped model {previous.version if previous else None} -> {loaded.version} in {seconds}s")
+            return {"swapped": True, "version": loaded.version,
+                    "previous_version": previous.version if previous else None, "seconds": seconds}
+        finally:
+            self._reload_lock.release()
+
+    def reload_in_background(self, force: bool = False, reason: str = "manual") -> bool:
+        """Start a reload on a daemon thread. Returns False if one is already running."""
+        if self.reloading:
+            return False
+
+        def run():
+            try:
+                self.reload(force=force, reason=reason)
+            except ReloadInProgress:
+                pass
+            except Exception:
+                # already logged and kept in last_error
+                pass
+
+        threading.Thread(target=run, name="model-reload", daemon=True).start()
+        return True
+
+    def _record(self, previous, loaded, reason: str, seconds: float = None) -> None:
+        self._history.append({
+            "version": loaded.version,
+            "previous_version": previous.version if previous is not None else None,
+            "reason": reason,
+            "seconds": seconds,
+            "at": datetime.now().isoformat(timespec="seconds"),
+        })
+        del self._history[:-self._keep_history]
+
+    def status(self) -> dict:
+        current = self._current
+        return {
+            "version": current.version if current is not None else None,
+            "reloading": self.reloading,
+            "last_error": self.last_error,
+            "history": list(self._history),
+        }
+
+
+class ArtifactWatcher:
+    """
+    Polls artifact files and triggers a background reload after they change.
+
+    A change is only acted on once the modification times have stayed the
+    same for one whole interval, so a copy that is still being written
+    isn't loaded half-way.
+
+    Args:
+        holder: ModelHolder to reload
+        paths: Returns the files to watch (re-evaluated each poll)
+        interval: Seconds between polls
+    """
+
+    def __init__(self, holder: ModelHolder, paths: Callable[[], List[str]], interval: float = 5.0):
+        self.holder = holder
+        self.paths = paths
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _snapshot(self) -> tuple:
+        stamps = []
+        for path in self.paths():
+            try:
+                stat = os.stat(path)
+                stamps.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamps.append((path, None, None))
+        return tuple(stamps)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"Watching model artifacts every {self.interval}s")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        seen = self._snapshot()
+        pending = None
+        while not self._stop.wait(self.interval):
+            snapshot = self._snapshot()
+            if snapshot != seen:
+                # changed since the last poll: wait until it settles
+                seen, pending = snapshot, snapshot
+                continue
+            if pending is not None and all(mtime is not None for _, mtime, _ in snapshot):
+                logger.info("Model artifacts changed on disk; reloading")
+                if self.holder.reload_in_background(reason="watcher"):
+                    pending = None
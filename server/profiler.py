@@ -0,0 +1,110 @@
+"""
+Sampling profiler that can be switched on and off while the server runs.
+
+A background thread wakes every interval, reads the current stack of every
+other thread (sys._current_frames) and counts identical stacks. Sampling
+costs nothing while it is stopped, and little while it runs at a few
+milliseconds per sample. Output is in the "collapsed stack" format
+(frame;frame;frame count) read by flamegraph.pl and speedscope.
+
+Toggle it with POST /metrics/profiler/start and /stop, or start it at boot
+with PROFILER_ENABLED=1.
+"""
+import os
+import sys
+import threading
+from collections import Counter
+from typing import List, Optional, Tuple
+
+# Leaf frames in these files are threads waiting for work, not doing it
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "base_events.py")
+_MAX_DEPTH = 64
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks = Counter()
+        self.samples = 0
+        self.interval = 0.005
+        self.include_idle = False
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, interval: float = 0.005, include_idle: bool = False) -> None:
+        with self._lock:
+            if self.running:
+                return
+            self.interval = max(0.001, interval)
+            self.include_idle = include_idle
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stacks = Counter()
+            self.samples = 0
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            stacks = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if not self.include_idle and os.path.basename(frame.f_code.co_filename) in _IDLE_FILES:
+                    continue
+                labels = []
+                while frame is not None and len(labels) < _MAX_DEPTH:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                stacks.append(";".join(reversed(labels)))
+            with self._lock:
+                self._stacks.update(stacks)
+                self.samples += 1
+
+    def collapsed(self) -> str:
+        """One "root;...;leaf count" line per distinct stack, most frequent first."""
+        with self._lock:
+            items = self._stacks.most_common()
+        return "".join(f"{stack} {count}\n" for stack, count in items)
+
+    def top(self, limit: int = 20) -> List[Tuple[str, int]]:
+        """Functions seen most often at the top of a sampled stack (self time)."""
+        leaves = Counter()
+        with self._lock:
+            for stack, count in self._stacks.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "distinct_stacks": len(self._stacks),
+            "include_idle": self.include_idle,
+        }
+
+
+profiler = SamplingProfiler()
+
+if os.environ.get("PROFILER_ENABLED", "").lower() in ("1", "true", "yes"):
+    profiler.start(float(os.environ.get("PROFILER_INTERVAL_MS", "5")) / 1000)
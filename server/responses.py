@@ -0,0 +1,42 @@
+"""
+Faster JSON responses for routes that return many history records.
+
+FastAPI normally runs a returned dict through jsonable_encoder (a
+recursive, pure-Python walk) and then json.dumps. A handler that returns
+FastJSONResponse(payload) skips that walk: orjson serializes dicts, lists,
+floats and datetimes directly, in C. orjson is an optional dependency
+(pip install orjson). Without it, json.dumps with compact separators is
+used, which is still cheaper than the default path.
+"""
+import json
+from datetime import date, datetime
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content the same way FastJSONResponse does."""
+    if orjson is not None:
+        # OPT_NON_STR_KEYS: like json.dumps, accept int keys; naive datetimes
+        # come out as isoformat(), matching jsonable_encoder
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
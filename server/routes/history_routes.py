@@ -1,51 +1,83 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
+import json
 import logging
-import re
-import math
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from log_setup import log_event
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/history", tags=["History"])
 
-# Import the shared analysis_history from predict_route
-# This will be imported from predict_route to maintain data consistency
-def get_analysis_history():
-    """Import analysis_history from predict_route"""
-    from routes.predict_route import analysis_history
-    return analysis_history
+from history.store import get_history_store
+from history.export import RECORD_FIELDS, iter_csv, iter_ndjson
+from history.events import get_broadcaster
+from history.similarity import NEAR_DUPLICATE_THRESHOLD, find_similar, get_similarity_index
+from model.explanations import get_explanation_worker
+from responses import FastJSONResponse
+
+# Seconds between keep-alive comments on idle event streams
+EVENTS_HEARTBEAT_SECONDS = 15
 
 class FeedbackUpdate(BaseModel):
     feedback: str
 
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Validate a comma-separated `fields` parameter (None means every field)."""
+    if not fields:
+        return None
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in RECORD_FIELDS]
+    if unknown or not selected:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}. Choose from: {', '.join(RECORD_FIELDS)}"
+        )
+    return selected
+
 # GET - Retrieve analysis history
-@router.get("/")
-def get_analysis_history_endpoint(limit: int = 10, offset: int = 0):
+@router.get("/", response_class=FastJSONResponse)
+def get_analysis_history_endpoint(limit: int = 10, offset: int = 0, cursor: Optional[int] = None,
+                                  fields: Optional[str] = None):
     """
     Get paginated analysis history
     
     - **limit**: Number of records to return (default: 10)
     - **offset**: Number of records to skip (default: 0)
+    - **cursor**: Return records after this id instead of using offset; pass the
+      previous page's `next_cursor` (cost doesn't grow with page depth)
+    - **fields**: Comma-separated subset of record fields to return, e.g.
+      `id,text,prediction,confidence,timestamp` for a list view without
+      word contributions (default: all; `id` is always included)
     - Returns: Paginated list of analysis records
     """
+    selected = _parse_fields(fields)
     try:
-        analysis_history = get_analysis_history()
-        total = len(analysis_history)
-        items = analysis_history[offset:offset + limit]
+        store = get_history_store()
+        total = store.count()
         
-        logger.info(f"Retrieved {len(items)} history items (total: {total}, offset: {offset}, limit: {limit})")
+        if cursor is not None:
+            items, next_cursor = store.list_after(cursor, limit, fields=selected)
+            has_more = next_cursor is not None
+        else:
+            items = store.list(limit, offset, fields=selected)
+            has_more = offset + limit < total
+            next_cursor = items[-1]["id"] if items and has_more else None
         
-        return {
+        log_event(logger, "history.list", items=len(items), total=total, offset=offset, cursor=cursor, limit=limit)
+        
+        return FastJSONResponse({
             "total": total,
             "items": items,
             "limit": limit,
             "offset": offset,
-            "has_more": offset + limit < total
-        }
+            "has_more": has_more,
+            "next_cursor": next_cursor
+        })
     except Exception as e:
         logger.error(f"Error retrieving history: {e}")
         raise HTTPException(
@@ -53,18 +85,185 @@ def get_analysis_history_endpoint(limit: int = 10, offset: int = 0):
             detail="Failed to retrieve analysis history"
         )
 
+# GET - Stream the history as NDJSON or CSV (declared before /{analysis_id})
+@router.get("/export")
+def export_history(
+    format: str = "ndjson",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    label: Optional[str] = None,
+    has_feedback: Optional[bool] = None,
+    fields: Optional[str] = None
+):
+    """
+    Export analysis history for offline auditing, streamed at constant memory
+    
+    - **format**: `ndjson` (default) or `csv`
+    - **start** / **end**: Only records with start <= timestamp < end (ISO 8601)
+    - **label**: Only `real` or `fake` predictions
+    - **has_feedback**: Only records with (true) or without (false) user feedback
+    - **fields**: Comma-separated subset of id, text, prediction, confidence,
+      timestamp, user_feedback, word_contributions, model_version (default: all)
+    - Returns: A streamed file download
+    """
+    format = format.lower()
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Format must be 'ndjson' or 'csv'"
+        )
+    if label is not None:
+        label = label.lower()
+        if label not in ("real", "fake"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Label must be 'real' or 'fake'"
+            )
+    selected = _parse_fields(fields) or RECORD_FIELDS
+    # stored timestamps are naive local times
+    if start is not None and start.tzinfo is not None:
+        start = start.astimezone().replace(tzinfo=None)
+    if end is not None and end.tzinfo is not None:
+        end = end.astimezone().replace(tzinfo=None)
+
+    records = get_history_store().iter_filtered(start=start, end=end, label=label, has_feedback=has_feedback)
+    rows = iter_ndjson(records, selected) if format == "ndjson" else iter_csv(records, selected)
+
+    def stream():
+        try:
+            yield from rows
+        except Exception as e:
+            # headers are already sent, so the client just sees a truncated body
+            logger.error(f"Error exporting history: {e}")
+            raise
+
+    logger.info(f"Starting history export: format={format}, label={label}, fields={selected}")
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    return StreamingResponse(
+        stream(),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename=history.{format}"}
+    )
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+# GET - Live feed of new analyses and summary updates (declared before /{analysis_id})
+@router.get("/events")
+async def history_events(request: Request):
+    """
+    Server-sent events stream for live dashboards, instead of polling
+    
+    - Sends a `summary` event on connect and after every change
+    - `analysis` (new record), `feedback` and `explained` (updated record),
+      `deleted` ({id}, also for records evicted from the memory store) and
+      `cleared` ({removed}) events as they happen
+    - Returns: A `text/event-stream` response (use `EventSource` in the browser)
+    """
+    store = get_history_store()
+    broadcaster = get_broadcaster()
+    subscription = broadcaster.subscribe()
+    logger.info(f"Event subscriber connected ({broadcaster.subscriber_count} active)")
+
+    async def stream():
+        try:
+            yield _sse("summary", store.summary())
+            while True:
+                item = await subscription.next(EVENTS_HEARTBEAT_SECONDS)
+                if await request.is_disconnected():
+                    break
+                if item is None:
+                    # comment line: keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+                    continue
+                yield _sse(*item)
+        finally:
+            broadcaster.unsubscribe(subscription)
+            logger.info(f"Event subscriber disconnected ({broadcaster.subscriber_count} active)")
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# NEW: compute and return distinctive words (word-shift / log-odds) from the stored analysis history
+# (declared before /{analysis_id}, which would otherwise capture this path)
+@router.get("/distinct-words")
+def get_distinct_words(limit: int = 40, min_count: int = 2):
+    """
+    Compute distinctive words (log-odds) from the stored analysis history.
+    Returns JSON shaped like:
+    {
+      "items": [{ "word": "vaccine", "logodds": 2.31, "count_real": 10, "count_fake": 1, "sum": 11 }, ...],
+      "top_by_label": { "real": [...], "fake": [...] }
+    }
+    """
+    try:
+        store = get_history_store()
+        if store.count() == 0:
+            return {"items": [], "top_by_label": {"real": [], "fake": []}}
+
+        # per-label document frequencies are maintained as analyses are added,
+        # deleted or cleared; the ranking is cached until they change
+        return store.distinct_words(limit, min_count)
+
+    except Exception as e:
+        logger.error(f"Error computing distinct words: {e}")
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to compute distinct words")
+
+# GET - Find near-duplicate analyses (declared before /{analysis_id})
+@router.get("/similar", response_class=FastJSONResponse)
+def get_similar_analyses(text: str, threshold: Optional[float] = None, limit: int = 5, fields: Optional[str] = None):
+    """
+    Find past analyses of near-identical text (MinHash/LSH estimate of
+    shingle overlap after preprocessing)
+    
+    - **text**: Text to look up
+    - **threshold**: Minimum similarity between 0 and 1 (default: NEAR_DUPLICATE_THRESHOLD, 0.9)
+    - **limit**: Maximum number of matches (default: 5)
+    - **fields**: Comma-separated subset of record fields to return (default: all)
+    - Returns: Matching records, most similar first, each with a `similarity` score
+    """
+    selected = _parse_fields(fields)
+    threshold = NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+    if not 0 < threshold <= 1:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="threshold must be between 0 and 1")
+    if not get_similarity_index().enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Near-duplicate index is disabled (NEAR_DUPLICATE_MAX_ENTRIES=0)"
+        )
+    try:
+        matches = find_similar(text, threshold, limit, fields=selected)
+        log_event(logger, "history.similar", results=len(matches))
+        return FastJSONResponse({
+            "matches": matches,
+            "total_matches": len(matches),
+            "threshold": threshold,
+            "limit": limit
+        })
+    except Exception as e:
+        logger.error(f"Error finding similar analyses: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to find similar analyses"
+        )
+
 # GET - Get specific analysis by ID
-@router.get("/{analysis_id}")
-def get_analysis_by_id(analysis_id: int):
+@router.get("/{analysis_id}", response_class=FastJSONResponse)
+def get_analysis_by_id(analysis_id: int, fields: Optional[str] = None):
     """
     Get a specific analysis by ID
     
     - **analysis_id**: The ID of the analysis to retrieve
-    - Returns: Detailed analysis record
+    - **fields**: Comma-separated subset of record fields to return (default: all)
+    - Returns: Detailed analysis record; `explanation` is `pending` while a
+      deferred explanation is still being computed
     """
+    selected = _parse_fields(fields)
     try:
-        analysis_history = get_analysis_history()
-        analysis = next((item for item in analysis_history if item["id"] == analysis_id), None)
+        analysis = get_history_store().get(analysis_id, fields=selected)
         
         if not analysis:
             logger.warning(f"Analysis with ID {analysis_id} not found")
@@ -73,8 +272,11 @@ def get_analysis_by_id(analysis_id: int):
                 detail=f"Analysis with ID {analysis_id} not found"
             )
         
-        logger.info(f"Retrieved analysis with ID {analysis_id}")
-        return analysis
+        if "word_contributions" in analysis and get_explanation_worker().is_pending(analysis_id):
+            analysis["explanation"] = "pending"
+        
+        log_event(logger, "history.get", id=analysis_id)
+        return FastJSONResponse(analysis)
         
     except HTTPException:
         raise
@@ -94,38 +296,11 @@ def get_statistics():
     - Returns: Summary statistics including totals, counts, and averages
     """
     try:
-        analysis_history = get_analysis_history()
-        
-        if not analysis_history:
-            return {
-                "total_analyses": 0,
-                "fake_count": 0,
-                "real_count": 0,
-                "avg_confidence": 0,
-                "recent_analyses": 0
-            }
-        
-        fake_count = sum(1 for item in analysis_history if "fake" in item["prediction"].lower())
-        real_count = len(analysis_history) - fake_count
-        avg_confidence = sum(item["confidence"] for item in analysis_history) / len(analysis_history)
+        # Counters are maintained by the store on insert/delete/clear, so this
+        # doesn't depend on how much history exists
+        stats = get_history_store().summary()
         
-        # Count recent analyses (last 24 hours)
-        from datetime import datetime, timedelta
-        recent_cutoff = datetime.now() - timedelta(hours=24)
-        recent_analyses = sum(
-            1 for item in analysis_history 
-            if datetime.fromisoformat(item["timestamp"].replace('Z', '+00:00') if isinstance(item["timestamp"], str) else str(item["timestamp"])) > recent_cutoff
-        )
-        
-        stats = {
-            "total_analyses": len(analysis_history),
-            "fake_count": fake_count,
-            "real_count": real_count,
-            "avg_confidence": round(avg_confidence, 3),
-            "recent_analyses": recent_analyses
-        }
-        
-        logger.info(f"Generated statistics: {stats}")
+        log_event(logger, "history.stats", total=stats.get("total_analyses"))
         return stats
         
     except Exception as e:
@@ -146,8 +321,8 @@ def update_feedback(analysis_id: int, feedback_data: FeedbackUpdate):
     - Returns: Updated analysis record
     """
     try:
-        analysis_history = get_analysis_history()
-        analysis = next((item for item in analysis_history if item["id"] == analysis_id), None)
+        # Update feedback
+        analysis = get_history_store().update_feedback(analysis_id, feedback_data.feedback.strip())
         
         if not analysis:
             logger.warning(f"Analysis with ID {analysis_id} not found for feedback update")
@@ -156,9 +331,6 @@ def update_feedback(analysis_id: int, feedback_data: FeedbackUpdate):
                 detail=f"Analysis with ID {analysis_id} not found"
             )
         
-        # Update feedback
-        analysis["user_feedback"] = feedback_data.feedback.strip()
-        
         logger.info(f"Updated feedback for analysis {analysis_id}")
         return {
             "message": "Feedback updated successfully",
@@ -184,22 +356,13 @@ def delete_analysis(analysis_id: int):
     - Returns: Confirmation message
     """
     try:
-        # Import and modify the global analysis_history
-        from routes import predict_route
-        
-        analysis = next((item for item in predict_route.analysis_history if item["id"] == analysis_id), None)
-        if not analysis:
+        if not get_history_store().delete(analysis_id):
             logger.warning(f"Analysis with ID {analysis_id} not found for deletion")
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Analysis with ID {analysis_id} not found"
             )
         
-        predict_route.analysis_history = [
-            item for item in predict_route.analysis_history 
-            if item["id"] != analysis_id
-        ]
-        
         logger.info(f"Deleted analysis with ID {analysis_id}")
         return {
             "message": "Analysis deleted successfully",
@@ -224,11 +387,7 @@ def clear_all_history():
     - Returns: Confirmation message with count of cleared records
     """
     try:
-        # Import and modify the global analysis_history
-        from routes import predict_route
-        
-        count = len(predict_route.analysis_history)
-        predict_route.analysis_history.clear()
+        count = get_history_store().clear()
         
         logger.info(f"Cleared all analysis history ({count} records)")
         return {
@@ -244,17 +403,20 @@ def clear_all_history():
         )
 
 # GET - Search history by text content
-@router.get("/search/{query}")
-def search_history(query: str, limit: int = 10):
+@router.get("/search/{query}", response_class=FastJSONResponse)
+def search_history(query: str, limit: int = 10, fields: Optional[str] = None):
     """
     Search analysis history by text content
     
-    - **query**: Search term to look for in analysis text
-    - **limit**: Maximum number of results to return
+    - **query**: Words to look for in analysis text; every word must match and
+      also matches longer words it starts ("vacc" finds "vaccine"). Wrap the
+      query in double quotes to match an exact phrase/substring instead
+    - **limit**: Maximum number of results to return (best matches first)
+    - **fields**: Comma-separated subset of record fields to return (default: all)
     - Returns: Matching analysis records
     """
+    selected = _parse_fields(fields)
     try:
-        analysis_history = get_analysis_history()
         query_lower = query.lower().strip()
         
         if not query_lower:
@@ -264,18 +426,15 @@ def search_history(query: str, limit: int = 10):
             )
         
         # Search in text content
-        matches = [
-            item for item in analysis_history
-            if query_lower in item["text"].lower()
-        ][:limit]
+        matches = get_history_store().search(query_lower, limit, fields=selected)
         
-        logger.info(f"Search for '{query}' returned {len(matches)} results")
-        return {
+        log_event(logger, "history.search", query=query, results=len(matches))
+        return FastJSONResponse({
             "query": query,
             "matches": matches,
             "total_matches": len(matches),
             "limit": limit
-        }
+        })
         
     except HTTPException:
         raise
@@ -285,117 +444,3 @@ def search_history(query: str, limit: int = 10):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to search history"
         )
-
-# NEW: compute and return distinctive words (word-shift / log-odds) from in-memory analysis_history
-@router.get("/distinct-words")
-def get_distinct_words(limit: int = 40, min_count: int = 2):
-    """
-    Compute distinctive words (log-odds) from the shared analysis_history.
-    Returns JSON shaped like:
-    {
-      "items": [{ "word": "vaccine", "logodds": 2.31, "count_real": 10, "count_fake": 1, "sum": 11 }, ...],
-      "top_by_label": { "real": [...], "fake": [...] }
-    }
-    """
-    try:
-        analysis_history = get_analysis_history()
-        if not analysis_history:
-            return {"items": [], "top_by_label": {"real": [], "fake": []}}
-
-        # tokenization helper (simple, same as frontend)
-        tok_re = re.compile(r"\b[a-z0-9']+\b", re.I)
-        def tokenize_text(s):
-            if not s:
-                return []
-            return list({t.lower() for t in tok_re.findall(str(s))})
-
-        cnt_real = {}
-        cnt_fake = {}
-        total_real = 0
-        total_fake = 0
-
-        for it in analysis_history:
-            label_raw = str(it.get("label") or it.get("prediction") or it.get("result") or "").lower()
-            # determine label: 'real' or 'fake' (best-effort)
-            if "fake" in label_raw or label_raw == "0" or label_raw == "false":
-                lbl = "fake"
-            elif "real" in label_raw or label_raw == "1" or label_raw == "true":
-                lbl = "real"
-            else:
-                # fallbacks
-                if it.get("is_fake") in (True, "true", "1"):
-                    lbl = "fake"
-                elif it.get("is_fake") in (False, "false", "0"):
-                    lbl = "real"
-                else:
-                    # skip if unknown
-                    continue
-
-            toks = tokenize_text(it.get("text") or it.get("content") or it.get("tweet") or it.get("post") or "")
-            if not toks:
-                continue
-            if lbl == "real":
-                total_real += 1
-                for w in toks:
-                    cnt_real[w] = cnt_real.get(w, 0) + 1
-            else:
-                total_fake += 1
-                for w in toks:
-                    cnt_fake[w] = cnt_fake.get(w, 0) + 1
-
-        total_real = max(1, total_real)
-        total_fake = max(1, total_fake)
-        prior = 0.01
-
-        all_words = set(list(cnt_real.keys()) + list(cnt_fake.keys()))
-        results = []
-        for w in all_words:
-            cr = cnt_real.get(w, 0)
-            cf = cnt_fake.get(w, 0)
-            s = cr + cf
-            if s < min_count:
-                continue
-            A = cr + prior
-            B = cf + prior
-            # avoid divide by zero: use totals minus A/B
-            denomA = max(1e-9, (total_real - cr + prior))
-            denomB = max(1e-9, (total_fake - cf + prior))
-            oddsA = A / denomA
-            oddsB = B / denomB
-            # signed log-odds: positive => associated with real, negative => fake
-            logodds = math.log(max(1e-9, oddsA / oddsB))
-            results.append({
-                "word": w,
-                "logodds": float(logodds),
-                "count_real": int(cr),
-                "count_fake": int(cf),
-                "sum": int(s)
-            })
-
-        # sort by absolute association strength
-        results.sort(key=lambda x: abs(x["logodds"]), reverse=True)
-        top = results[:limit]
-
-        # split into top_by_label for compatibility with frontend WordShiftDiverging
-        real_list = []
-        fake_list = []
-        for r in top:
-            if r["logodds"] >= 0:
-                real_list.append({"word": r["word"], "log_odds": float(r["logodds"]), "count": r["count_real"] or r["sum"]})
-            else:
-                # present fake side values as positive magnitude for chart but keep sign in items
-                fake_list.append({"word": r["word"], "log_odds": float(abs(r["logodds"])), "count": r["count_fake"] or r["sum"]})
-
-        return {
-            "items": top,
-            "top_by_label": {
-                "real": real_list,
-                "fake": fake_list
-            },
-            "total_real": total_real,
-            "total_fake": total_fake
-        }
-
-    except Exception as e:
-        logger.error(f"Error computing distinct words: {e}")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to compute distinct words")
\ No newline at end of file
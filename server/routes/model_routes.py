@@ -0,0 +1,67 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+import logging
+
+import model.model as model
+from model.reload import ReloadInProgress
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/model", tags=["Model"])
+
+
+# GET - Active model version
+@router.get("/")
+def get_model_status():
+    """
+    Active model version and reload state
+
+    - Returns: The active version (content hash of the artifacts), its
+      engine and source directory, whether a reload is running, the last
+      reload error and recent swaps
+    """
+    return model.model_status()
+
+
+# POST - Reload the model artifacts
+@router.post("/reload")
+async def reload_model(force: bool = False, wait: bool = True):
+    """
+    Load the artifacts on disk, warm them up and swap them in without downtime
+
+    Requests already being scored finish on the previous version; the
+    prediction cache is cleared on swap.
+
+    - **force**: Swap even if the artifacts are unchanged
+    - **wait**: Wait for the reload to finish (default: true); with false the
+      reload runs in the background and `GET /model/` shows the outcome
+    - Returns: The new and previous versions, or 202 when not waiting
+    """
+    if not wait:
+        if not model.reload_model_in_background(force=force):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A model reload is already running"
+            )
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=model.model_status())
+
+    try:
+        return await run_in_threadpool(model.reload_model, force)
+    except ReloadInProgress as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except FileNotFoundError as e:
+        logger.error(f"Model reload failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model artifacts not found; still serving the previous version."
+        )
+    except Exception as e:
+        logger.error(f"Model reload failed: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Model reload failed; still serving the previous version. {type(e).__name__}: {e}"
+        )
@@ -1,132 +1,240 @@
 from fastapi import APIRouter, HTTPException, status
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, validator
-from typing import Optional
-from datetime import datetime
+from typing import List, Optional
+import os
 import re
 import logging
 
 import model.model as model
+from model.batching import MicroBatcher
+from model.explanations import get_explanation_worker
+from admission import AdmissionRejected, from_env as admission_from_env
+from history.contributions import top_k as top_contributions
+from history.store import get_history_store
+from history.similarity import find_near_duplicate
+from metrics import STAGE_SECONDS
+from log_setup import log_event
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/predict", tags=["Prediction"])
 
-# In-memory storage for demo (in production, use a database)
-analysis_history = []
+# Maximum number of texts accepted by /predict/batch in one request
+MAX_BATCH_SIZE = 1000
+
+# Word contributions computed for each `explain` option (model.score_texts top_k):
+# none skips the contribution step entirely
+EXPLAIN_TOP_K = {"none": 0, "top_k": model.CONTRIBUTIONS_TOP_K, "full": None}
+
+
+def _make_batcher(top_k: Optional[int]) -> MicroBatcher:
+    return MicroBatcher(
+        lambda texts: model.score_texts(texts, top_k=top_k),
+        max_batch_size=int(os.environ.get("PREDICT_BATCH_MAX_SIZE", "64")),
+        max_wait=float(os.environ.get("PREDICT_BATCH_WINDOW_MS", "2")) / 1000,
+        on_queue_wait=lambda seconds: STAGE_SECONDS.observe(seconds, "batch_wait"),
+    )
+
+
+# Concurrent /predict/ requests are coalesced into one model call: a batch is
+# flushed when it is full or when the window after its first request elapses.
+# Requests are batched with others asking for the same explanation.
+_batchers = {explain: _make_batcher(top_k) for explain, top_k in EXPLAIN_TOP_K.items()}
+
+
+def batcher_stats() -> dict:
+    """Micro-batch counters summed over the per-explain batchers."""
+    stats = [batcher.stats() for batcher in _batchers.values()]
+    batches = sum(item["batches"] for item in stats)
+    items = sum(item["items"] for item in stats)
+    return {
+        "queued": sum(item["queued"] for item in stats),
+        "in_flight_batches": sum(item["in_flight_batches"] for item in stats),
+        "batches": batches,
+        "items": items,
+        "avg_batch_size": round(items / batches, 2) if batches else 0.0,
+    }
+
+# Caps the model work in progress (weighted by input length) and sheds
+# excess requests with 429/503 + Retry-After (see admission.py)
+_admission = admission_from_env()
+
+
+def _rejection(e: AdmissionRejected) -> HTTPException:
+    log_event(logger, "predict.rejected", logging.WARNING, reason=e.reason, retry_after=e.retry_after)
+    return HTTPException(
+        status_code=e.status_code,
+        detail=f"Server is busy. Please retry in {e.retry_after} seconds.",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+
+def validate_input_text(v: str) -> str:
+    """Shared validation rules for a single text to analyze."""
+    if not v or not v.strip():
+        raise ValueError('Text cannot be empty or only whitespace')
+    
+    if len(v.strip()) < 5:
+        raise ValueError('Text must be at least 5 characters long')
+    
+    if len(v) > 10000:  # Reasonable limit
+        raise ValueError('Text is too long (maximum 10,000 characters)')
+    
+    if re.match(r'^[^a-zA-Z]*$', v.strip()):
+        raise ValueError('Text must contain at least some alphabetic characters')
+    
+    return v.strip()
+
+
+def validate_explain(v: str) -> str:
+    if v not in EXPLAIN_TOP_K:
+        raise ValueError(f"explain must be one of: {', '.join(EXPLAIN_TOP_K)}")
+    return v
+
 
 class InputText(BaseModel):
     text: str
+    explain: str = "top_k"
+    defer_explanation: bool = False
     
     @validator('text')
     def validate_text(cls, v):
-        if not v or not v.strip():
-            raise ValueError('Text cannot be empty or only whitespace')
-        
-        if len(v.strip()) < 5:
-            raise ValueError('Text must be at least 5 characters long')
-        
-        if len(v) > 10000:  # Reasonable limit
-            raise ValueError('Text is too long (maximum 10,000 characters)')
-        
-        if re.match(r'^[^a-zA-Z]*$', v.strip()):
-            raise ValueError('Text must contain at least some alphabetic characters')
-        
-        return v.strip()
+        return validate_input_text(v)
 
+    @validator('explain')
+    def validate_explain(cls, v):
+        return validate_explain(v)
 
-def get_word_contributions(text: str) -> dict:
-    try:
-        # ensure model artifacts are loaded (no-op if already loaded)
-        model._ensure_loaded()
-    except FileNotFoundError:
-        logger.warning("Model artifacts not found when computing word contributions")
-        return {}
 
-    if model._clf is None or model._vectorizer is None:
-        logger.warning("_clf or _vectorizer is None (model not loaded)")
-        return {}
+class BatchInputText(BaseModel):
+    texts: List[str]
+    explain: str = "top_k"
 
-    try:
-        processed_text = model.preprocess_text(text)
-        logger.debug(f"Processed text: {processed_text!r}")
-
-        X = model._vectorizer.transform([processed_text])
-        input_vector = X.toarray()[0]
-        nonzero_count = int((input_vector > 0).sum())
-        logger.debug(f"Input vector sum: {float(input_vector.sum())}, nonzero features: {nonzero_count}")
-
-        # get feature names if available (not available for HashingVectorizer)
-        feature_names = None
-        if hasattr(model._vectorizer, "get_feature_names_out"):
-            feature_names = model._vectorizer.get_feature_names_out()
-            logger.debug(f"Feature names length: {len(feature_names)}")
-        else:
-            logger.warning("Vectorizer has no get_feature_names_out (e.g. HashingVectorizer). Can't map indices to tokens.")
+    @validator('explain')
+    def validate_explain(cls, v):
+        return validate_explain(v)
 
-        # classifier coefficients
-        coef = None
-        if hasattr(model._clf, "coef_"):
-            coef = model._clf.coef_[0]
-        else:
-            logger.warning("Classifier has no coef_ attribute; contributions will be zeroed.")
+    @validator('texts')
+    def validate_texts(cls, v):
+        # Individual texts are validated per item so one bad post
+        # doesn't reject the whole batch
+        if not v:
+            raise ValueError('Batch cannot be empty')
 
-        contributions = {}
-        if nonzero_count == 0:
-            logger.info("No known vocabulary tokens found in input -> empty contributions")
-            return {}
+        if len(v) > MAX_BATCH_SIZE:
+            raise ValueError(f'Batch is too large (maximum {MAX_BATCH_SIZE} texts)')
 
-        for idx, value in enumerate(input_vector):
-            if value > 0:
-                word = feature_names[idx] if feature_names is not None and idx < len(feature_names) else f"idx_{idx}"
-                contrib = float((coef[idx] if coef is not None else 0.0) * value)
-                contributions[word] = contrib
+        return v
 
-        # optional: sort by absolute contribution
-        contributions = dict(sorted(contributions.items(), key=lambda kv: -abs(kv[1])))
 
-        return contributions
+def get_word_contributions(text: str) -> dict:
+    """
+    Word contributions for a single text.
 
-    except Exception as e:
+    Kept for callers that only need the explanation; prediction routes get
+    contributions from model.score_text together with the label instead of
+    vectorizing the text a second time.
+    """
+    try:
+        return model.score_text(text)["word_contributions"]
+    except FileNotFoundError:
+        logger.warning("Model artifacts not found when computing word contributions")
+        return {}
+    except Exception:
         logger.exception("Error computing word contributions")
         return {}
 
 
+def save_analysis(text: str, label: str, confidence: float, word_contributions: dict,
+                  model_version: Optional[str] = None) -> dict:
+    """Store a completed analysis in the history backend and return the record."""
+    with STAGE_SECONDS.time("history_append"):
+        return get_history_store().add(text, label, confidence, word_contributions, model_version=model_version)
+
 
 @router.post("/")
-def predict(data: InputText):
+async def predict(data: InputText):
+    """
+    Analyze a single text
+
+    - **text**: Text to analyze
+    - **explain**: Word contributions to return: `top_k` (the 20 largest,
+      default), `full` (every word) or `none` (label only, fastest)
+    - **defer_explanation**: Respond as soon as the label is known and
+      compute the contributions afterwards; they appear on
+      `GET /history/{id}` when ready (`explanation` is `pending` until then)
+    - Returns: Label, confidence, history id, word contributions (unless
+      none or deferred) and the model version
+    """
+    try:
+        async with _admission.admit(len(data.text)):
+            return await _predict(data)
+    except AdmissionRejected as e:
+        raise _rejection(e)
+
+
+async def _predict(data: InputText) -> dict:
     try:
-        logger.info(f"Processing prediction request for text length: {len(data.text)}")
+        log_event(logger, "predict.request", text_length=len(data.text))
         
         if len(data.text) > 280:
-            logger.warning(f"Text exceeds typical tweet length: {len(data.text)} characters")
+            log_event(logger, "predict.long_text", logging.WARNING, text_length=len(data.text))
         
         processed_text = data.text.strip()
         
-        # Call your existing prediction function
-        label, confidence = model.predict_text(processed_text)
+        explain = data.explain
+        deferred = data.defer_explanation and explain != "none"
+        
+        # A lightly edited repost of an earlier analysis (same model version)
+        # reuses that analysis's result instead of running the model. Label-only
+        # scoring costs about as much as the lookup, so it goes straight to the
+        # model. Only deferred full explanations are stored uncapped, so explain=full
+        # can't rely on a stored record; a top_k reuse is trimmed to the top k.
+        duplicate = None
+        if explain == "top_k":
+            with STAGE_SECONDS.time("near_duplicate_lookup"):
+                # current_version() may load the model: keep it off the event loop too
+                duplicate = await run_in_threadpool(
+                    lambda: find_near_duplicate(processed_text, model.current_version())
+                )
+            if duplicate is not None and not duplicate["word_contributions"]:
+                # a label-only analysis has no explanation to hand out
+                duplicate = None
+            elif duplicate is not None:
+                duplicate["word_contributions"] = dict(
+                    top_contributions(duplicate["word_contributions"], model.CONTRIBUTIONS_TOP_K)
+                )
+        
+        if duplicate is not None:
+            result = duplicate
+            deferred = False
+            log_event(logger, "predict.near_duplicate", of=duplicate["id"], similarity=duplicate["similarity"])
+        else:
+            # Label, confidence and word contributions from a single scoring pass,
+            # batched with any other requests arriving at the same time
+            result = await _batchers["none" if deferred else explain].submit(processed_text)
+        label = result["prediction"]
+        confidence = result["confidence"]
+        word_contributions = result["word_contributions"]
         
         if confidence < 0 or confidence > 1:
             logger.error(f"Invalid confidence score from model: {confidence}")
             raise ValueError("Model returned invalid confidence score")
         
-        # Calculate word contributions
-        word_contributions = get_word_contributions(processed_text)
+        # Save to history (off the event loop: the backend may write to disk)
+        analysis_record = await run_in_threadpool(
+            save_analysis, data.text, label, confidence, word_contributions, result["model_version"]
+        )
         
-        # Save to history
-        analysis_record = {
-            "id": len(analysis_history) + 1,
-            "text": data.text,
-            "prediction": label,
-            "confidence": float(confidence),
-            "timestamp": datetime.now(),
-            "user_feedback": None,
-            "word_contributions": word_contributions
-        }
-        analysis_history.append(analysis_record)
+        explanation = "none" if explain == "none" else "included"
+        if deferred:
+            queued = get_explanation_worker().submit(
+                analysis_record["id"], data.text, EXPLAIN_TOP_K[explain], result["model_version"]
+            )
+            explanation = "pending" if queued else "unavailable"
         
-        logger.info(f"Prediction completed successfully. ID: {analysis_record['id']}, Prediction: {label}")
+        log_event(logger, "predict.completed", id=analysis_record["id"], prediction=label, confidence=confidence)
         
     except FileNotFoundError as e:
         logger.error(f"Model file not found: {e}")
@@ -152,5 +260,108 @@ def predict(data: InputText):
         "confidence": confidence,
         "id": analysis_record["id"],
         "word_contributions": word_contributions,
+        "explanation": explanation,
+        "model_version": result["model_version"],
+        "near_duplicate_of": duplicate["id"] if duplicate is not None else None,
+        "similarity": duplicate["similarity"] if duplicate is not None else None,
         "message": "Prediction completed successfully"
     }
+
+
+@router.post("/batch")
+async def predict_batch(data: BatchInputText):
+    """
+    Analyze many texts in one request
+
+    - **texts**: List of texts to analyze (maximum 1,000 per request)
+    - **explain**: `top_k` (default), `full` or `none`, as for `POST /predict/`
+    - Returns: One result per input text, in input order. Each successful
+      item has the same fields as `POST /predict/`; failed items carry an
+      `error` message instead.
+    """
+    # admitted by total length, before it takes a threadpool thread
+    try:
+        async with _admission.admit(sum(len(text) for text in data.texts)):
+            return await run_in_threadpool(_predict_batch, data)
+    except AdmissionRejected as e:
+        raise _rejection(e)
+
+
+def _predict_batch(data: BatchInputText) -> dict:
+    log_event(logger, "predict.batch_request", size=len(data.texts))
+
+    # Validate every item up front; only valid texts are sent to the model
+    results = [None] * len(data.texts)
+    valid_indices = []
+    valid_texts = []
+    for index, text in enumerate(data.texts):
+        try:
+            valid_texts.append(validate_input_text(text))
+            valid_indices.append(index)
+        except ValueError as e:
+            results[index] = {"index": index, "error": str(e)}
+
+    try:
+        predictions = model.score_texts(valid_texts, top_k=EXPLAIN_TOP_K[data.explain])
+    except FileNotFoundError as e:
+        logger.error(f"Model file not found: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI model is not available. Please try again later."
+        )
+    except Exception as e:
+        logger.error(f"Unexpected error in batch prediction: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An unexpected error occurred during prediction. Please try again."
+        )
+
+    for index, result in zip(valid_indices, predictions):
+        try:
+            analysis_record = save_analysis(
+                data.texts[index], result["prediction"], result["confidence"], result["word_contributions"],
+                result["model_version"]
+            )
+            results[index] = {
+                "index": index,
+                "prediction": result["prediction"],
+                "confidence": result["confidence"],
+                "id": analysis_record["id"],
+                "word_contributions": result["word_contributions"],
+                "model_version": result["model_version"],
+                "message": "Prediction completed successfully"
+            }
+        except Exception as e:
+            logger.error(f"Error finishing batch item {index}: {e}")
+            results[index] = {"index": index, "error": "An unexpected error occurred during prediction."}
+
+    succeeded = sum(1 for item in results if "error" not in item)
+    log_event(logger, "predict.batch_completed", size=len(results), succeeded=succeeded)
+
+    return {
+        "results": results,
+        "total": len(results),
+        "succeeded": succeeded,
+        "failed": len(results) - succeeded
+    }
+
+
+@router.get("/admission/stats")
+def get_admission_stats():
+    """
+    Admission control state
+
+    - Returns: Requests and cost units in flight and queued, limits, and
+      admitted/rejected counts since start
+    """
+    return _admission.stats()
+
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """
+    Prediction cache counters
+
+    - Returns: Entry count, approximate bytes, hits, misses, evictions and hit rate
+    """
+    return model.cache_stats()
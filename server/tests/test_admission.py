@@ -0,0 +1,93 @@
+"""Admission control (admission.py) and its 429/503 responses on /predict."""
+import asyncio
+
+import httpx
+import pytest
+
+from admission import AdmissionController, AdmissionRejected
+from routes import predict_route
+
+
+def test_units_scale_with_length():
+    controller = AdmissionController(max_units=8, unit_chars=100)
+    assert [controller.units_for(chars) for chars in (0, 100, 101, 1000)] == [1, 1, 2, 10]
+
+
+def test_queue_full_is_429_and_timeout_is_503():
+    controller = AdmissionController(max_units=1, max_queue=1, queue_timeout=0.05)
+
+    async def run():
+        async with controller.admit(10):
+            waiter = asyncio.ensure_future(controller.admit(10).__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(AdmissionRejected) as full:
+                async with controller.admit(10):
+                    pass
+            with pytest.raises(AdmissionRejected) as timeout:
+                await waiter
+        return full.value, timeout.value
+
+    full, timeout = asyncio.run(run())
+    assert (full.status_code, full.reason) == (429, "queue_full")
+    assert (timeout.status_code, timeout.reason) == (503, "timeout")
+    assert full.retry_after >= 1 and timeout.retry_after >= 1
+    assert controller.rejected == {"queue_full": 1, "timeout": 1}
+    assert controller.in_flight_units == 0
+
+
+def test_waiters_are_admitted_in_arrival_order():
+    controller = AdmissionController(max_units=4, unit_chars=1)
+    order = []
+
+    async def request(name, chars):
+        async with controller.admit(chars):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(request("first", 4), request("heavy", 4), request("light", 1))
+
+    asyncio.run(run())
+    assert order == ["first", "heavy", "light"]
+
+
+def test_oversized_request_runs_alone():
+    controller = AdmissionController(max_units=2, unit_chars=1)
+
+    async def run():
+        async with controller.admit(100):
+            assert controller.in_flight_units == 2
+
+    asyncio.run(run())
+    assert controller.in_flight_units == 0
+
+
+def _post_while_saturated(monkeypatch, controller, path, payload):
+    monkeypatch.setattr(predict_route, "_admission", controller)
+
+    async def run():
+        from main import app
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            async with controller.admit(1):
+                return await client.post(path, json=payload)
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("path,payload", [
+    ("/predict/", {"text": "Is this story real or fake?"}),
+    ("/predict/batch", {"texts": ["Is this story real or fake?"]}),
+])
+def test_routes_return_429_with_retry_after(monkeypatch, path, payload):
+    response = _post_while_saturated(monkeypatch, AdmissionController(max_units=1, max_queue=0), path, payload)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_routes_return_503_with_retry_after(monkeypatch):
+    controller = AdmissionController(max_units=1, max_queue=4, queue_timeout=0.05)
+    response = _post_while_saturated(monkeypatch, controller, "/predict/", {"text": "Is this story real or fake?"})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
@@ -0,0 +1,55 @@
+"""Request coalescing in model/batching.py."""
+import asyncio
+import gc
+
+from model.batching import MicroBatcher
+
+
+def test_concurrent_submits_share_one_batch():
+    calls = []
+
+    def score(texts):
+        calls.append(list(texts))
+        return [{"text": text} for text in texts]
+
+    batcher = MicroBatcher(score, max_batch_size=8, max_wait=0.01)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(f"t{i}") for i in range(5)))
+
+    results = asyncio.run(run())
+    assert [result["text"] for result in results] == [f"t{i}" for i in range(5)]
+    assert calls == [[f"t{i}" for i in range(5)]]
+    assert batcher.stats()["batches"] == 1
+    assert not batcher._tasks
+
+
+def test_flush_task_survives_garbage_collection():
+    def score(texts):
+        gc.collect()
+        return [{"text": text} for text in texts]
+
+    batcher = MicroBatcher(score, max_batch_size=1)
+
+    async def run():
+        future = asyncio.ensure_future(batcher.submit("x"))
+        await asyncio.sleep(0)
+        assert len(batcher._tasks) == 1
+        gc.collect()
+        return await asyncio.wait_for(future, timeout=5)
+
+    assert asyncio.run(run()) == {"text": "x"}
+    assert not batcher._tasks
+
+
+def test_scoring_errors_reach_every_caller():
+    def score(texts):
+        raise RuntimeError("model unavailable")
+
+    batcher = MicroBatcher(score, max_batch_size=2, max_wait=0.01)
+
+    async def run():
+        return await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert [str(result) for result in results] == ["model unavailable"] * 2
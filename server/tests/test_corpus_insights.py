@@ -0,0 +1,69 @@
+"""Counting and artifact generation for model/corpus_insights.py."""
+import argparse
+import json
+
+import pytest
+
+from model.corpus_insights import corpus_label, count_corpus, main, parse_label_map
+from model.model import postprocess_prediction
+
+
+def test_max_vocab_bounds_words_and_hashtags():
+    chunks = [[("fake", " ".join(f"#tag{i}x{j} word{i}x{j}" for j in range(10)))] for i in range(100)]
+    totals, info = count_corpus(chunks, max_vocab=50)
+    assert info["prune_cutoff"] == 1
+    assert info["hashtag_prune_cutoff"] == 1
+    for counts in totals.values():
+        assert len(counts.tokens) <= 50
+        assert len(counts.hashtags) <= 50
+
+
+def _write_jsonl(path, rows):
+    path.write_text("\n".join(json.dumps(row) for row in rows) + "\n", encoding="utf-8")
+
+
+ZERO_ONE_ROWS = [
+    {"text": "official report #news published today", "label": 0},
+    {"text": "official statement #news released", "label": "0"},
+    {"text": "shocking hoax #plandemic they hide", "label": 1},
+    {"text": "secret hoax #plandemic exposed", "label": 1.0},
+    {"text": "no idea what this is", "label": "maybe"},
+]
+
+
+def test_zero_one_labels_follow_the_model_convention(tmp_path, capsys):
+    # model.postprocess_prediction: 0 = Real, 1 = Fake
+    assert postprocess_prediction(0, 0.9)[0] == "Real"
+    assert [corpus_label(row["label"]) for row in ZERO_ONE_ROWS] == ["real", "real", "fake", "fake", None]
+    assert corpus_label(False) == "fake" and corpus_label(True) == "real"
+
+    corpus = tmp_path / "posts.jsonl"
+    _write_jsonl(corpus, ZERO_ONE_ROWS)
+    main([str(corpus), "--out", str(tmp_path / "out"), "--workers", "1", "--stop-words", "none", "--min-count", "1"])
+    info = json.loads(capsys.readouterr().out)
+    assert (info["records"], info["posts"], info["unlabeled"]) == (5, 4, 1)
+
+    hashtags = json.loads((tmp_path / "out" / "top_hashtags.json").read_text())["topHashtags"]
+    assert hashtags == {"fake": [{"tag": "#plandemic", "count": 2}], "real": [{"tag": "#news", "count": 2}]}
+    top_words = json.loads((tmp_path / "out" / "top_words.json").read_text())
+    assert {"text": "hoax", "count": 2} in top_words["fake"]
+    assert {"text": "official", "count": 2} in top_words["real"]
+
+
+def test_label_map_overrides_the_convention(tmp_path, capsys):
+    label_map = parse_label_map("0=fake, 1=REAL")
+    assert label_map == {"0": "fake", "1": "real"}
+    assert corpus_label(0, label_map) == "fake" and corpus_label("Fake", label_map) == "fake"
+
+    corpus = tmp_path / "posts.jsonl"
+    _write_jsonl(corpus, ZERO_ONE_ROWS)
+    main([str(corpus), "--out", str(tmp_path / "out"), "--workers", "2", "--stop-words", "none",
+          "--label-map", "0=fake,1=real"])
+    capsys.readouterr()
+    hashtags = json.loads((tmp_path / "out" / "top_hashtags.json").read_text())["topHashtags"]
+    assert hashtags["fake"] == [{"tag": "#news", "count": 2}]
+
+
+def test_parse_label_map_rejects_unknown_labels():
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_label_map("0=maybe")
@@ -0,0 +1,170 @@
+"""
+The memory and SQLite history backends must behave the same through the
+HistoryStore interface (history/store.py).
+"""
+import threading
+
+import pytest
+
+from history.memory_store import MemoryHistoryStore
+from history.sqlite_store import SQLiteHistoryStore
+
+POSTS = [
+    ("Vaccines contain microchips, share now", "Fake", 0.91),
+    ("Government confirms new budget for schools", "Real", 0.82),
+    ("Celebrity arrested and media hides it", "Fake", 0.77),
+    ("Scientists publish peer reviewed climate study", "Real", 0.88),
+    ("Secret microchips found in schools", "Fake", 0.64),
+    ("Hospital budget report published today", "Real", 0.71),
+]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryHistoryStore()
+    return SQLiteHistoryStore(str(tmp_path / "history.db"))
+
+
+def _fill(store, posts=POSTS):
+    return [store.add(text, label, confidence, {"word": confidence})["id"] for text, label, confidence in posts]
+
+
+def test_add_get_delete(store):
+    ids = _fill(store)
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    record = store.get(ids[1])
+    assert (record["text"], record["prediction"], record["confidence"]) == POSTS[1]
+    assert record["word_contributions"] == {"word": 0.82}
+    assert record["user_feedback"] is None
+    assert store.get(ids[1], fields=["text"]) == {"id": ids[1], "text": POSTS[1][0]}
+
+    assert store.delete(ids[1]) is True
+    assert store.delete(ids[1]) is False
+    assert store.get(ids[1]) is None
+    assert store.count() == len(POSTS) - 1
+    assert store.get(10_000) is None
+
+
+def test_feedback_and_contributions(store):
+    ids = _fill(store)
+    assert store.update_feedback(ids[0], "correct")["user_feedback"] == "correct"
+    assert store.set_word_contributions(ids[0], {"chips": -0.5})["word_contributions"] == {"chips": -0.5}
+    assert store.update_feedback(10_000, "x") is None
+    assert store.set_word_contributions(10_000, {}) is None
+
+
+def test_cursor_paging_skips_deleted(store):
+    ids = _fill(store)
+    store.delete(ids[2])
+    live = [analysis_id for analysis_id in ids if analysis_id != ids[2]]
+
+    seen, cursor = [], None
+    while True:
+        items, cursor = store.list_after(cursor, 2)
+        seen.extend(item["id"] for item in items)
+        if cursor is None:
+            break
+    assert seen == live
+    assert [item["id"] for item in store.list(2, offset=1)] == live[1:3]
+
+
+def test_clear(store):
+    _fill(store)
+    assert store.clear() == len(POSTS)
+    assert store.count() == 0
+    assert store.list_after(None, 10) == ([], None)
+
+
+def _survivors(store):
+    return [(record["text"], record["prediction"], record["confidence"]) for record in store.iter_records()]
+
+
+def test_summary_is_kept_current_through_deletes(store):
+    ids = _fill(store)
+    store.delete(ids[0])
+    store.delete(ids[3])
+    fresh = MemoryHistoryStore()
+    _fill(fresh, _survivors(store))
+    assert store.summary() == fresh.summary()
+    assert store.summary()["total_analyses"] == 4
+    assert store.summary()["fake_count"] == 2
+
+    store.clear()
+    assert store.summary()["total_analyses"] == 0
+
+
+def test_summary_is_kept_current_through_evictions():
+    store = MemoryHistoryStore(max_entries=4)
+    _fill(store)
+    fresh = MemoryHistoryStore()
+    _fill(fresh, POSTS[2:])
+    assert store.evictions == 2
+    assert store.summary() == fresh.summary()
+
+
+def test_backends_report_the_same_summary(tmp_path):
+    memory, sqlite = MemoryHistoryStore(), SQLiteHistoryStore(str(tmp_path / "history.db"))
+    for backend in (memory, sqlite):
+        ids = _fill(backend)
+        backend.delete(ids[1])
+    assert memory.summary() == sqlite.summary()
+
+
+def _word_counts(store):
+    result = store.distinct_words(limit=100, min_count=1)
+    counts = sorted((item["word"], item["count_real"], item["count_fake"]) for item in result["items"])
+    return counts, result["total_real"], result["total_fake"]
+
+
+def test_distinct_words_are_kept_current_through_deletes(store):
+    ids = _fill(store)
+    store.distinct_words()  # a cached ranking must not outlive the deletes
+    store.delete(ids[0])
+    store.delete(ids[5])
+    fresh = MemoryHistoryStore()
+    _fill(fresh, _survivors(store))
+    assert _word_counts(store) == _word_counts(fresh)
+    assert ("microchips", 0, 1) in _word_counts(store)[0]
+
+
+def test_distinct_words_are_kept_current_through_evictions():
+    store = MemoryHistoryStore(max_entries=3)
+    _fill(store)
+    fresh = MemoryHistoryStore()
+    _fill(fresh, POSTS[3:])
+    assert _word_counts(store) == _word_counts(fresh)
+
+
+def test_backends_report_the_same_distinct_words(tmp_path):
+    memory, sqlite = MemoryHistoryStore(), SQLiteHistoryStore(str(tmp_path / "history.db"))
+    for backend in (memory, sqlite):
+        ids = _fill(backend)
+        backend.delete(ids[4])
+    assert _word_counts(memory) == _word_counts(sqlite)
+
+
+def test_concurrent_sqlite_deletes_decrement_words_once(tmp_path):
+    path = str(tmp_path / "history.db")
+    store = SQLiteHistoryStore(path)
+    workers = [SQLiteHistoryStore(path) for _ in range(8)]
+    for _ in range(20):
+        ids = _fill(store)
+        barrier = threading.Barrier(len(workers))
+        results = []
+
+        def delete(worker, analysis_id=ids[0]):
+            worker._connection()
+            barrier.wait()
+            results.append(worker.delete(analysis_id))
+
+        threads = [threading.Thread(target=delete, args=(worker,)) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results.count(True) == 1
+
+    fresh = MemoryHistoryStore()
+    _fill(fresh, _survivors(store))
+    assert _word_counts(store) == _word_counts(fresh)
@@ -0,0 +1,95 @@
+"""
+The numpy-only scorer (model/mapped.py) must reproduce the pickled sklearn
+pipeline: vectorizer.transform + clf.predict_proba to about 1e-9, with the
+same labels, whether built in memory or memory-mapped from an export.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from model import model
+from model.export import export_artifacts
+from model.mapped import PARITY_SAMPLES, MappedModel, check_parity
+
+TOLERANCE = 1e-9
+
+
+@pytest.fixture(scope="module")
+def sklearn_pair():
+    return model._load_sklearn_pair()
+
+
+@pytest.fixture(scope="module")
+def texts(sklearn_pair):
+    vectorizer, _ = sklearn_pair
+    rng = random.Random(7)
+    vocabulary = sorted(word for word in vectorizer.vocabulary_ if " " not in word)
+    out_of_vocabulary = ["zzqxv", "qwxyzzy", "blorptastic", "xkcdxkcd"]
+    raw = list(PARITY_SAMPLES) + ["", "   ", " ".join(out_of_vocabulary)]
+    for _ in range(300):
+        words = [rng.choice(vocabulary if rng.random() < 0.8 else out_of_vocabulary)
+                 for _ in range(rng.randint(1, 40))]
+        raw.append(" ".join(words) + rng.choice(["", "!!!", " http://t.co/x", " @user #tag", "..."]))
+    return model.preprocess_texts(raw)
+
+
+def _assert_matches_sklearn(vectorizer, clf, scorer, texts):
+    X = vectorizer.transform(texts)
+    rows = scorer.transform(texts)
+    np.testing.assert_allclose(scorer.predict_proba(rows), clf.predict_proba(X), rtol=0, atol=TOLERANCE)
+    assert list(scorer.predict(rows)) == list(clf.predict(X))
+    result = check_parity(vectorizer, clf, scorer, texts, tolerance=TOLERANCE)
+    assert result["ok"], result
+
+
+def test_from_estimators_matches_sklearn(sklearn_pair, texts):
+    vectorizer, clf = sklearn_pair
+    _assert_matches_sklearn(vectorizer, clf, MappedModel.from_estimators(vectorizer, clf), texts)
+
+
+def test_mmap_loaded_export_matches_sklearn(sklearn_pair, texts, tmp_path):
+    vectorizer, clf = sklearn_pair
+    export_artifacts(vectorizer, clf, str(tmp_path))
+    scorer = MappedModel.load(str(tmp_path))
+    assert isinstance(scorer.coef, np.memmap)
+    _assert_matches_sklearn(vectorizer, clf, scorer, texts)
+
+
+def test_empty_and_out_of_vocabulary_text_score_the_intercept(sklearn_pair):
+    vectorizer, clf = sklearn_pair
+    scorer = MappedModel.from_estimators(vectorizer, clf)
+    texts = model.preprocess_texts(["", "zzqxv qwxyzzy blorptastic"])
+    rows = scorer.transform(texts)
+    assert rows.indptr.tolist() == [0, 0, 0]
+    np.testing.assert_allclose(scorer.decision_function(rows), [scorer.intercept] * 2, rtol=0, atol=TOLERANCE)
+    _assert_matches_sklearn(vectorizer, clf, scorer, texts)
+
+
+def test_sklearn_engine_fallback(monkeypatch, texts, tmp_path):
+    # no export: the numpy engine builds its scorer from the pickles
+    monkeypatch.setattr(model, "EXPORT_DIR", str(tmp_path / "missing"))
+    numpy_loaded = model.load_model()
+    assert numpy_loaded.scorer is not None
+    assert numpy_loaded.info()["engine"] == "numpy"
+
+    monkeypatch.setattr(model, "MODEL_ENGINE", "sklearn")
+    sklearn_loaded = model.load_model()
+    assert sklearn_loaded.scorer is None
+    assert sklearn_loaded.info()["engine"] == "sklearn"
+    assert sklearn_loaded.version == numpy_loaded.version
+
+    labels, confidences = model._labels_and_confidences(numpy_loaded, model._transform(numpy_loaded, texts))
+    expected_labels, expected = model._labels_and_confidences(sklearn_loaded, model._transform(sklearn_loaded, texts))
+    assert labels == expected_labels
+    np.testing.assert_allclose(confidences, expected, rtol=0, atol=TOLERANCE)
+
+
+def test_sklearn_engine_ignores_export(monkeypatch, sklearn_pair, tmp_path):
+    vectorizer, clf = sklearn_pair
+    export_artifacts(vectorizer, clf, str(tmp_path))
+    monkeypatch.setattr(model, "EXPORT_DIR", str(tmp_path))
+    assert model.load_model().source == str(tmp_path)
+
+    monkeypatch.setattr(model, "MODEL_ENGINE", "sklearn")
+    assert model.load_model().source == model.MODEL_DIR
@@ -0,0 +1,45 @@
+"""Bounds and eviction of the in-memory history store (history/memory_store.py)."""
+from history.memory_store import MemoryHistoryStore
+
+
+def _record_events(store):
+    events = []
+    store.add_listener(lambda _, event, data: events.append((event, data.get("id"))))
+    return events
+
+
+def test_entry_cap_evicts_oldest_and_notifies():
+    store = MemoryHistoryStore(max_entries=3)
+    events = _record_events(store)
+    ids = [store.add(f"text {i}", "Fake", 0.5, {})["id"] for i in range(5)]
+    assert store.count() == 3
+    assert [item["id"] for item in store.list(10)] == ids[2:]
+    assert store.get(ids[0]) is None
+    assert ("deleted", ids[0]) in events and ("deleted", ids[1]) in events
+    assert store.evictions == 2
+
+
+def test_update_never_evicts_the_updated_record():
+    store = MemoryHistoryStore(max_entries=10, max_bytes=2000)
+    first = store.add("first", "Fake", 0.5, {})
+    second = store.add("second", "Real", 0.5, {})
+    events = _record_events(store)
+
+    updated = store.update_feedback(first["id"], "x" * 1500)
+    assert updated is not None and updated["user_feedback"] == "x" * 1500
+    assert store.get(first["id"]) is not None
+    assert store.get(second["id"]) is None
+    assert events == [("feedback", first["id"]), ("deleted", second["id"])]
+
+    explained = store.set_word_contributions(first["id"], {f"word{i}": i / 100 for i in range(50)})
+    assert explained is not None and store.get(first["id"]) is not None
+
+
+def test_feature_table_only_keeps_live_words():
+    store = MemoryHistoryStore(max_entries=3)
+    ids = [store.add(f"text {i}", "Fake", 0.5, {f"word{i}a": 0.1, f"word{i}b": -0.2, "shared": 0.3})["id"]
+           for i in range(50)]
+    live_words = {"shared"} | {f"word{i}{suffix}" for i in range(47, 50) for suffix in "ab"}
+    assert live_words <= set(store._features.words)
+    assert len(store._features) <= 2 * len(live_words)
+    assert store.get(ids[-1])["word_contributions"] == {"shared": 0.3, "word49b": -0.2, "word49a": 0.1}
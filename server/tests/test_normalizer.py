@@ -0,0 +1,98 @@
+"""
+The single-pass normalizer (_COMBINED_RE + _REPEAT_RE) must match the
+original chain of re.sub passes byte for byte. Run from server/:
+    python -m pytest tests
+"""
+import random
+import re
+
+import pytest
+
+from model.normalizer import normalize_text, normalize_texts
+
+
+def sequential_preprocess(text: str) -> str:
+    """The original multi-pass preprocess_text, kept as the reference."""
+    text = text.lower()
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'http[s]?://\S+', 'URL_PLACEHOLDER', text)
+    text = re.sub(r'www\.\S+', 'URL_PLACEHOLDER', text)
+    text = re.sub(r'@\w+', 'USER_MENTION', text)
+    text = re.sub(r'#(\w+)', r'\1', text)
+    text = re.sub(r'[!]{2,}', '!', text)
+    text = re.sub(r'[?]{2,}', '?', text)
+    text = re.sub(r'[.]{2,}', '...', text)
+    text = re.sub(r'[^\w\s!?.,]', ' ', text)
+    text = re.sub(r'(.)\1{2,}', r'\1\1', text)
+    return text.strip()
+
+
+CORPUS = [
+    "",
+    "   ",
+    "Plain prose with nothing special in it.",
+    "BREAKING!!! Vaccines contain microchips??? Share before they delete this...",
+    "soooo goooood",
+    "a#a#a",
+    "#hashtag #Another_Tag #123 # lone hash ##double",
+    "@user said @other_user: check https://example.com/x?y=1 now",
+    "visit www.example.com or http://t.co/abc!!!",
+    "@www.example.com and @https://example.com",
+    "@user_https://example.com/path",
+    "#@mention #@ #https://x.y",
+    "tabs\tand\nnewlines\r\n non-breaking em space",
+    "Éire ÇA ünïcödé straße İstanbul",
+    "emoji 😀😀😀 and symbols ©®™ $100 50% a&b",
+    "dots.. dots... dots.... ?!?! !!?? ,,,",
+    "httpx://not-a-url wwwnot.url hhttps://a.b wwww.example.com",
+    "mixed...!!!???###@@@",
+    "aaa bbb ... !!! ??? ___ 111",
+    "https://a.b https://c.d\thttps://e.f",
+]
+
+# Fragments chosen to hit every branch of the combined pattern and the
+# places where the sequential passes interact
+FRAGMENTS = [
+    "a", "b", "o", "ooo", "x", "1", "_", "h", "w", "s", "t", "p",
+    " ", "  ", "\t", "\n", " ", " ",
+    "http://", "https://", "www.", "ww.", "http", "https:/", "://",
+    "example.com", "/path?q=1",
+    "@", "@user", "#", "#tag", "##",
+    "!", "!!", "?", "??", ".", "..", "...", ",",
+    "$", "%", "&", "-", "'", '"', "(", ")", "*",
+    "É", "é", "ß", "İ", "😀", "©", "中文",
+]
+
+
+def test_corpus_matches_sequential_chain():
+    for text in CORPUS:
+        assert normalize_text(text) == sequential_preprocess(text), repr(text)
+
+
+def test_batch_matches_single():
+    assert normalize_texts(CORPUS) == [normalize_text(text) for text in CORPUS]
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_random_fragment_strings_match_sequential_chain(seed):
+    rng = random.Random(seed)
+    for _ in range(5000):
+        text = "".join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 20)))
+        assert normalize_text(text) == sequential_preprocess(text), repr(text)
+
+
+def test_random_code_point_strings_match_sequential_chain():
+    rng = random.Random(1234)
+    alphabet = [chr(code) for code in range(0x3000) if not 0xD800 <= code <= 0xDFFF]
+    for _ in range(5000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 30)))
+        assert normalize_text(text) == sequential_preprocess(text), repr(text)
+
+
+def test_every_code_point_below_u3000_matches_sequential_chain():
+    for code in range(0x3000):
+        if 0xD800 <= code <= 0xDFFF:
+            continue
+        char = chr(code)
+        for text in (char, char * 3, f"a{char}a{char}a", f"#{char}", f"@{char}"):
+            assert normalize_text(text) == sequential_preprocess(text), repr(text)
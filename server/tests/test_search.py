@@ -0,0 +1,77 @@
+"""
+/history/search semantics: the in-memory InvertedIndex and both store
+backends must agree on prefix terms, phrases and case folding.
+"""
+import pytest
+
+from history.memory_store import MemoryHistoryStore
+from history.search_index import InvertedIndex, parse_query
+from history.sqlite_store import SQLiteHistoryStore
+
+TEXTS = [
+    "Vaccine microchips are real, share now",
+    "New vaccination centre opens in Dublin",
+    "Microchip in every vaccine, says blog",
+    "Visit éire this summer: ÇA VA bien",
+    "Straße closed after storm in BERLIN",
+    "!!! ??? ...",
+]
+
+
+def _ids(results):
+    return sorted(record["id"] for record in results)
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    store = MemoryHistoryStore() if request.param == "memory" else SQLiteHistoryStore(str(tmp_path / "history.db"))
+    for text in TEXTS:
+        store.add(text, "Fake", 0.5, {})
+    return store
+
+
+def test_parse_query():
+    assert parse_query("  Vacc CHIP ") == (["vacc", "chip"], None)
+    assert parse_query('"Microchip in"') == (["in"], "microchip in")
+
+
+def test_terms_are_anded_prefixes(store):
+    assert _ids(store.search("vacc", 10)) == [1, 2, 3]
+    assert _ids(store.search("vacc micro", 10)) == [1, 3]
+    assert _ids(store.search("VACCINE", 10)) == [1, 3]
+    assert store.search("vaccx", 10) == []
+
+
+def test_phrases_match_substrings(store):
+    assert _ids(store.search('"microchip in"', 10)) == [3]
+    assert _ids(store.search('"chips are"', 10)) == [1]
+    assert store.search('"in microchip"', 10) == []
+
+
+def test_non_ascii_case_folding(store):
+    assert _ids(store.search("ÉIRE", 10)) == [4]
+    assert _ids(store.search('"Éire this"', 10)) == [4]
+    assert _ids(store.search('"ça va"', 10)) == [4]
+    assert _ids(store.search("STRASSE", 10)) == [] and _ids(store.search("straße", 10)) == [5]
+
+
+def test_punctuation_only_queries_fall_back_to_substring(store):
+    assert _ids(store.search("???", 10)) == [6]
+
+
+def test_limit(store):
+    assert len(store.search("vacc", 2)) == 2
+
+
+def test_inverted_index_ranks_and_removes():
+    index = InvertedIndex()
+    texts = {1: "vaccine vaccine vaccine", 2: "vaccine news", 3: "weather news"}
+    for analysis_id, text in texts.items():
+        index.add(analysis_id, text)
+    assert index.search("vaccine", 10, texts.get) == [1, 2]
+    assert index.search('"e news"', 10, texts.get) == [2]
+    assert index.search('"r news"', 10, texts.get) == [3]
+    assert index.search("!!!", 10, texts.get) is None
+
+    index.remove(1, texts.pop(1))
+    assert index.search("vacc", 10, texts.get) == [2]